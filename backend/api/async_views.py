@@ -0,0 +1,197 @@
+"""
+Нативные async-версии самых нагруженных GET-эндпоинтов для работы под ASGI.
+
+Ответы совпадают с ответами синхронных вьюсетов; остальные методы
+передаются соответствующему вьюсету.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from api.filters import IngredientFilter, RecipeFilter
+from api.pagination import CustomPageNumberPagination
+from api.querysets import (
+    aload_subscribed_authors,
+    aload_user_recipe_ids,
+    recipes_for,
+)
+from api.serializers import IngredientSerializer, RecipeDetailSerializer
+from api.views import IngredientViewSet, RecipeViewSet
+from foodgram.db_router import (
+    ais_pinned_to_primary,
+    start_replica_reads,
+    stop_replica_reads,
+)
+from recipes.models import Ingredient
+
+SAFE_ASYNC_METHODS = ("GET", "HEAD")
+
+
+def _render(data, status_code=status.HTTP_200_OK, headers=None):
+    response = HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        content_type=JSONRenderer.media_type,
+        headers=headers,
+    )
+    response["Vary"] = "Accept"
+    return response
+
+
+def _handle_exception(exc, request):
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        exc.auth_header = request.authenticators[0].authenticate_header(
+            request
+        )
+    response = api_settings.EXCEPTION_HANDLER(exc, {"request": request})
+    if response is None:
+        raise exc
+    return _render(
+        response.data,
+        response.status_code,
+        {
+            header: value
+            for header, value in response.headers.items()
+            if header != "Content-Type"
+        },
+    )
+
+
+def _check_throttles(request):
+    waits = [
+        throttle.wait()
+        for throttle in (
+            throttle_class()
+            for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES
+        )
+        if not throttle.allow_request(request, None)
+    ]
+    if waits:
+        raise exceptions.Throttled(max(waits))
+
+
+def async_api_view(sync_view):
+    """Обслуживает GET/HEAD корутиной, остальные методы — `sync_view`."""
+
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in SAFE_ASYNC_METHODS:
+                return await sync_view(request, *args, **kwargs)
+
+            request = Request(
+                request,
+                authenticators=[
+                    auth()
+                    for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+                ],
+            )
+            try:
+                await sync_to_async(lambda: request.user)()
+                _check_throttles(request)
+                replica_token = None
+                if not await ais_pinned_to_primary(request.user.pk):
+                    replica_token = start_replica_reads()
+                try:
+                    data = await view(request, *args, **kwargs)
+                finally:
+                    if replica_token is not None:
+                        stop_replica_reads(replica_token)
+            except (exceptions.APIException, Http404) as exc:
+                return _handle_exception(exc, request)
+            return _render(data)
+
+        return wrapper
+
+    return decorator
+
+
+def _filter(filterset_class, request, queryset):
+    filterset = filterset_class(
+        data=request.query_params, queryset=queryset, request=request
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def _get_or_404(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist as exc:
+        raise Http404(
+            f"No {queryset.model._meta.object_name} matches the given query."
+        ) from exc
+
+
+@async_api_view(RecipeViewSet.as_view({"get": "list", "post": "create"}))
+async def recipe_list(request):
+    paginator = CustomPageNumberPagination()
+    recipes = await paginator.apaginate_queryset(
+        _filter(RecipeFilter, request, recipes_for(request.user)), request
+    )
+    context = {
+        "request": request,
+        "user_recipe_ids": await aload_user_recipe_ids(request.user),
+        "subscribed_authors": await aload_subscribed_authors(request.user),
+    }
+    return paginator.get_paginated_response(
+        RecipeDetailSerializer(recipes, many=True, context=context).data
+    ).data
+
+
+@async_api_view(
+    RecipeViewSet.as_view(
+        {
+            "get": "retrieve",
+            "put": "update",
+            "patch": "partial_update",
+            "delete": "destroy",
+        }
+    )
+)
+async def recipe_detail(request, pk):
+    recipe = await _get_or_404(
+        _filter(RecipeFilter, request, recipes_for(request.user)), pk
+    )
+    context = {
+        "request": request,
+        "user_recipe_ids": await aload_user_recipe_ids(request.user),
+        "subscribed_authors": await aload_subscribed_authors(request.user),
+    }
+    return RecipeDetailSerializer(recipe, context=context).data
+
+
+@async_api_view(IngredientViewSet.as_view({"get": "list"}))
+async def ingredient_list(request):
+    return IngredientSerializer(
+        [
+            ingredient
+            async for ingredient in _filter(
+                IngredientFilter, request, Ingredient.objects.all()
+            )
+        ],
+        many=True,
+    ).data
+
+
+@async_api_view(IngredientViewSet.as_view({"get": "retrieve"}))
+async def ingredient_detail(request, pk):
+    return IngredientSerializer(
+        await _get_or_404(
+            _filter(IngredientFilter, request, Ingredient.objects.all()), pk
+        )
+    ).data
@@ -0,0 +1,75 @@
+import copy
+import logging
+
+from django.conf import settings
+from django.db import router, transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import TTLCache
+from foodgram.caches import bump_version, get_version, is_shared
+
+logger = logging.getLogger(__name__)
+
+token_cache = TTLCache(
+    max_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL,
+)
+
+
+def _version_key(key):
+    return f"auth-token-version:{key}"
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, кэширующая соответствие токена пользователю.
+
+    Кэш локален для процесса, а запись помнит версию токена из кэша
+    Django. Выход, удаление токена и изменение пользователя в любом
+    воркере увеличивают версию, и запись перечитывается из базы. Если
+    кэш Django не общий для воркеров, токены не кэшируются.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_shared():
+            return super().authenticate_credentials(key)
+
+        # Версия читается до базы: сброс между ними не потеряется.
+        version = get_version(_version_key(key))
+        cached = token_cache.get(key)
+        if cached is not None and cached[2] == version:
+            user, token, _ = cached
+            return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (copy.copy(user), token, version))
+        return user, token
+
+
+def _bump_on_commit(keys):
+    def bump():
+        for key in keys:
+            bump_version(_version_key(key))
+
+    transaction.on_commit(bump, using=router.db_for_write(Token))
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+    _bump_on_commit((key,))
+
+
+def invalidate_user_tokens(user_id):
+    removed = token_cache.delete_where(lambda item: item[0].pk == user_id)
+    if removed:
+        logger.debug(
+            "Сброшено %s токенов пользователя %s из кэша", removed, user_id
+        )
+    if is_shared():
+        _bump_on_commit(
+            list(
+                Token.objects.filter(user_id=user_id).values_list(
+                    "key", flat=True
+                )
+            )
+        )
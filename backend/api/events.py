@@ -0,0 +1,141 @@
+"""
+Поток server-sent events /api/events/ для авторизованного пользователя.
+
+Это ASGI-приложение без обработчика Django (его подключает
+foodgram/asgi.py): подключение Django держало бы до закрытия потока свой
+поток исполнителя sync_to_async и соединение с базой. Здесь обращения к
+базе идут через общий пул потоков и сразу закрывают соединение, так что
+простаивающее подключение стоит только очереди в recipes.events.hub и
+задачи, ждущей разрыва.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from rest_framework import exceptions
+
+from api.authentication import CachedTokenAuthentication
+from recipes.events import CLOSE, hub, user_topics
+
+PATH = "/api/events/"
+# Через сколько миллисекунд EventSource переподключается после разрыва.
+RETRY_MS = 5000
+
+
+def _in_pool(func, *args):
+    def run():
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def _authenticate(headers):
+    authentication = CachedTokenAuthentication()
+    auth = headers.get(b"authorization", b"").split()
+    if not auth or auth[0].lower() != authentication.keyword.lower().encode():
+        raise exceptions.NotAuthenticated
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed from None
+    user, _ = authentication.authenticate_credentials(key)
+    return user
+
+
+async def _respond(send, status, data, headers=()):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": (
+                (b"content-type", b"application/json"),
+                *headers,
+            ),
+        }
+    )
+    await send(
+        {
+            "type": "http.response.body",
+            "body": json.dumps(data, ensure_ascii=False).encode(),
+        }
+    )
+
+
+def _format(event):
+    if event["type"] == "keepalive":
+        return b": keepalive\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def _watch_disconnect(receive, subscriber):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    subscriber.close()
+
+
+async def event_stream(scope, receive, send):
+    if scope["method"] != "GET":
+        await _respond(
+            send,
+            405,
+            {"detail": str(exceptions.MethodNotAllowed(scope["method"]))},
+            ((b"allow", b"GET"),),
+        )
+        return
+    try:
+        user = await _in_pool(_authenticate, dict(scope["headers"]))
+    except (
+        exceptions.NotAuthenticated,
+        exceptions.AuthenticationFailed,
+    ) as exc:
+        await _respond(
+            send,
+            exc.status_code,
+            {"detail": str(exc.detail)},
+            ((b"www-authenticate", b"Token"),),
+        )
+        return
+
+    subscriber = hub.subscribe(user.pk, await _in_pool(user_topics, user.pk))
+    watcher = asyncio.create_task(_watch_disconnect(receive, subscriber))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": (
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # nginx не должен копить поток в буфере.
+                    (b"x-accel-buffering", b"no"),
+                ),
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": f"retry: {RETRY_MS}\n\n".encode(),
+                "more_body": True,
+            }
+        )
+        while True:
+            event = await subscriber.get()
+            if event is CLOSE:
+                break
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": _format(event),
+                    "more_body": True,
+                }
+            )
+    finally:
+        hub.unsubscribe(subscriber)
+        watcher.cancel()
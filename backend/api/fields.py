@@ -1,5 +1,4 @@
 import base64
-import uuid
 
 from django.core.files.base import ContentFile
 from rest_framework import serializers
@@ -14,9 +13,8 @@ class Base64ImageField(serializers.ImageField):
 
                 decoded_data = base64.b64decode(imgstr)
 
-                file_name = f"{uuid.uuid4()}.{ext}"
-
-                data = ContentFile(decoded_data, name=file_name)
+                # Итоговое имя по хэшу содержимого задаёт хранилище.
+                data = ContentFile(decoded_data, name=f"upload.{ext}")
 
             except (ValueError, TypeError) as e:
                 raise serializers.ValidationError(
@@ -25,3 +23,30 @@ class Base64ImageField(serializers.ImageField):
                 ) from e
 
         return super().to_internal_value(data)
+
+
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который ищет объект в словаре `catalog`.
+
+    Словарь {pk: объект} заранее загружает родительский список одним
+    запросом на все элементы; ошибки те же, что у PrimaryKeyRelatedField.
+    Без словаря поле делает запрос, как обычно.
+    """
+
+    catalog = None
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.get_prep_value(data)
+
+    def to_internal_value(self, data):
+        if self.catalog is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in self.catalog:
+            self.fail("does_not_exist", pk_value=data)
+        return self.catalog[pk]
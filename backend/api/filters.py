@@ -1,43 +1,120 @@
 import django_filters
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest, Upper
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    User,
+)
+
+SEARCH_RANK = "search_rank"
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    """Список чисел через запятую: `?author__in=1,2,3`."""
 
 
 class RecipeFilter(django_filters.FilterSet):
+    """Фильтры списка рецептов.
+
+    Условия на связанные таблицы строятся через EXISTS / NOT EXISTS
+    с коррелированным подзапросом по уникальному индексу, а не через
+    JOIN или exclude(): так фильтр не размножает строки и не требует
+    DISTINCT, а планировщик проверяет условие одним поиском по индексу.
+    """
+
     is_favorited = django_filters.NumberFilter(method="filter_is_favorited")
     is_in_shopping_cart = django_filters.NumberFilter(
         method="filter_is_in_shopping_cart"
     )
     author = django_filters.NumberFilter(field_name="author__id")
+    author__in = NumberInFilter(field_name="author_id", lookup_expr="in")
+    cooking_time__lte = django_filters.NumberFilter(
+        field_name="cooking_time", lookup_expr="lte"
+    )
+    cooking_time__gte = django_filters.NumberFilter(
+        field_name="cooking_time", lookup_expr="gte"
+    )
+    ingredients = NumberInFilter(method="filter_ingredients")
+    exclude_ingredients = NumberInFilter(method="filter_exclude_ingredients")
+    ordering = django_filters.ChoiceFilter(
+        choices=(
+            ("popular", "Популярные"),
+            ("trending", "Набирающие популярность"),
+        ),
+        method="filter_ordering",
+    )
+
+    ORDERINGS = {
+        "popular": ("-rank__popularity", "-rank__recipe_id"),
+        "trending": ("-rank__trending", "-rank__recipe_id"),
+    }
 
     class Meta:
         model = Recipe
-        fields = ("is_favorited", "is_in_shopping_cart", "author")
+        fields = (
+            "is_favorited",
+            "is_in_shopping_cart",
+            "author",
+            "author__in",
+            "cooking_time__lte",
+            "cooking_time__gte",
+            "ingredients",
+            "exclude_ingredients",
+            "ordering",
+        )
 
-    def filter_is_favorited(self, queryset, name, value):
+    def _filter_user_relation(self, queryset, model, value):
         user = self.request.user
-        if not user.is_authenticated:
+        if not user.is_authenticated or value not in (0, 1):
             return queryset
 
-        if value == 1:
-            return queryset.filter(favorites__user=user)
-        elif value == 0:
-            return queryset.exclude(favorites__user=user)
+        added = Exists(model.objects.filter(user=user, recipe=OuterRef("pk")))
+        return queryset.filter(added if value == 1 else ~added)
 
-        return queryset
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_user_relation(queryset, Favorite, value)
 
-    def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if not user.is_authenticated:
-            return queryset
+    def filter_ordering(self, queryset, name, value):
+        # Внутреннее соединение: первая страница читается по индексу
+        # рейтинга. Строка рейтинга есть у каждого рецепта
+        # (recipes.ranking.create_ranks).
+        return queryset.filter(rank__isnull=False).order_by(
+            *self.ORDERINGS[value]
+        )
 
-        if value == 1:
-            return queryset.filter(shoppingcarts__user=user)
-        elif value == 0:
-            return queryset.exclude(shoppingcarts__user=user)
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self._filter_user_relation(queryset, ShoppingCart, value)
 
+    def filter_ingredients(self, queryset, name, value):
+        """Рецепты, в которых есть все перечисленные продукты."""
+        for ingredient_id in set(value):
+            queryset = queryset.filter(
+                Exists(
+                    RecipeIngredient.objects.filter(
+                        recipe=OuterRef("pk"), ingredient_id=ingredient_id
+                    )
+                )
+            )
         return queryset
 
+    def filter_exclude_ingredients(self, queryset, name, value):
+        """Рецепты без единого из перечисленных продуктов."""
+        return queryset.filter(
+            ~Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=OuterRef("pk"), ingredient_id__in=set(value)
+                )
+            )
+        )
+
 
 class IngredientFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
@@ -47,3 +124,57 @@ class IngredientFilter(django_filters.FilterSet):
     class Meta:
         model = Ingredient
         fields = ("name",)
+
+
+class UserFilter(django_filters.FilterSet):
+    """Поиск по пользователям: `?search=иван пет`.
+
+    Каждое слово запроса должно совпасть с началом username, имени или
+    фамилии, а в PostgreSQL — либо быть похожим на одно из них по
+    триграммам (pg_trgm). Сравниваются копии полей в нижнем регистре
+    (User.*_folded) со словом в нижнем регистре, так что регистр не важен
+    и для кириллицы. Выдача упорядочена по релевантности: сначала
+    совпадения с началом username, затем с началом имени или фамилии,
+    затем по похожести.
+    """
+
+    search = django_filters.CharFilter(method="filter_search")
+
+    SEARCH_FIELDS = tuple(f"{field}_folded" for field in User.SEARCH_FIELDS)
+    MAX_SEARCH_WORDS = 3
+
+    class Meta:
+        model = User
+        fields = ("search",)
+
+    def filter_search(self, queryset, name, value):
+        words = value.casefold().split()[: self.MAX_SEARCH_WORDS]
+        if not words:
+            return queryset
+
+        trigrams = connections[queryset.db].vendor == "postgresql"
+        rank = Value(0.0)
+        for word in words:
+            prefix = Q()
+            for field in self.SEARCH_FIELDS:
+                prefix |= Q(**{f"{field}__istartswith": word})
+            condition = prefix
+            rank += Case(
+                When(username_folded__istartswith=word, then=Value(2.0)),
+                When(prefix, then=Value(1.0)),
+                default=Value(0.0),
+            )
+            if trigrams:
+                for field in self.SEARCH_FIELDS:
+                    condition |= Q(TrigramSimilar(Upper(field), word))
+                rank += Greatest(
+                    *(
+                        TrigramSimilarity(Upper(field), word)
+                        for field in self.SEARCH_FIELDS
+                    )
+                )
+            queryset = queryset.filter(condition)
+
+        return queryset.annotate(**{SEARCH_RANK: rank}).order_by(
+            f"-{SEARCH_RANK}", "username"
+        )
@@ -0,0 +1,172 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from api.filters import RecipeFilter
+from api.querysets import recipes_for
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    User,
+)
+from recipes.ranking import create_ranks
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время комбинаций фильтров списка рецептов на "
+        "сгенерированных данных (данные откатываются после замера)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=5000,
+            help="Сколько рецептов сгенерировать (по умолчанию: 5000)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Повторов каждого замера (по умолчанию: 20)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Зерно генератора данных"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, ingredients, authors = self.populate(
+                options["recipes"], random.Random(options["seed"])
+            )
+            self.stdout.write(
+                f"{'фильтр':<40} {'строк':>7} {'медиана':>10} {'p95':>10}"
+            )
+            for name, params in self.cases(ingredients, authors):
+                rows, timings = self.measure(user, params, options["repeat"])
+                self.stdout.write(
+                    f"{name:<40} {rows:>7} "
+                    f"{statistics.median(timings):>8.2f}мс "
+                    f"{statistics.quantiles(timings, n=20)[-1]:>8.2f}мс"
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, recipes_count, rng):
+        authors = User.objects.bulk_create(
+            User(
+                email=f"benchmark-{number}@example.com",
+                username=f"benchmark-{number}",
+                first_name="Бенчмарк",
+                last_name=str(number),
+            )
+            for number in range(50)
+        )
+        user = authors[0]
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"бенчмарк-{number}", measurement_unit="г")
+            for number in range(200)
+        )
+        recipes = Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=rng.choice(authors),
+                    name=f"Рецепт {number}",
+                    image=f"recipes/images/benchmark-{number}.jpg",
+                    text="Бенчмарк",
+                    cooking_time=rng.randint(1, 180),
+                )
+                for number in range(recipes_count)
+            ),
+            batch_size=1000,
+        )
+        create_ranks(recipe.pk for recipe in recipes)
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, 5)
+            ),
+            batch_size=1000,
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                (
+                    model(user=user, recipe=recipe)
+                    for recipe in rng.sample(recipes, recipes_count // 10)
+                ),
+                batch_size=1000,
+            )
+        return user, ingredients, authors
+
+    def cases(self, ingredients, authors):
+        first, second, third, fourth = (
+            str(ingredient.pk) for ingredient in ingredients[:4]
+        )
+        author_ids = ",".join(str(author.pk) for author in authors[:5])
+        return (
+            ("без фильтров", {}),
+            ("is_favorited=1", {"is_favorited": 1}),
+            ("is_favorited=0", {"is_favorited": 0}),
+            (
+                "is_favorited=0 & is_in_shopping_cart=0",
+                {"is_favorited": 0, "is_in_shopping_cart": 0},
+            ),
+            (
+                "cooking_time 10..30",
+                {"cooking_time__gte": 10, "cooking_time__lte": 30},
+            ),
+            ("author__in (5)", {"author__in": author_ids}),
+            ("ingredients (2)", {"ingredients": f"{first},{second}"}),
+            (
+                "exclude_ingredients (2)",
+                {"exclude_ingredients": f"{third},{fourth}"},
+            ),
+            (
+                "ingredients + exclude_ingredients",
+                {
+                    "ingredients": first,
+                    "exclude_ingredients": f"{third},{fourth}",
+                },
+            ),
+            (
+                "author__in + cooking_time",
+                {"author__in": author_ids, "cooking_time__lte": 60},
+            ),
+            (
+                "все фильтры вместе",
+                {
+                    "is_favorited": 0,
+                    "is_in_shopping_cart": 1,
+                    "author__in": author_ids,
+                    "cooking_time__lte": 120,
+                    "ingredients": first,
+                    "exclude_ingredients": third,
+                },
+            ),
+        )
+
+    def measure(self, user, params, repeat):
+        request = RequestFactory().get("/api/recipes/", params)
+        request.user = user
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = RecipeFilter(
+                data=request.GET, queryset=recipes_for(user), request=request
+            ).qs
+            rows = queryset.count()
+            list(queryset[:PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        return rows, timings
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import export_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает ответы API анонимному пользователю (рецепты, первые "
+        "страницы списка, каталог продуктов) в файлы для nginx"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--root",
+            default=settings.SNAPSHOT_ROOT,
+            help="Каталог снимков (по умолчанию SNAPSHOT_ROOT)",
+        )
+        parser.add_argument(
+            "--url",
+            default=settings.SNAPSHOT_BASE_URL,
+            help="Адрес сайта для абсолютных ссылок в ответах",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=settings.SNAPSHOT_PAGES,
+            help="Сколько первых страниц /api/recipes/ выгрузить",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            action="append",
+            dest="limits",
+            help="Размер страницы списка; можно указать несколько раз "
+            "(по умолчанию SNAPSHOT_PAGE_LIMITS)",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Перерисовать все рецепты, а не только изменённые",
+        )
+
+    def handle(self, *args, **options):
+        if not options["root"]:
+            raise CommandError("Не задан каталог снимков: SNAPSHOT_ROOT.")
+        report = export_snapshots(
+            options["root"],
+            options["url"],
+            options["pages"],
+            options["limits"] or settings.SNAPSHOT_PAGE_LIMITS,
+            full=options["full"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Снимки: {report}"))
@@ -0,0 +1,207 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.loadtest import (
+    COLLECTION,
+    SCENARIOS,
+    LoadTestError,
+    compare,
+    run_load_test,
+    with_weights,
+)
+
+
+def _weights(value):
+    weights = {}
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        try:
+            weights[name.strip()] = int(weight)
+        except ValueError:
+            raise CommandError(
+                f"Вес сценария задаётся как имя=число: {item}"
+            ) from None
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает запущенный сервер сценариями из Postman-коллекции и "
+        "выводит пропускную способность и p50/p95/p99 по эндпоинтам; "
+        "может сохранить результат как базовый и сравнить с ним"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Адрес сервера (по умолчанию: http://127.0.0.1:8000)",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=20,
+            help="Сколько виртуальных пользователей (по умолчанию: 20)",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=30,
+            help="Длительность прогона, секунд (по умолчанию: 30)",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0,
+            help="Средняя пауза между запросами пользователя, секунд "
+            "(по умолчанию: 0 — без пауз)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30,
+            help="Тайм-аут запроса, секунд (по умолчанию: 30)",
+        )
+        parser.add_argument(
+            "--weights",
+            type=_weights,
+            default={},
+            help="Веса сценариев, например browse=6,shopper=3,newcomer=1 "
+            "(по умолчанию: "
+            + ",".join(f"{s.name}={s.weight}" for s in SCENARIOS)
+            + ")",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Зерно выбора сценариев"
+        )
+        parser.add_argument(
+            "--collection",
+            default=COLLECTION,
+            help="Файл Postman-коллекции",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Сравнить со сводкой из этого файла",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Допустимое ухудшение относительно базового прогона "
+            "(по умолчанию: 0.2 — 20%%)",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            help="Сохранить сводку прогона в этот файл",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(
+                    f"Не удалось прочитать базовый прогон: {exc}"
+                ) from None
+
+        try:
+            report = run_load_test(
+                options["base_url"],
+                options["duration"],
+                scenarios=with_weights(options["weights"]),
+                users=options["users"],
+                think_time=options["think_time"],
+                timeout=options["timeout"],
+                seed=options["seed"],
+                collection=options["collection"],
+            )
+        except LoadTestError as exc:
+            raise CommandError(str(exc)) from None
+        summary = report.summary()
+        self.print_summary(report, summary)
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w", encoding="utf-8") as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                f"\nСводка сохранена в {options['save_baseline']}"
+            )
+        if baseline is not None:
+            self.print_comparison(summary, baseline, options["tolerance"])
+
+    def print_summary(self, report, summary):
+        self.stdout.write(
+            f"{'эндпоинт':<56} {'запросов':>8} {'ошибок':>6} {'в сек.':>7} "
+            f"{'p50':>9} {'p95':>9} {'p99':>9}"
+        )
+        for endpoint, metrics in (
+            *summary["endpoints"].items(),
+            ("всего", summary["total"]),
+        ):
+            self.stdout.write(
+                f"{endpoint:<56} {metrics['requests']:>8} "
+                f"{metrics['errors']:>6} {metrics['throughput']:>7.1f} "
+                f"{metrics['p50']:>7.1f}мс {metrics['p95']:>7.1f}мс "
+                f"{metrics['p99']:>7.1f}мс"
+            )
+        self.stdout.write(
+            f"\n{report.users} пользователей, {report.elapsed:.1f} с. "
+            "Итераций (прервано): "
+            + ", ".join(
+                f"{name} {report.iterations[name]} ({report.aborted[name]})"
+                for name in sorted(report.iterations | report.aborted)
+            )
+        )
+        statuses = report.statuses()
+        self.stdout.write(
+            "Ответы: "
+            + ", ".join(
+                f"{status or 'нет ответа'}: {count}"
+                for status, count in sorted(
+                    statuses.items(), key=lambda item: item[0] or 0
+                )
+            )
+        )
+        if statuses[429]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Сервер ограничивал частоту запросов: поднимите "
+                    "THROTTLE_BURST и THROTTLE_RATE на время прогона"
+                )
+            )
+
+    def print_comparison(self, summary, baseline, tolerance):
+        if summary["users"] != baseline["users"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"\nВ базовом прогоне было {baseline['users']} "
+                    "пользователей: сравнение неточно"
+                )
+            )
+        self.stdout.write(
+            f"\n{'эндпоинт':<56} {'метрика':<10} {'база':>9} "
+            f"{'сейчас':>9} {'изм.':>7}"
+        )
+        regressions = 0
+        for comparison in compare(summary, baseline):
+            regressed = comparison.regressed(tolerance)
+            regressions += regressed
+            line = (
+                f"{comparison.endpoint:<56} {comparison.metric:<10} "
+                f"{comparison.baseline:>9.1f} {comparison.current:>9.1f} "
+                f"{comparison.change:>+7.0%}"
+            )
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        if regressions:
+            raise CommandError(
+                f"Хуже базового прогона больше чем на {tolerance:.0%}: "
+                f"{regressions} показателей"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nВ пределах {tolerance:.0%} от базового прогона"
+            )
+        )
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.sqlite_benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет параллельную запись избранного и списка покупок в SQLite "
+        "из нескольких процессов с настройками Django по умолчанию и с "
+        "SQLITE_OPTIONS (во временной базе)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=4,
+            help="Сколько процессов пишут одновременно (по умолчанию: 4)",
+        )
+        parser.add_argument(
+            "--readers",
+            type=int,
+            default=2,
+            help="Сколько процессов читают список рецептов (по умолчанию: 2)",
+        )
+        parser.add_argument(
+            "--operations",
+            type=int,
+            default=200,
+            help="Сколько операций выполняет каждый процесс "
+            "(по умолчанию: 200)",
+        )
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=1000,
+            help="Сколько рецептов в базе (по умолчанию: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        reports = run_benchmark(
+            options["processes"],
+            options["operations"],
+            options["recipes"],
+            options["readers"],
+        )
+        self.stdout.write(
+            f"{'режим':<10} {'':<6} {'операций/с':>11} {'ошибок':>7} "
+            f"{'p50':>10} {'p95':>10} {'p99':>10}"
+        )
+        for writes, reads in reports:
+            for kind, report in (("запись", writes), ("чтение", reads)):
+                if report is None:
+                    continue
+                self.stdout.write(
+                    f"{report.mode:<10} {kind:<6} "
+                    f"{report.throughput:>11.1f} {report.errors:>7} "
+                    f"{report.percentile(50):>8.2f}мс "
+                    f"{report.percentile(95):>8.2f}мс "
+                    f"{report.percentile(99):>8.2f}мс"
+                )
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.startup import measure_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет холодный старт воркера в новом процессе: фазы запуска, "
+        "ready() приложений и самые дорогие импорты"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Сколько самых дорогих модулей и пакетов показать",
+        )
+
+    def _ms(self, seconds):
+        return f"{seconds * 1000:8.1f} мс"
+
+    def handle(self, *args, **options):
+        report = measure_startup()
+        top = options["top"]
+
+        self.stdout.write("Фазы запуска:")
+        for name, seconds in report.phases.items():
+            self.stdout.write(f"  {self._ms(seconds)}  {name}")
+        self.stdout.write(
+            f"  {self._ms(report.total)}  всего "
+            f"(процесс целиком: {self._ms(report.process).strip()}, "
+            f"модулей: {len(report.modules)}, "
+            f"первый запрос: HTTP {report.status})"
+        )
+
+        self.stdout.write("\nready() приложений:")
+        for label, seconds in sorted(
+            report.ready.items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f"  {self._ms(seconds)}  {label}")
+
+        self.stdout.write("\nПакеты (собственное время импорта):")
+        for package, seconds in report.packages()[:top]:
+            self.stdout.write(f"  {self._ms(seconds)}  {package}")
+
+        self.stdout.write("\nМодули (собственное / с вложенными):")
+        for name, own, cumulative in report.imports[:top]:
+            self.stdout.write(
+                f"  {self._ms(own)} {self._ms(cumulative)}  {name}"
+            )
+
+        budget = settings.STARTUP_BUDGET_SECONDS
+        if not budget:
+            return
+        if report.total > budget:
+            # Ненулевой код выхода, чтобы замер можно было ставить в CI.
+            raise CommandError(
+                f"Холодный старт {report.total:.3f} с превышает бюджет "
+                f"{budget} с"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"\nУкладывается в бюджет {budget} с")
+        )
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.warmup import http_fetch, local_fetch, warm, warmup_paths
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогревает первые страницы рецептов, каталог продуктов и "
+        "популярные рецепты — в этом процессе или по HTTP на сервере"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help="Адрес запущенного сервера, например http://localhost:8000 "
+            "(по умолчанию запросы выполняются в этом процессе)",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=settings.WARMUP_PAGES,
+            help="Сколько первых страниц /api/recipes/ запросить",
+        )
+        parser.add_argument(
+            "--popular",
+            type=int,
+            default=settings.WARMUP_POPULAR_RECIPES,
+            help="Сколько самых популярных рецептов запросить",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.WARMUP_CONCURRENCY,
+            help="Сколько запросов выполнять параллельно",
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=settings.WARMUP_BUDGET_SECONDS,
+            help="Сколько секунд можно потратить на прогрев",
+        )
+
+    def handle(self, *args, **options):
+        fetch = (
+            http_fetch(options["url"], timeout=options["budget"])
+            if options["url"]
+            else local_fetch()
+        )
+        report = warm(
+            warmup_paths(options["pages"], options["popular"]),
+            fetch,
+            options["concurrency"],
+            options["budget"],
+        )
+        for path, error in report.failed:
+            self.stderr.write(f"{path}: {error}")
+        self.stdout.write(self.style.SUCCESS(f"Прогрев: {report}"))
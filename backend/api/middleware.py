@@ -0,0 +1,26 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+
+@sync_and_async_middleware
+def rate_limit_headers_middleware(get_response):
+    """Добавляет к ответу заголовки X-RateLimit-* от CostThrottle."""
+
+    def add_headers(request, response):
+        rate_limit = getattr(request, "rate_limit", None)
+        if rate_limit is not None:
+            for header, value in rate_limit.headers().items():
+                response.headers.setdefault(header, value)
+        return response
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            return add_headers(request, await get_response(request))
+
+    else:
+
+        def middleware(request):
+            return add_headers(request, get_response(request))
+
+    return middleware
@@ -0,0 +1,40 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from foodgram.db_router import (
+    is_pinned_to_primary,
+    pin_to_primary,
+    start_replica_reads,
+    stop_replica_reads,
+)
+
+
+class ReplicaReadMixin:
+    """Читает из реплик на безопасных запросах.
+
+    После успешной записи пользователь на время
+    DB_REPLICA_STICKY_SECONDS читает только из основной базы.
+    """
+
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(
+            request.user.pk
+        ):
+            self._replica_token = start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            stop_replica_reads(self._replica_token)
+            self._replica_token = None
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            pin_to_primary(request.user.pk)
+        return response
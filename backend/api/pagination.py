@@ -1,6 +1,55 @@
+from django.core.paginator import InvalidPage
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 
+from api.filters import SEARCH_RANK
+from recipes.paginator import EstimatedCountPaginator
+
+
+class UserPaginator(EstimatedCountPaginator):
+    """Не считает COUNT(*) по всей таблице пользователей.
+
+    Без фильтров берёт оценку размера таблицы, а выдачу поиска
+    ограничивает `search_count_limit` лучшими совпадениями.
+    """
+
+    search_count_limit = 1000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and SEARCH_RANK in query.annotations:
+            return self.object_list[: self.search_count_limit].count()
+        return super().count
+
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = "limit"
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            ) from exc
+
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
+
+
+class UserPageNumberPagination(CustomPageNumberPagination):
+    django_paginator_class = UserPaginator
@@ -0,0 +1,44 @@
+from django.db.models import Prefetch
+
+from recipes.graph import subscription_graph
+from recipes.models import (
+    Favorite,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+)
+from recipes.user_recipes import auser_recipe_ids
+
+USER_RECIPE_MODELS = (Favorite, ShoppingCart)
+
+
+def recipe_ingredients_prefetch():
+    return Prefetch(
+        "recipe_ingredients",
+        queryset=RecipeIngredient.objects.select_related("ingredient"),
+    )
+
+
+def recipes_for(user):
+    # is_favorited и is_in_shopping_cart берутся из кэша id
+    # (recipes.user_recipes), а не из подзапросов на каждую строку.
+    return Recipe.objects.select_related("author").prefetch_related(
+        recipe_ingredients_prefetch()
+    )
+
+
+async def aload_user_recipe_ids(user):
+    """Готовит id избранного и покупок для контекста сериализатора."""
+    if not user.is_authenticated:
+        return {}
+    return {
+        model: await auser_recipe_ids(model, user.pk)
+        for model in USER_RECIPE_MODELS
+    }
+
+
+async def aload_subscribed_authors(user):
+    """Готовит подписки пользователя для контекста сериализатора."""
+    if not user.is_authenticated:
+        return ()
+    return await subscription_graph.afollowing(user.pk)
@@ -1,11 +1,21 @@
+from django.contrib.auth.hashers import make_password
 from django.db import transaction
+from django.db.models import prefetch_related_objects
+from djoser.conf import settings as djoser_settings
+from djoser.serializers import (
+    UserCreateSerializer as DjoserUserCreateSerializer,
+)
 from djoser.serializers import (
     UserSerializer as DjoserUserSerializer,
 )
 from rest_framework import serializers
+from rest_framework.utils import html
 
-from api.fields import Base64ImageField
+from api.fields import Base64ImageField, CatalogPrimaryKeyRelatedField
+from api.querysets import recipe_ingredients_prefetch
+from recipes.graph import subscription_graph
 from recipes.models import (
+    Change,
     Favorite,
     Ingredient,
     Recipe,
@@ -13,6 +23,8 @@ from recipes.models import (
     ShoppingCart,
     User,
 )
+from recipes.nutrition import NUTRIENTS, totals
+from recipes.user_recipes import user_recipe_ids
 from recipes.validators import (
     validate_ingredients_uniqueness,
 )
@@ -28,14 +40,34 @@ class UserSerializer(DjoserUserSerializer):
 
     def get_is_subscribed(self, user):
         request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and (
-                getattr(user, "is_subscribed_annotation", None)
-                or user.author_subscriptions.filter(user=request.user).exists()
+        if not (request and request.user.is_authenticated):
+            return False
+        # Подписки текущего пользователя из графа в памяти процесса;
+        # async-вьюхи кладут их в контекст заранее.
+        if "subscribed_authors" not in self.context:
+            self.context["subscribed_authors"] = subscription_graph.following(
+                request.user.pk
             )
+        return user.pk in self.context["subscribed_authors"]
+
+
+class UserCreateSerializer(DjoserUserCreateSerializer):
+    def perform_create(self, validated_data):
+        # Пароль хэшируется до транзакции: с BEGIN IMMEDIATE (SQLITE_OPTIONS)
+        # SQLite держал бы блокировку записи всё время хэширования. Дальше
+        # то же, что UserManager.create_user и djoser, но одним INSERT:
+        # сразу с хэшем и is_active.
+        password = make_password(validated_data.pop("password"))
+        user = User(
+            **validated_data,
+            password=password,
+            is_active=not djoser_settings.SEND_ACTIVATION_EMAIL,
         )
+        user.email = User.objects.normalize_email(user.email)
+        user.username = user.normalize_username(user.username)
+        with transaction.atomic():
+            user.save(force_insert=True)
+        return user
 
 
 class SetAvatarSerializer(serializers.ModelSerializer):
@@ -72,10 +104,34 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = html.parse_html_list(data, default=[])
+        # Все продукты рецепта загружаются одним запросом, а не запросом
+        # на каждый элемент; неверные id поле отклонит само.
+        field = self.child.fields["id"]
+        ids = set()
+        if isinstance(data, list):
+            for item in data:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    ids.add(field.to_pk(item.get("id")))
+                except (TypeError, ValueError):
+                    continue
+        ids.discard(None)
+        field.catalog = field.get_queryset().in_bulk(ids)
+        return super().to_internal_value(data)
+
+
 class RecipeIngredientCreateSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = CatalogPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(min_value=1)
 
+    class Meta:
+        list_serializer_class = RecipeIngredientListSerializer
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientCreateSerializer(many=True, required=True)
@@ -123,23 +179,83 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ]
         )
 
-    @transaction.atomic
+    def _update_ingredients(self, recipe, ingredients_data):
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        amounts = {
+            ingredient_data["id"].id: ingredient_data["amount"]
+            for ingredient_data in ingredients_data
+        }
+
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.recipe_ingredients.filter(
+                ingredient_id__in=removed
+            ).delete()
+
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ("amount",))
+
+        self._save_ingredients(
+            recipe,
+            [
+                ingredient_data
+                for ingredient_data in ingredients_data
+                if ingredient_data["id"].id not in current
+            ],
+        )
+
+    @staticmethod
+    def _store_image(image):
+        field = Recipe._meta.get_field("image")
+        return field.storage.save(
+            field.generate_filename(None, image.name),
+            image,
+            max_length=field.max_length,
+        )
+
+    @staticmethod
+    def _nutrition(ingredients_data):
+        # Продукты уже загружены полем id: суммы считаются без запросов.
+        return totals(
+            (ingredient_data["id"], ingredient_data["amount"])
+            for ingredient_data in ingredients_data
+        )
+
     def create(self, validated_data):
         ingredients_data = validated_data.pop("ingredients")
-        recipe = super().create(validated_data)
-        self._save_ingredients(recipe, ingredients_data)
+        validated_data["image"] = self._store_image(validated_data["image"])
+        validated_data.update(self._nutrition(ingredients_data))
+
+        with transaction.atomic():
+            recipe = super().create(validated_data)
+            self._save_ingredients(recipe, ingredients_data)
         return recipe
 
-    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop("ingredients")
+        validated_data.update(self._nutrition(ingredients_data))
+        if "image" in validated_data:
+            validated_data["image"] = self._store_image(
+                validated_data["image"]
+            )
 
-        instance.recipe_ingredients.all().delete()
-        self._save_ingredients(instance, ingredients_data)
-
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            self._update_ingredients(instance, ingredients_data)
+            return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # Строки рецепта с продуктами одним запросом, а не запросом на
+        # продукт в RecipeIngredientSerializer.
+        prefetch_related_objects([instance], recipe_ingredients_prefetch())
         return RecipeDetailSerializer(instance, context=self.context).data
 
 
@@ -150,6 +266,7 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    nutrition = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -163,28 +280,34 @@ class RecipeDetailSerializer(serializers.ModelSerializer):
             "image",
             "text",
             "cooking_time",
+            "nutrition",
         )
         read_only_fields = fields
 
-    def _get_user_relation(self, obj, annotation_attr, model_class):
+    def _get_user_relation(self, obj, model_class):
         request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            if hasattr(obj, annotation_attr):
-                return getattr(obj, annotation_attr)
-            return model_class.objects.filter(
-                user=request.user, recipe=obj
-            ).exists()
-        return False
+        if not (request and request.user.is_authenticated):
+            return False
+        # Контекст общий для всех рецептов списка: множество id
+        # загружается один раз на ответ.
+        recipe_ids = self.context.setdefault("user_recipe_ids", {})
+        if model_class not in recipe_ids:
+            recipe_ids[model_class] = user_recipe_ids(
+                model_class, request.user.pk
+            )
+        return obj.pk in recipe_ids[model_class]
 
     def get_is_favorited(self, obj):
-        return self._get_user_relation(
-            obj, "is_favorited_annotation", Favorite
-        )
+        return self._get_user_relation(obj, Favorite)
 
     def get_is_in_shopping_cart(self, obj):
-        return self._get_user_relation(
-            obj, "is_in_shopping_cart_annotation", ShoppingCart
-        )
+        return self._get_user_relation(obj, ShoppingCart)
+
+    def get_nutrition(self, obj):
+        values = {nutrient: getattr(obj, nutrient) for nutrient in NUTRIENTS}
+        if all(value is None for value in values.values()):
+            return None
+        return values
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
@@ -194,6 +317,13 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class ChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Change
+        fields = ("id", "kind", "action", "object_id", "created_at")
+        read_only_fields = fields
+
+
 class UserWithRecipesSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.IntegerField(
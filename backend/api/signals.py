@@ -0,0 +1,68 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_token, invalidate_user_tokens
+from api.snapshots import (
+    forget_author,
+    forget_ingredient,
+    forget_recipe,
+    forget_recipes,
+)
+from recipes.models import Ingredient, Recipe, User
+from recipes.nutrition import nutrition_changed
+
+
+@receiver(post_delete, sender=Token)
+def drop_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(user_logged_out)
+def drop_logged_out_user_tokens(sender, user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
+
+
+@receiver(post_save, sender=User)
+def drop_changed_user_tokens(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    if created or (update_fields and set(update_fields) == {"last_login"}):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def drop_deleted_user_tokens(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def drop_changed_author_snapshots(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    if created or (update_fields and set(update_fields) == {"last_login"}):
+        return
+    forget_author(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def drop_recipe_snapshot(sender, instance, **kwargs):
+    forget_recipe(instance.pk)
+
+
+@receiver(nutrition_changed)
+def drop_recomputed_snapshots(sender, recipe_ids, **kwargs):
+    forget_recipes(recipe_ids)
+
+
+# Название и единица продукта есть в карточках и списках рецептов, а
+# updated_at рецептов при этом не меняется. pre_delete — пока строки
+# рецептов с продуктом ещё не удалены каскадом.
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def drop_ingredient_snapshots(sender, instance, **kwargs):
+    forget_ingredient(instance.pk)
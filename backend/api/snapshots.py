@@ -0,0 +1,254 @@
+"""
+Снимки публичных ответов API, которые nginx отдаёт без Django.
+
+В SNAPSHOT_ROOT пишутся ответы анонимному пользователю: карточки
+рецептов, первые страницы списка и каталог продуктов, каждый рядом с
+копией .gz для gzip_static. Файл переписывается, только если ответ
+изменился. Выгрузка перерисовывает рецепты, изменённые с прошлого
+запуска, и рецепты без снимка, а снимки удалённых рецептов удаляет.
+
+Изменения рецептов, авторов и продуктов сразу удаляют затронутые снимки
+(forget_*), и до следующей выгрузки nginx отправляет эти запросы в
+Django.
+"""
+
+import gzip
+import math
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.querysets import recipes_for
+from api.serializers import RecipeDetailSerializer
+from api.views import IngredientViewSet, RecipeViewSet
+from recipes.models import Recipe, RecipeIngredient
+
+RECIPES_DIR = "recipes"
+LIST_DIR = "recipes/list"
+INGREDIENTS_FILE = "ingredients.json"
+STATE_FILE = ".exported_at"
+CHUNK_SIZE = 500
+# Рецепт, сохранённый до начала прошлой выгрузки, но закоммиченный
+# после её чтения, попадёт в следующую благодаря перекрытию.
+OVERLAP = timedelta(minutes=5)
+
+
+@dataclass
+class SnapshotReport:
+    rendered: int = 0
+    written: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"отрисовано: {self.rendered}, записано: {self.written}, "
+            f"удалено: {self.removed} за {self.seconds:.2f} с"
+        )
+
+
+def _root():
+    return Path(settings.SNAPSHOT_ROOT) if settings.SNAPSHOT_ROOT else None
+
+
+def _write(path, content):
+    """Атомарно пишет файл и его .gz; False, если содержимое то же."""
+    try:
+        if path.read_bytes() == content:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Сначала .gz: пока есть .json, рядом лежит его сжатая копия.
+    for target, data in (
+        (path.with_name(path.name + ".gz"), gzip.compress(content, mtime=0)),
+        (path, content),
+    ):
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, target)
+    return True
+
+
+def _remove(path):
+    path.unlink(missing_ok=True)
+    path.with_name(path.name + ".gz").unlink(missing_ok=True)
+
+
+def _remove_lists(root):
+    for path in (root / LIST_DIR).glob("*.json"):
+        _remove(path)
+
+
+def _on_commit(func):
+    root = _root()
+    if root is not None:
+        transaction.on_commit(lambda: func(root))
+
+
+def forget_recipes(recipe_ids):
+    def forget(root):
+        for recipe_id in recipe_ids:
+            _remove(root / RECIPES_DIR / f"{recipe_id}.json")
+        _remove_lists(root)
+
+    _on_commit(forget)
+
+
+def forget_recipe(recipe_id):
+    forget_recipes((recipe_id,))
+
+
+def forget_author(author_id):
+    def forget(root):
+        for recipe_id in Recipe.objects.filter(
+            author_id=author_id
+        ).values_list("pk", flat=True):
+            _remove(root / RECIPES_DIR / f"{recipe_id}.json")
+        _remove_lists(root)
+
+    _on_commit(forget)
+
+
+def forget_ingredient(ingredient_id):
+    """Удаляет каталог продуктов и снимки рецептов с этим продуктом.
+
+    Рецепты ищутся сразу, а не после коммита: при удалении продукта его
+    строки в рецептах удаляются каскадом в той же транзакции.
+    """
+    if _root() is None:
+        return
+    recipe_ids = list(
+        RecipeIngredient.objects.filter(ingredient_id=ingredient_id)
+        .values_list("recipe_id", flat=True)
+        .distinct()
+    )
+
+    def forget(root):
+        _remove(root / INGREDIENTS_FILE)
+        for recipe_id in recipe_ids:
+            _remove(root / RECIPES_DIR / f"{recipe_id}.json")
+        if recipe_ids:
+            _remove_lists(root)
+
+    _on_commit(forget)
+
+
+def _request_factory(base_url):
+    url = urlsplit(base_url)
+    return RequestFactory(
+        HTTP_HOST=url.netloc,
+        **{"wsgi.url_scheme": url.scheme or "http"},
+    )
+
+
+def _render_view(view, request):
+    response = view(request)
+    if response.status_code != 200:
+        raise ValueError(
+            f"{request.get_full_path()}: HTTP {response.status_code}"
+        )
+    return response.render().content
+
+
+def _export_lists(root, factory, pages, limits, report):
+    view = RecipeViewSet.as_view({"get": "list"}, throttle_classes=())
+    total = Recipe.objects.count()
+    queries = [{}]
+    for limit in limits:
+        last_page = max(min(pages, math.ceil(total / limit)), 1)
+        queries.extend(
+            {"page": page, "limit": limit} for page in range(1, last_page + 1)
+        )
+
+    kept = set()
+    for query in queries:
+        path = root / LIST_DIR / f"{urlencode(query) or 'index'}.json"
+        kept.add(path)
+        report.rendered += 1
+        report.written += _write(
+            path, _render_view(view, factory.get("/api/recipes/", query))
+        )
+    for path in (root / LIST_DIR).glob("*.json"):
+        if path not in kept:
+            _remove(path)
+            report.removed += 1
+
+
+def _export_recipes(root, factory, full, report):
+    state = root / STATE_FILE
+    since = None
+    if not full and state.exists():
+        since = datetime.fromisoformat(state.read_text().strip()) - OVERLAP
+
+    recipes_dir = root / RECIPES_DIR
+    exported = {
+        int(path.stem)
+        for path in recipes_dir.glob("*.json")
+        if path.stem.isdigit()
+    }
+    existing = set(Recipe.objects.values_list("pk", flat=True))
+    for recipe_id in exported - existing:
+        _remove(recipes_dir / f"{recipe_id}.json")
+        report.removed += 1
+
+    if since is None:
+        stale = existing
+    else:
+        stale = (existing - exported) | set(
+            Recipe.objects.filter(updated_at__gte=since).values_list(
+                "pk", flat=True
+            )
+        )
+
+    request = Request(factory.get("/api/recipes/"))
+    renderer = JSONRenderer()
+    stale = sorted(stale)
+    for start in range(0, len(stale), CHUNK_SIZE):
+        for recipe in recipes_for(request.user).filter(
+            pk__in=stale[start : start + CHUNK_SIZE]
+        ):
+            report.rendered += 1
+            report.written += _write(
+                recipes_dir / f"{recipe.pk}.json",
+                renderer.render(
+                    RecipeDetailSerializer(
+                        recipe, context={"request": request}
+                    ).data
+                ),
+            )
+
+
+def export_snapshots(root, base_url, pages, limits, full=False):
+    """Выгружает снимки в `root`; без `full` — только изменения."""
+    started = time.monotonic()
+    exported_at = timezone.now()
+    root = Path(root)
+    factory = _request_factory(base_url)
+    report = SnapshotReport()
+
+    _export_recipes(root, factory, full, report)
+    _export_lists(root, factory, pages, limits, report)
+    view = IngredientViewSet.as_view({"get": "list"}, throttle_classes=())
+    report.rendered += 1
+    report.written += _write(
+        root / INGREDIENTS_FILE,
+        _render_view(view, factory.get("/api/ingredients/")),
+    )
+
+    (root / STATE_FILE).write_text(exported_at.isoformat())
+    report.seconds = time.monotonic() - started
+    return report
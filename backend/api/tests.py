@@ -1 +1,1683 @@
-# Create your tests here.
+import asyncio
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from threading import Barrier, Event
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Exists, OuterRef, Sum
+from django.test import (
+    AsyncRequestFactory,
+    LiveServerTestCase,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from api import async_views
+from api.authentication import CachedTokenAuthentication
+from api.cache import TTLCache
+from api.filters import IngredientFilter, RecipeFilter, UserFilter
+from api.querysets import recipes_for
+from api.snapshots import export_snapshots
+from api.throttling import CostThrottle, buckets, take
+from api.warmup import local_fetch, warm, warmup_paths
+from foodgram.asgi import application
+from foodgram.loadtest import compare, run_load_test
+from foodgram.startup import StartupReport, measure_startup
+from recipes.changes import change_feeds, compact, record_change
+from recipes.events import hub
+from recipes.graph import (
+    subscription_graph,
+)
+from recipes.models import (
+    Change,
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeRank,
+    ShoppingCart,
+    Subscription,
+    User,
+)
+from recipes.nutrition import recompute, recompute_for_ingredients
+from recipes.ranking import (
+    create_ranks,
+    rebuild,
+    record_added,
+)
+from recipes.relations import (
+    add_subscription,
+    add_user_recipe,
+)
+from recipes.shortlinks import LiveRecipeIds, decode, encode
+from recipes.testing import (
+    build_recipe,
+    create_recipe,
+    create_user,
+    worker_settings,
+)
+
+
+class ConcurrentRelationWritesTest(TransactionTestCase):
+    """Много клиентов одновременно жмут одну кнопку на одном рецепте."""
+
+    clients_count = 8
+    clicks_per_client = 3
+
+    def setUp(self):
+        self.author = create_user(
+            "author", first_name="Автор", last_name="Рецепта"
+        )
+        self.users = [
+            create_user(
+                f"user{number}",
+                first_name="Пользователь",
+                last_name=str(number),
+            )
+            for number in range(self.clients_count)
+        ]
+        self.recipe = create_recipe(
+            self.author,
+            "Борщ",
+            image="recipes/images/borscht.jpg",
+            text="Свёкла, капуста, терпение.",
+            cooking_time=90,
+        )
+
+    def hammer(self, method, url_for):
+        requests = [
+            user for user in self.users for _ in range(self.clicks_per_client)
+        ]
+        barrier = Barrier(len(requests))
+
+        def click(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                response = getattr(client, method)(url_for(user))
+                return user.pk, response.status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            results = list(executor.map(click, requests))
+
+        return {
+            user.pk: Counter(
+                status for user_id, status in results if user_id == user.pk
+            )
+            for user in self.users
+        }
+
+    def assert_one_success_per_user(self, statuses, success, duplicate):
+        for user_statuses in statuses.values():
+            self.assertEqual(
+                user_statuses,
+                Counter({success: 1, duplicate: self.clicks_per_client - 1}),
+            )
+
+    def test_favorite_and_cart(self):
+        for model, action in (
+            (Favorite, "favorite"),
+            (ShoppingCart, "shopping_cart"),
+        ):
+            with self.subTest(action=action):
+                url = f"/api/recipes/{self.recipe.pk}/{action}/"
+                self.assert_one_success_per_user(
+                    self.hammer("post", lambda user, url=url: url), 201, 400
+                )
+                self.assertEqual(
+                    model.objects.filter(recipe=self.recipe).count(),
+                    self.clients_count,
+                )
+
+                self.assert_one_success_per_user(
+                    self.hammer("delete", lambda user, url=url: url), 204, 404
+                )
+                self.assertFalse(
+                    model.objects.filter(recipe=self.recipe).exists()
+                )
+
+    def test_subscribe(self):
+        url = f"/api/users/{self.author.pk}/subscribe/"
+        self.assert_one_success_per_user(
+            self.hammer("post", lambda user: url), 201, 400
+        )
+        self.assertEqual(
+            Subscription.objects.filter(author=self.author).count(),
+            self.clients_count,
+        )
+
+        self.assert_one_success_per_user(
+            self.hammer("delete", lambda user: url), 204, 404
+        )
+        self.assertFalse(
+            Subscription.objects.filter(author=self.author).exists()
+        )
+
+
+class QueryPlanTest(TestCase):
+    """Горячие запросы не скатываются в полный просмотр таблицы.
+
+    На PostgreSQL последовательный просмотр выключается на время
+    EXPLAIN: на маленьких тестовых таблицах он дешевле индекса, а
+    выбрать его при выключенном enable_seqscan планировщик может,
+    только если подходящего индекса нет.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.user = (
+            create_user(username) for username in ("author", "reader")
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name="картофель", measurement_unit="г"
+        )
+        cls.recipe = create_recipe(
+            cls.author,
+            "Пюре",
+            image="recipes/images/puree.jpg",
+            text="Отварить и размять.",
+            cooking_time=30,
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=500
+        )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+        Subscription.objects.create(user=cls.user, author=cls.author)
+
+    def explain(self, queryset):
+        """Возвращает план запроса и найденные в нём проблемы."""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                steps = [row[-1] for row in cursor.fetchall()]
+                scans = [step for step in steps if step.startswith("SCAN ")]
+                return "\n".join(steps), {
+                    "seq_scan": any(" USING " not in scan for scan in scans),
+                    "index_scan": any(" USING " in scan for scan in scans),
+                    "sort": "USE TEMP B-TREE FOR ORDER BY" in steps,
+                }
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                cursor.execute("RESET enable_seqscan")
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes, types = [plan[0]["Plan"]], set()
+                while nodes:
+                    node = nodes.pop()
+                    if "Index Cond" not in node:
+                        types.add(node["Node Type"])
+                    nodes.extend(node.get("Plans", ()))
+                return json.dumps(plan, indent=2), {
+                    "seq_scan": "Seq Scan" in types,
+                    "index_scan": bool(
+                        types & {"Index Scan", "Index Only Scan"}
+                    ),
+                    "sort": bool(types & {"Sort", "Incremental Sort"}),
+                }
+        self.skipTest(f"Нет разбора планов для {connection.vendor}")
+
+    def assert_indexed(self, queryset, ordered=False):
+        """Проверяет, что запрос находит строки по индексу.
+
+        Запросу с сортировкой и LIMIT можно читать индекс целиком по
+        порядку (чтение остановится на первой странице), но не
+        сортировать результат отдельно.
+        """
+        plan, problems = self.explain(queryset)
+        self.assertFalse(
+            problems["seq_scan"], f"Полный просмотр таблицы:\n{plan}"
+        )
+        if ordered:
+            self.assertFalse(
+                problems["sort"], f"Сортировка в обход индекса:\n{plan}"
+            )
+        else:
+            self.assertFalse(
+                problems["index_scan"], f"Полный просмотр индекса:\n{plan}"
+            )
+
+    def recipes(self, user, **params):
+        request = RequestFactory().get("/api/recipes/")
+        request.user = user
+        return RecipeFilter(
+            data=params, queryset=recipes_for(user), request=request
+        ).qs[:6]
+
+    def test_recipe_list(self):
+        for name, params, ordered in (
+            ("newest", {}, True),
+            ("author", {"author": self.author.pk}, True),
+            ("popular", {"ordering": "popular"}, True),
+            ("trending", {"ordering": "trending"}, True),
+            ("favorited", {"is_favorited": 1}, True),
+            ("not_in_cart", {"is_in_shopping_cart": 0}, True),
+            ("authors", {"author__in": str(self.author.pk)}, False),
+            ("cooking_time", {"cooking_time__lte": 60}, True),
+            ("ingredients", {"ingredients": str(self.ingredient.pk)}, True),
+            (
+                "exclude_ingredients",
+                {"exclude_ingredients": str(self.ingredient.pk)},
+                True,
+            ),
+        ):
+            with self.subTest(name):
+                self.assert_indexed(
+                    self.recipes(self.user, **params), ordered=ordered
+                )
+
+    def test_recipe_list_anonymous(self):
+        self.assert_indexed(self.recipes(AnonymousUser()), ordered=True)
+
+    def test_recipe_prefetches(self):
+        recipe_ids = (self.recipe.pk,)
+        for name, queryset in (
+            (
+                "ingredients",
+                RecipeIngredient.objects.filter(
+                    recipe_id__in=recipe_ids
+                ).select_related("ingredient"),
+            ),
+            (
+                "subscribed",
+                Subscription.objects.filter(
+                    user=self.user, author_id__in={self.author.pk}
+                ),
+            ),
+            (
+                "author_recipes",
+                Recipe.objects.filter(author_id__in={self.author.pk}),
+            ),
+        ):
+            with self.subTest(name):
+                self.assert_indexed(queryset)
+
+    def test_ingredient_search(self):
+        self.assert_indexed(
+            IngredientFilter(
+                data={"name": "карт"}, queryset=Ingredient.objects.all()
+            ).qs
+        )
+
+    def test_user_search(self):
+        self.assert_indexed(
+            UserFilter(data={"search": "rea"}, queryset=User.objects.all()).qs[
+                :6
+            ]
+        )
+
+    def test_change_feed(self):
+        for name, feed in zip(
+            ("public", "private"),
+            change_feeds(self.user, since=0),
+            strict=True,
+        ):
+            with self.subTest(name):
+                self.assert_indexed(feed[:100], ordered=True)
+
+    def test_subscriptions(self):
+        self.assert_indexed(
+            User.objects.filter(author_subscriptions__user=self.user).annotate(
+                is_subscribed_annotation=Exists(
+                    Subscription.objects.filter(
+                        user=self.user, author=OuterRef("pk")
+                    )
+                )
+            )[:6]
+        )
+
+    def test_shopping_list(self):
+        self.assert_indexed(
+            RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__user=self.user
+            )
+            .values("ingredient__name", "ingredient__measurement_unit")
+            .annotate(total_amount=Sum("amount"))
+        )
+
+    def test_file_references(self):
+        for queryset in (
+            User.objects.filter(avatar="users/avatars/a.png"),
+            Recipe.objects.filter(image=self.recipe.image.name),
+        ):
+            with self.subTest(queryset.model._meta.model_name):
+                self.assert_indexed(queryset)
+
+
+class StartupImportsTest(SimpleTestCase):
+    """Холодный старт воркера укладывается в STARTUP_BUDGET_SECONDS и не
+    загружает модулей, нужных только позже.
+
+    Бюджет берётся из окружения; STARTUP_BUDGET_SECONDS=0 отключает
+    проверку времени на медленных машинах.
+    """
+
+    # Не должны загружаться до первого запроса.
+    lazy_modules = (
+        "api.admin",
+        "recipes.admin",
+        "rest_framework.authtoken.admin",
+        "social_core",
+        "social_django",
+        "rest_framework_simplejwt",
+        "jwt",
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.report = measure_startup()
+
+    def test_cold_start(self):
+        self.assertLess(self.report.status, 500)
+        self.assertEqual(
+            set(self.lazy_modules) & set(self.report.modules), set()
+        )
+
+    def test_budget(self):
+        budget = settings.STARTUP_BUDGET_SECONDS
+        if not budget:
+            self.skipTest("STARTUP_BUDGET_SECONDS=0")
+        self.assertLessEqual(self.report.total, budget)
+
+    def report_with(self, seconds):
+        return StartupReport(
+            phases={"django.setup()": seconds},
+            ready={},
+            imports=[],
+            modules=[],
+            status=200,
+            process=seconds,
+        )
+
+    def startup_report(self, seconds):
+        stdout = io.StringIO()
+        with mock.patch(
+            "api.management.commands.startup_report.measure_startup",
+            return_value=self.report_with(seconds),
+        ):
+            call_command("startup_report", stdout=stdout)
+        return stdout.getvalue()
+
+    @override_settings(STARTUP_BUDGET_SECONDS=1.0)
+    def test_report_fails_over_budget(self):
+        self.assertIn("Укладывается в бюджет", self.startup_report(0.5))
+        with self.assertRaisesMessage(CommandError, "превышает бюджет"):
+            self.startup_report(1.5)
+
+    @override_settings(STARTUP_BUDGET_SECONDS=0)
+    def test_report_without_budget(self):
+        self.assertNotIn("бюджет", self.startup_report(5.0))
+
+
+class EventStreamTest(TransactionTestCase):
+    """Поток /api/events/ под ASGI с LocalBackend вместо NOTIFY/LISTEN."""
+
+    def setUp(self):
+        self.user, self.author, self.stranger = (
+            create_user(username)
+            for username in ("reader", "author", "stranger")
+        )
+        self.token = Token.objects.create(user=self.user).key
+
+    async def open_stream(self, token=None):
+        headers = []
+        if token is not None:
+            headers.append((b"authorization", f"Token {token}".encode()))
+        sent = asyncio.Queue()
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        task = asyncio.create_task(
+            application(
+                {
+                    "type": "http",
+                    "method": "GET",
+                    "path": "/api/events/",
+                    "headers": headers,
+                    "query_string": b"",
+                },
+                receive,
+                sent.put,
+            )
+        )
+
+        async def next_message():
+            return await asyncio.wait_for(sent.get(), timeout=5)
+
+        return next_message, disconnected, task
+
+    def create_recipe(self, author):
+        return create_recipe(
+            author,
+            "Рагу",
+            image="recipes/images/ragout.jpg",
+            text="Тушить.",
+            cooking_time=40,
+        )
+
+    def test_anonymous(self):
+        async def run():
+            next_message, _, task = await self.open_stream()
+            self.assertEqual((await next_message())["status"], 401)
+            await task
+
+        asyncio.run(run())
+
+    def test_followed_and_favorited(self):
+        async def run():
+            next_message, disconnected, task = await self.open_stream(
+                self.token
+            )
+            self.assertEqual((await next_message())["status"], 200)
+            await next_message()  # retry:
+
+            await sync_to_async(add_subscription)(self.user.pk, self.author.pk)
+            await sync_to_async(self.create_recipe)(self.stranger)
+            recipe = await sync_to_async(self.create_recipe)(self.author)
+            body = (await next_message())["body"].decode()
+            self.assertIn("event: recipe_created", body)
+            self.assertIn(f'"recipe": {recipe.pk}', body)
+
+            await sync_to_async(add_user_recipe)(
+                Favorite, self.user.pk, recipe.pk
+            )
+            recipe.cooking_time = 50
+            await sync_to_async(recipe.save)()
+            body = (await next_message())["body"].decode()
+            self.assertIn("event: recipe_updated", body)
+
+            disconnected.set()
+            await asyncio.wait_for(task, timeout=5)
+            self.assertEqual(hub.stats()["connections"], 0)
+
+        asyncio.run(run())
+
+    @override_settings(WEB_CONCURRENCY=2)
+    def test_local_backend_with_several_workers(self):
+        # Соседние воркеры не получили бы событий: отказ на каждом
+        # подключении, а не тихая потеря.
+        async def run():
+            for _ in range(2):
+                _, _, task = await self.open_stream(self.token)
+                with self.assertRaises(ImproperlyConfigured):
+                    await asyncio.wait_for(task, timeout=5)
+
+        asyncio.run(run())
+
+
+class UserSearchTest(TestCase):
+    """Поиск пользователей без учёта регистра, в том числе кириллицы."""
+
+    def setUp(self):
+        for username, first_name, last_name in (
+            ("ivan", "Иван", "Петров"),
+            ("sidorova", "Ивана", "Сидорова"),
+            ("petrushka", "Пётр", "Смирнов"),
+            ("smirnova", "Анна", "Петренко"),
+        ):
+            create_user(username, first_name=first_name, last_name=last_name)
+
+    def search(self, value):
+        response = APIClient().get("/api/users/", {"search": value})
+        self.assertEqual(response.status_code, 200)
+        return [user["username"] for user in response.data["results"]]
+
+    def test_cyrillic_case(self):
+        for value in ("ива", "ИВА", "Ива", "иВа"):
+            with self.subTest(value):
+                self.assertEqual(self.search(value), ["ivan", "sidorova"])
+        self.assertEqual(self.search("петр"), ["ivan", "smirnova"])
+        self.assertEqual(self.search("СИДОР"), ["sidorova"])
+
+    def test_ranking(self):
+        for username, first_name in (("boris", "Катя"), ("катя", "Борис")):
+            create_user(username, first_name=first_name)
+        # Совпадение с началом username выше совпадения с именем, хотя по
+        # алфавиту boris раньше; при равенстве — по username.
+        self.assertEqual(self.search("кат"), ["катя", "boris"])
+        self.assertEqual(self.search("бор"), ["катя"])
+        self.assertEqual(self.search("bor"), ["boris"])
+        self.assertEqual(self.search("s"), ["sidorova", "smirnova"])
+
+    def test_every_word_matches(self):
+        self.assertEqual(self.search("иван петров"), ["ivan"])
+        self.assertEqual(self.search("иван смирнов"), [])
+
+    def test_renamed_user(self):
+        user = User.objects.get(username="ivan")
+        user.last_name = "Ёжиков"
+        user.save(update_fields=("last_name",))
+        self.assertEqual(self.search("ёжик"), ["ivan"])
+        self.assertEqual(self.search("петров"), [])
+
+
+class SQLiteModeTest(TestCase):
+    """Соединение SQLite открывается с настройками из SQLITE_OPTIONS."""
+
+    def test_pragmas(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Только для SQLite")
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("journal_mode", "synchronous", "busy_timeout")
+            }
+        self.assertEqual(
+            pragmas,
+            {
+                "journal_mode": "wal",
+                # NORMAL
+                "synchronous": 1,
+                "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+            },
+        )
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class UserRegistrationTest(TestCase):
+    def test_register_and_login(self):
+        client = APIClient()
+        response = client.post(
+            "/api/users/",
+            {
+                "email": "Reader@EXAMPLE.com",
+                "username": "reader",
+                "first_name": "Имя",
+                "last_name": "Фамилия",
+                "password": "MySecretPas$word",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            set(response.data),
+            {"id", "email", "username", "first_name", "last_name"},
+        )
+        self.assertEqual(response.data["email"], "Reader@example.com")
+        response = client.post(
+            "/api/auth/token/login/",
+            {"email": "Reader@example.com", "password": "MySecretPas$word"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_single_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post(
+                "/api/users/",
+                {
+                    "email": "reader@example.com",
+                    "username": "reader",
+                    "first_name": "Имя",
+                    "last_name": "Фамилия",
+                    "password": "MySecretPas$word",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        writes = [
+            query["sql"].split()[0]
+            for query in queries.captured_queries
+            if '"recipes_user"' in query["sql"]
+            and not query["sql"].startswith("SELECT")
+        ]
+        self.assertEqual(writes, ["INSERT"])
+
+    def test_activation_email_leaves_user_inactive(self):
+        # Регистрация идёт через perform_create djoser, а не в обход него.
+        djoser = {
+            **settings.DJOSER,
+            "SEND_ACTIVATION_EMAIL": True,
+            "ACTIVATION_URL": "activate/{uid}/{token}",
+        }
+        with override_settings(DJOSER=djoser):
+            response = APIClient().post(
+                "/api/users/",
+                {
+                    "email": "reader@example.com",
+                    "username": "reader",
+                    "first_name": "Имя",
+                    "last_name": "Фамилия",
+                    "password": "MySecretPas$word",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        user = User.objects.get(username="reader")
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password("MySecretPas$word"))
+
+
+class RecipeWriteQueriesTest(TestCase):
+    """Запись рецепта стоит одинаковое число запросов при любом числе
+    продуктов."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.client = APIClient()
+        self.client.force_authenticate(create_user("author"))
+        self.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"продукт {number}", measurement_unit="г")
+            for number in range(20)
+        )
+        image = io.BytesIO()
+        Image.new("RGB", (1, 1)).save(image, "PNG")
+        self.image = (
+            "data:image/png;base64,"
+            + base64.b64encode(image.getvalue()).decode()
+        )
+
+    def create(self, ingredients):
+        return self.client.post(
+            "/api/recipes/",
+            {
+                "name": "Рецепт",
+                "text": "Готовить.",
+                "cooking_time": 10,
+                "image": self.image,
+                "ingredients": [
+                    {"id": ingredient.pk, "amount": 10}
+                    for ingredient in ingredients
+                ],
+            },
+            format="json",
+        )
+
+    def test_constant_queries(self):
+        # Прогрев: граф подписок и кэш id загружаются один раз.
+        self.create(self.ingredients[:1])
+        with CaptureQueriesContext(connection) as few:
+            self.create(self.ingredients[:2])
+        with CaptureQueriesContext(connection) as many:
+            response = self.create(self.ingredients)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(
+            [item["id"] for item in response.data["ingredients"]],
+            [ingredient.pk for ingredient in self.ingredients],
+        )
+
+    def test_update_by_diff(self):
+        recipe = Recipe.objects.get(
+            pk=self.create(self.ingredients[:3]).data["id"]
+        )
+        image = recipe.image.name
+        rows = {
+            row.ingredient_id: row.pk
+            for row in recipe.recipe_ingredients.all()
+        }
+        _, second, third, fourth = self.ingredients[:4]
+        response = self.client.patch(
+            f"/api/recipes/{recipe.pk}/",
+            {
+                "image": self.image,
+                "ingredients": [
+                    {"id": second.pk, "amount": 25},
+                    {"id": third.pk, "amount": 10},
+                    {"id": fourth.pk, "amount": 5},
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        current = {
+            row.ingredient_id: row for row in recipe.recipe_ingredients.all()
+        }
+        self.assertEqual(
+            {pk: row.amount for pk, row in current.items()},
+            {second.pk: 25, third.pk: 10, fourth.pk: 5},
+        )
+        # Изменённая и прежняя строки обновлены на месте, а не пересозданы.
+        self.assertEqual(current[second.pk].pk, rows[second.pk])
+        self.assertEqual(current[third.pk].pk, rows[third.pk])
+        # Тот же файл не записан заново.
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, image)
+
+    def test_item_errors(self):
+        response = self.client.patch(
+            f"/api/recipes/{self.create(self.ingredients).data['id']}/",
+            {
+                "ingredients": [
+                    {"id": str(self.ingredients[0].pk), "amount": 1},
+                    {"id": 10**6, "amount": 1},
+                    {"id": "соль", "amount": 1},
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.data["ingredients"]
+        self.assertEqual(errors[0], {})
+        self.assertEqual(
+            [errors[1]["id"][0].code, errors[2]["id"][0].code],
+            ["does_not_exist", "incorrect_type"],
+        )
+
+
+@override_settings(THROTTLE_BURST=10**6, THROTTLE_RATE=10**6)
+class LoadTestHarnessTest(LiveServerTestCase):
+    """Сценарии из Postman-коллекции проходят без ошибок."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        author = create_user("author")
+        salt, _ = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in ("соль", "сахар")
+        )
+        recipe = create_recipe(
+            author, "Рассол", text="Растворить.", cooking_time=5
+        )
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=salt, amount=10
+        )
+
+    def test_run(self):
+        report = run_load_test(self.live_server_url, duration=1, users=3)
+        self.assertTrue(report.iterations)
+        self.assertFalse(report.aborted)
+        summary = report.summary()
+        self.assertEqual(summary["total"]["errors"], 0)
+        self.assertIn("GET /api/recipes/", summary["endpoints"])
+        self.assertFalse(
+            any(
+                comparison.regressed(0)
+                for comparison in compare(summary, summary)
+            )
+        )
+
+
+class TokenCacheTest(TestCase):
+    """Токен, отозванный в одном воркере, не принимается в другом."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.user = create_user()
+
+    def worker(self, number, shared):
+        return worker_settings(number, self.cache_dir if shared else None)
+
+    def authenticate(self, key):
+        return CachedTokenAuthentication().authenticate_credentials(key)
+
+    def test_token_logout(self):
+        token = Token.objects.create(user=self.user)
+        tokens = TTLCache(max_size=10, ttl=60)
+        with self.worker(1, shared=True):
+            with mock.patch("api.authentication.token_cache", tokens):
+                self.authenticate(token.key)
+                with self.assertNumQueries(0):
+                    self.authenticate(token.key)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        with self.worker(2, shared=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, 204)
+
+        with self.worker(1, shared=True):
+            with mock.patch("api.authentication.token_cache", tokens):
+                with self.assertRaises(AuthenticationFailed):
+                    self.authenticate(token.key)
+
+    def test_token_inactive_user(self):
+        token = Token.objects.create(user=self.user)
+        tokens = TTLCache(max_size=10, ttl=60)
+        with self.worker(1, shared=True):
+            with mock.patch("api.authentication.token_cache", tokens):
+                self.authenticate(token.key)
+
+        with self.worker(2, shared=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.is_active = False
+                self.user.save()
+
+        with self.worker(1, shared=True):
+            with mock.patch("api.authentication.token_cache", tokens):
+                with self.assertRaises(AuthenticationFailed):
+                    self.authenticate(token.key)
+
+    def test_token_process_local(self):
+        token = Token.objects.create(user=self.user)
+        with self.worker(1, shared=False):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    self.authenticate(token.key)
+
+
+class SuggestionsTest(TestCase):
+    def setUp(self):
+        self.user, self.friend, self.author, self.other = (
+            create_user(username)
+            for username in ("me", "friend", "author", "other")
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author)
+            for user, author in (
+                (self.user, self.friend),
+                (self.friend, self.author),
+                (self.friend, self.other),
+            )
+        )
+        subscription_graph.invalidate()
+        self.addCleanup(subscription_graph.invalidate)
+
+    def test_endpoint(self):
+        client = APIClient()
+        self.assertEqual(
+            client.get("/api/users/suggestions/").status_code, 401
+        )
+        client.force_authenticate(self.user)
+        response = client.get("/api/users/suggestions/", {"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (author["id"], author["is_subscribed"])
+                for author in response.json()
+            ],
+            [(self.author.pk, False)],
+        )
+        response = client.get("/api/users/suggestions/", {"limit": "много"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    DATABASE_REPLICAS=("replica",),
+    DB_REPLICA_STICKY_SECONDS=5,
+    THROTTLE_BURST=10**6,
+)
+class ReplicaRouterTest(TestCase):
+    """Чтения идут в реплику, пока пользователь ничего не записал.
+
+    «Реплика» — второй файл SQLite, снятый с тестовой базы до создания
+    данных: рецепты из теста в ней не видны.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if connection.vendor != "sqlite":
+            return
+        replica_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, replica_dir)
+        path = os.path.join(replica_dir, "replica.sqlite3")
+        # Своё соединение видит только закоммиченное: схему без данных.
+        with (
+            sqlite3.connect(connection.settings_dict["NAME"]) as source,
+            sqlite3.connect(path) as replica,
+        ):
+            source.backup(replica)
+        # Алиас добавлен после TestCase.setUpClass: общая транзакция
+        # класса открыта только в основной базе.
+        connections.settings["replica"] = {
+            **connection.settings_dict,
+            "NAME": path,
+        }
+        cls.addClassCleanup(connections.settings.pop, "replica")
+        cls.addClassCleanup(connections.__delitem__, "replica")
+        cls.addClassCleanup(lambda: connections["replica"].close())
+        cls.databases = {*cls.databases, "replica"}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.databases = cls.databases - {"replica"}
+        super().tearDownClass()
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Только для SQLite")
+        self.user = create_user()
+        self.recipe = create_recipe(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/recipes/{self.recipe.pk}/"
+
+    def test_read_your_writes(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        response = self.client.post(f"{self.url}favorite/")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(APIClient().get(self.url).status_code, 404)
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            }
+        },
+        WEB_CONCURRENCY=2,
+    )
+    def test_process_local_cache(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(APIClient().get(self.url).status_code, 404)
+
+
+class ShortLinkTest(TestCase):
+    def setUp(self):
+        self.author = create_user("author")
+        self.recipe = create_recipe(self.author)
+
+    def test_round_trip(self):
+        for salt in ("", "соль"):
+            with (
+                self.subTest(salt=salt),
+                override_settings(SHORT_LINK_SALT=salt),
+            ):
+                for recipe_id in (1, 10, 61, 62, 10**6, (1 << 48) - 1):
+                    code = encode(recipe_id)
+                    self.assertFalse(code.isdigit())
+                    self.assertEqual(decode(code), recipe_id)
+                for code in ("", "r", "10", "r!", "x10"):
+                    self.assertIsNone(decode(code))
+
+    def test_redirect(self):
+        response = APIClient().get(f"/api/recipes/{self.recipe.pk}/get-link/")
+        self.assertEqual(response.status_code, 200)
+        target = f"/recipes/{self.recipe.pk}/"
+        for url in (
+            response.data["short-link"],
+            # Ссылка, выданная до кодов base62.
+            f"/s/{self.recipe.pk}/",
+        ):
+            self.assertRedirects(
+                self.client.get(url), target, fetch_redirect_response=False
+            )
+
+        self.recipe.delete()
+        self.assertEqual(
+            self.client.get(f"/s/{self.recipe.pk}/").status_code, 404
+        )
+
+    def test_deleted_in_other_worker(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+
+        for shared in (True, False):
+            with self.subTest(shared=shared):
+                recipe_id = create_recipe(self.author).pk
+                # Карта первого воркера; второй сбрасывает только общую
+                # карту модуля.
+                live = LiveRecipeIds()
+                with worker_settings(1, shared and cache_dir):
+                    self.assertIn(recipe_id, live)
+                with worker_settings(2, shared and cache_dir):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        Recipe.objects.filter(pk=recipe_id).delete()
+                with worker_settings(1, shared and cache_dir):
+                    self.assertNotIn(recipe_id, live)
+
+
+@override_settings(THROTTLE_BURST=3, THROTTLE_RATE=1)
+class ThrottleTest(TestCase):
+    def setUp(self):
+        buckets.clear()
+        self.addCleanup(buckets.clear)
+        self.now = 1000.0
+        self.enterContext(
+            mock.patch("api.throttling.monotonic", lambda: self.now)
+        )
+
+    def test_burst_and_refill(self):
+        for remaining in (2, 1, 0):
+            rate_limit, wait = take("client", 1)
+            self.assertIsNone(wait)
+            self.assertEqual(rate_limit.remaining, remaining)
+        self.assertEqual(take("client", 1)[1], 1)
+        self.assertIsNone(take("other", 1)[1])
+
+        self.now += 0.5
+        self.assertEqual(take("client", 1)[1], 0.5)
+        self.now += 0.5
+        self.assertIsNone(take("client", 1)[1])
+
+        # Корзина пополняется не выше ёмкости.
+        self.now += 100
+        self.assertEqual(take("client", 1)[0].remaining, 2)
+        # Цена выше ёмкости урезается до неё, иначе запрос не прошёл бы
+        # никогда.
+        self.assertEqual(take("client", 10)[0].cost, 3)
+
+    @override_settings(THROTTLE_BYTES_PER_TOKEN=100)
+    def test_body_size_cost(self):
+        view = SimpleNamespace(throttle_costs={"create": 5}, action="create")
+        for size, cost in ((0, 5), (1, 6), (100, 6), (301, 9)):
+            request = RequestFactory().post(
+                "/api/recipes/",
+                b"x" * size,
+                content_type="application/octet-stream",
+            )
+            self.assertEqual(CostThrottle().get_cost(request, view), cost)
+
+    def test_reads_are_free(self):
+        client = APIClient()
+        for _ in range(10):
+            response = client.get("/api/recipes/")
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-RateLimit-Cost"], "0")
+        self.assertEqual(response["X-RateLimit-Remaining"], "3")
+
+    def test_forwarded_for(self):
+        client = APIClient(REMOTE_ADDR="172.18.0.5")
+        statuses = [
+            client.post(
+                "/api/auth/token/login/",
+                {"email": "nobody@example.com", "password": "password"},
+                # Левый адрес подставляет клиент, правый — nginx.
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{number}, 203.0.113.7",
+            ).status_code
+            for number in range(2)
+        ]
+        # Вход стоит 3 токена, вся корзина.
+        self.assertEqual(statuses, [400, 429])
+        response = client.post(
+            "/api/auth/token/login/",
+            {"email": "nobody@example.com", "password": "password"},
+            HTTP_X_FORWARDED_FOR="203.0.113.8",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ThrottleBrowsingTest(TestCase):
+    """Обычный сеанс на настройках по умолчанию не получает 429.
+
+    Время заморожено: корзина не пополняется, и весь сеанс должен
+    уложиться в THROTTLE_BURST.
+    """
+
+    def setUp(self):
+        buckets.clear()
+        self.addCleanup(buckets.clear)
+        self.enterContext(
+            mock.patch("api.throttling.monotonic", lambda: 1000.0)
+        )
+        self.authors = [create_user(f"author{number}") for number in range(5)]
+        self.recipes = [
+            create_recipe(
+                author,
+                f"Рецепт {number}",
+                image="recipes/images/dish.jpg",
+                text="Готовить.",
+                cooking_time=10,
+            )
+            for author in self.authors
+            for number in range(6)
+        ]
+
+    def test_session(self):
+        client = APIClient()
+        statuses = Counter()
+
+        def request(method, path, data=None):
+            response = getattr(client, method)(path, data, format="json")
+            statuses[response.status_code] += 1
+            return response
+
+        # Аноним листает каталог и открывает рецепты.
+        for page in range(1, 6):
+            request("get", "/api/recipes/", {"page": page})
+        for recipe in self.recipes:
+            request("get", f"/api/recipes/{recipe.pk}/")
+        request("get", "/api/ingredients/", {"name": "соль"})
+        for author in self.authors:
+            request("get", f"/api/users/{author.pk}/")
+
+        # Регистрируется, входит и продолжает уже с токеном.
+        request(
+            "post",
+            "/api/users/",
+            {
+                "email": "reader@example.com",
+                "username": "reader",
+                "first_name": "Имя",
+                "last_name": "Фамилия",
+                "password": "MySecretPas$word",
+            },
+        )
+        token = request(
+            "post",
+            "/api/auth/token/login/",
+            {"email": "reader@example.com", "password": "MySecretPas$word"},
+        ).data["auth_token"]
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        request("get", "/api/users/me/")
+        for recipe in self.recipes:
+            request("get", f"/api/recipes/{recipe.pk}/")
+            request("post", f"/api/recipes/{recipe.pk}/favorite/")
+            request("post", f"/api/recipes/{recipe.pk}/shopping_cart/")
+        for author in self.authors:
+            request("post", f"/api/users/{author.pk}/subscribe/")
+        request("get", "/api/users/subscriptions/", {"recipes_limit": 3})
+        for page in range(1, 6):
+            request("get", "/api/recipes/", {"page": page, "is_favorited": 1})
+        request("get", "/api/recipes/download_shopping_cart/")
+
+        self.assertNotIn(429, statuses)
+        self.assertEqual(set(statuses), {200, 201})
+
+
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        self.user, self.other = (
+            create_user(name) for name in ("user", "other")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def record(self, object_id, user=None, kind=Change.Kind.RECIPE):
+        record_change(kind, Change.Action.UPDATED, object_id, user and user.pk)
+        return Change.objects.latest("pk").pk
+
+    def feed(self, since, limit=100):
+        return self.client.get(
+            "/api/changes/", {"since": since, "limit": limit}
+        )
+
+    def test_paging(self):
+        start = self.client.get("/api/changes/").data["cursor"]
+        expected = [
+            self.record(1),
+            self.record(1, self.user, Change.Kind.FAVORITE),
+            self.record(2, self.other, Change.Kind.FAVORITE),
+            self.record(2),
+            self.record(3),
+        ]
+        del expected[2]
+
+        seen, cursor, has_more = [], start, True
+        while has_more:
+            response = self.feed(cursor, limit=2)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["changes"]), 2)
+            seen += [change["id"] for change in response.data["changes"]]
+            cursor, has_more = (
+                response.data["cursor"],
+                response.data["has_more"],
+            )
+        self.assertEqual(seen, expected)
+        self.assertEqual(cursor, expected[-1])
+        self.assertEqual(self.feed(cursor).data["changes"], [])
+
+        anonymous = APIClient().get("/api/changes/", {"since": start})
+        self.assertEqual(
+            [change["kind"] for change in anonymous.data["changes"]],
+            [Change.Kind.RECIPE] * 3,
+        )
+
+    def test_compaction(self):
+        old = [self.record(1), self.record(2)]
+        Change.objects.filter(pk__in=old).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        horizon = self.record(3)
+        # Перекрыта следующей записью о том же объекте.
+        self.record(4)
+        latest = self.record(4)
+
+        compact(retention_days=1)
+        response = self.feed(old[0])
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data["cursor"], latest)
+
+        # Курсор сразу перед горизонтом ничего не пропустил.
+        response = self.feed(horizon - 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [change["id"] for change in response.data["changes"]],
+            [horizon, latest],
+        )
+
+
+class RankingTest(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.old, self.new, self.unranked = Recipe.objects.bulk_create(
+            build_recipe(self.user, name, text="Готовить.", cooking_time=10)
+            for name in ("Старый", "Новый", "Без рейтинга")
+        )
+        # bulk_create обходит сигналы: строки рейтинга только у двух.
+        create_ranks((self.old.pk, self.new.pk))
+
+    def ordered(self, ordering, count=3):
+        response = APIClient().get("/api/recipes/", {"ordering": ordering})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], count)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_ordering(self):
+        month_ago = timezone.now() - timedelta(days=30)
+        for _ in range(3):
+            record_added(self.old.pk, month_ago)
+        record_added(self.new.pk)
+
+        self.assertEqual(
+            self.ordered("popular", count=2), [self.old.pk, self.new.pk]
+        )
+        self.assertEqual(
+            self.ordered("trending", count=2), [self.new.pk, self.old.pk]
+        )
+
+    def test_missing_rank_rows(self):
+        self.assertEqual(self.ordered("popular", count=2)[-1], self.old.pk)
+        # Пересчёт заводит строки всем рецептам.
+        rebuild()
+        self.assertEqual(
+            self.ordered("popular"),
+            [self.unranked.pk, self.new.pk, self.old.pk],
+        )
+
+
+@override_settings(THROTTLE_BURST=10**6)
+class AsyncViewsParityTest(TestCase):
+    """Async-версии GET-эндпоинтов отвечают так же, как вьюсеты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = (
+            create_user(name) for name in ("author", "reader")
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        salt, sugar = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit="г")
+            for name in ("соль", "сахар")
+        )
+        recipes = [
+            create_recipe(
+                cls.author,
+                f"Рецепт {number}",
+                text="Готовить.",
+                cooking_time=10 * number,
+            )
+            for number in range(1, 9)
+        ]
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=salt if recipe.cooking_time % 20 else sugar,
+                amount=5,
+            )
+            for recipe in recipes
+        )
+        Favorite.objects.create(user=cls.reader, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipes[1])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        cls.recipe = recipes[0]
+        cls.salt = salt
+
+    def assert_same(self, path, view, params=None, **kwargs):
+        for token in (None, self.token.key):
+            with self.subTest(path=path, params=params, token=bool(token)):
+                headers = {"Authorization": f"Token {token}"} if token else {}
+                expected = APIClient().get(path, params, headers=headers)
+                actual = async_to_sync(view)(
+                    AsyncRequestFactory().get(path, params, headers=headers),
+                    **kwargs,
+                )
+                self.assertEqual(actual.status_code, expected.status_code)
+                self.assertEqual(
+                    json.loads(actual.content), json.loads(expected.content)
+                )
+
+    def test_recipes(self):
+        for params in (
+            {},
+            {"page": 2, "limit": 3},
+            {"author": self.author.pk},
+            {"is_favorited": 1},
+            {"is_in_shopping_cart": 0},
+            {"cooking_time__lte": 40},
+            {"ingredients": str(self.salt.pk)},
+            {"ordering": "popular"},
+            {"author": "автор"},
+            {"ordering": "newest"},
+            {"page": 100},
+        ):
+            self.assert_same("/api/recipes/", async_views.recipe_list, params)
+
+    def test_recipe_detail(self):
+        for pk in (self.recipe.pk, 10**6):
+            self.assert_same(
+                f"/api/recipes/{pk}/", async_views.recipe_detail, pk=pk
+            )
+
+    def test_ingredients(self):
+        for params in ({}, {"name": "са"}, {"name": ""}):
+            self.assert_same(
+                "/api/ingredients/", async_views.ingredient_list, params
+            )
+        for pk in (self.salt.pk, 10**6):
+            self.assert_same(
+                f"/api/ingredients/{pk}/",
+                async_views.ingredient_detail,
+                pk=pk,
+            )
+
+
+class AdminAuthorFilterTest(TestCase):
+    """Фильтр рецептов по автору в админке — поле ввода псевдонима."""
+
+    def setUp(self):
+        self.alice, self.bob = (
+            create_user(username) for username in ("alice", "bob")
+        )
+        self.recipes = {
+            author.username: create_recipe(
+                author,
+                "Суп",
+                image="recipes/images/soup.jpg",
+                text="Варить.",
+                cooking_time=30,
+            )
+            for author in (self.alice, self.bob)
+        }
+        self.client.force_login(
+            create_user("admin", is_staff=True, is_superuser=True)
+        )
+
+    def test_filter_by_username(self):
+        response = self.client.get(
+            "/admin/recipes/recipe/", {"author_username": "alice"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context["cl"].result_list),
+            [self.recipes["alice"]],
+        )
+        self.assertContains(response, 'name="author_username" value="alice"')
+
+    def test_no_user_list(self):
+        # Боковая панель не перечисляет пользователей.
+        response = self.client.get("/admin/recipes/recipe/")
+        self.assertEqual(len(response.context["cl"].result_list), 2)
+        self.assertNotContains(response, "author__id__exact")
+        self.assertNotContains(response, "?author_username=bob")
+
+    def grow(self, count):
+        """Добавляет авторов с рецептами, продуктами и избранным."""
+        start = User.objects.count()
+        for number in range(start, start + count):
+            author = create_user(f"user{number}")
+            ingredient = Ingredient.objects.create(
+                name=f"продукт {number}", measurement_unit=f"ед{number % 3}"
+            )
+            recipe = create_recipe(
+                author,
+                f"Рецепт {number}",
+                image="recipes/images/soup.jpg",
+                text="Варить.",
+                cooking_time=30,
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+            Favorite.objects.create(user=self.alice, recipe=recipe)
+
+    def test_changelist_queries(self):
+        # Число запросов списка не зависит от числа строк на странице.
+        urls = (
+            "/admin/recipes/recipe/",
+            "/admin/recipes/user/",
+            "/admin/recipes/ingredient/",
+        )
+        self.grow(2)
+        counts = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[url] = len(queries)
+        self.grow(20)
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(counts[url]):
+                response = self.client.get(url)
+            self.assertGreater(len(response.context["cl"].result_list), 20)
+
+
+class WarmupTest(TransactionTestCase):
+    """Прогрев: какие страницы запрашиваются и как соблюдается бюджет."""
+
+    def setUp(self):
+        author = create_user("author")
+        # Восемь рецептов — две страницы по page_size = 6.
+        self.recipes = [
+            create_recipe(
+                author,
+                f"Рецепт {number}",
+                image="recipes/images/dish.jpg",
+                text="Готовить.",
+                cooking_time=10,
+            )
+            for number in range(8)
+        ]
+        for popularity, recipe in enumerate(self.recipes):
+            RecipeRank.objects.filter(recipe=recipe).update(
+                popularity=popularity
+            )
+
+    def test_paths(self):
+        self.assertEqual(
+            warmup_paths(pages=5, popular=3),
+            [
+                "/api/recipes/?page=1",
+                "/api/recipes/?page=2",
+                "/api/ingredients/",
+                *(
+                    f"/api/recipes/{recipe.pk}/"
+                    for recipe in self.recipes[:-4:-1]
+                ),
+            ],
+        )
+
+    def test_local_fetch(self):
+        paths = warmup_paths(pages=5, popular=3)
+        report = warm(paths, local_fetch(), concurrency=2, budget=30)
+        self.assertEqual(report.failed, [])
+        self.assertEqual((report.warmed, report.skipped), (len(paths), 0))
+        self.assertGreater(report.bytes, 0)
+
+    def test_budget(self):
+        released = Event()
+        self.addCleanup(released.set)
+
+        def fetch(path):
+            if path == "slow":
+                released.wait()
+            elif path == "broken":
+                raise ValueError(path)
+            return 1
+
+        report = warm(
+            ("fast", "broken", "slow", "next", "last"),
+            fetch,
+            concurrency=1,
+            budget=0.5,
+        )
+        # Зависший запрос не задерживает прогрев дольше бюджета, а он
+        # сам и оставшиеся пути считаются пропущенными.
+        self.assertLess(report.seconds, 5)
+        self.assertEqual((report.warmed, report.skipped), (1, 3))
+        self.assertEqual(report.failed, [("broken", "ValueError('broken')")])
+
+
+class SnapshotTest(TestCase):
+    """Выгрузка снимков для nginx и их удаление при изменениях."""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        self.enterContext(override_settings(SNAPSHOT_ROOT=str(self.root)))
+        self.author = create_user("author")
+        self.salt = Ingredient.objects.create(
+            name="соль", measurement_unit="г", calories=0
+        )
+        self.soup, self.cake = (
+            create_recipe(
+                self.author,
+                name,
+                image="recipes/images/dish.jpg",
+                text="Готовить.",
+                cooking_time=10,
+            )
+            for name in ("Суп", "Торт")
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.soup, ingredient=self.salt, amount=5
+        )
+        recompute()
+
+    def export(self, full=False):
+        return export_snapshots(
+            self.root, "http://testserver", pages=1, limits=(6,), full=full
+        )
+
+    def snapshot(self, recipe):
+        return self.root / "recipes" / f"{recipe.pk}.json"
+
+    def lists(self):
+        return sorted(
+            path.name for path in (self.root / "recipes/list").glob("*")
+        )
+
+    def test_export(self):
+        report = self.export()
+        self.assertEqual((report.rendered, report.written), (5, 5))
+        client = APIClient()
+        path = self.snapshot(self.soup)
+        self.assertEqual(
+            json.loads(path.read_bytes()),
+            client.get(f"/api/recipes/{self.soup.pk}/").json(),
+        )
+        self.assertEqual(
+            gzip.decompress(path.with_name(path.name + ".gz").read_bytes()),
+            path.read_bytes(),
+        )
+        self.assertEqual(
+            json.loads((self.root / "ingredients.json").read_bytes()),
+            client.get("/api/ingredients/").json(),
+        )
+        self.assertEqual(
+            self.lists(),
+            [
+                "index.json",
+                "index.json.gz",
+                "page=1&limit=6.json",
+                "page=1&limit=6.json.gz",
+            ],
+        )
+        # Ответы не изменились: файлы не переписываются.
+        self.assertEqual(self.export().written, 0)
+
+    def test_deleted_recipe(self):
+        self.export()
+        path = self.snapshot(self.cake)
+        Recipe.objects.filter(pk=self.cake.pk).delete()
+        self.assertEqual(self.export().removed, 1)
+        self.assertFalse(path.exists())
+
+    def test_recipe_change_forgets_snapshot(self):
+        self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.cooking_time = 20
+            self.soup.save()
+        self.assertFalse(self.snapshot(self.soup).exists())
+        self.assertTrue(self.snapshot(self.cake).exists())
+        self.assertEqual(self.lists(), [])
+
+    def test_author_change_forgets_snapshots(self):
+        self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = "Другое"
+            self.author.save()
+        self.assertFalse(self.snapshot(self.soup).exists())
+        self.assertFalse(self.snapshot(self.cake).exists())
+
+    def test_ingredient_change_forgets_snapshots(self):
+        self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.name = "соль морская"
+            self.salt.save()
+        self.assertFalse((self.root / "ingredients.json").exists())
+        self.assertFalse(self.snapshot(self.soup).exists())
+        self.assertTrue(self.snapshot(self.cake).exists())
+        self.assertEqual(self.lists(), [])
+        self.export()
+        self.assertEqual(
+            [
+                ingredient["name"]
+                for ingredient in json.loads(
+                    self.snapshot(self.soup).read_bytes()
+                )["ingredients"]
+            ],
+            ["соль морская"],
+        )
+
+    def test_ingredient_delete_forgets_snapshots(self):
+        self.export()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salt.delete()
+        self.assertFalse(self.snapshot(self.soup).exists())
+        self.export()
+        self.assertEqual(
+            json.loads(self.snapshot(self.soup).read_bytes())["ingredients"],
+            [],
+        )
+
+    def test_recompute_forgets_snapshot(self):
+        # Пересчёт обновляет рецепты через QuerySet.update(), без post_save.
+        self.export()
+        Ingredient.objects.filter(pk=self.salt.pk).update(calories=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recompute_for_ingredients((self.salt.pk,)), 1)
+        self.assertFalse(self.snapshot(self.soup).exists())
+        self.assertTrue(self.snapshot(self.cake).exists())
+        self.assertEqual(self.lists(), [])
+        self.export()
+        self.assertEqual(
+            json.loads(self.snapshot(self.soup).read_bytes())["nutrition"][
+                "calories"
+            ],
+            5,
+        )
@@ -0,0 +1,109 @@
+"""
+Взвешенный token bucket: у каждого действия своя цена в токенах.
+
+Корзина клиента вмещает THROTTLE_BURST токенов и пополняется со
+скоростью THROTTLE_RATE токенов в секунду. Запрос стоит
+`throttle_costs[action]` вьюсета или `throttle_cost` обычной вьюхи плюс
+токен за каждые THROTTLE_BYTES_PER_TOKEN байт тела. Действия без цены
+(чтение списков и карточек) бесплатны: лимит сдерживает записи и
+дорогие запросы, а не просмотр. DRF проверяет троттлинг до разбора
+тела, так что отказ не декодирует многомегабайтные base64-картинки.
+
+Корзины хранятся в памяти процесса: при нескольких воркерах лимит
+действует на каждый воркер отдельно, и клиент, чьи запросы расходятся
+по воркерам, в сумме получает до WEB_CONCURRENCY корзин. Анонимы
+различаются по IP из последнего адреса X-Forwarded-For (NUM_PROXIES).
+"""
+
+import math
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from api.cache import TTLCache
+
+# Корзина, не тронутая дольше, чем нужно на её заполнение, снова полна —
+# такую можно вытеснить без потери состояния.
+buckets = TTLCache(
+    max_size=settings.THROTTLE_CACHE_SIZE,
+    ttl=settings.THROTTLE_BURST / settings.THROTTLE_RATE,
+)
+_buckets_lock = Lock()
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    remaining: int
+    reset: int
+    cost: int
+
+    def headers(self):
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset),
+            "X-RateLimit-Cost": str(self.cost),
+        }
+
+
+def take(key, cost):
+    """Списывает `cost` токенов; возвращает (RateLimit, ожидание или None)."""
+    capacity, rate = settings.THROTTLE_BURST, settings.THROTTLE_RATE
+    cost = min(cost, capacity)
+    now = monotonic()
+    with _buckets_lock:
+        tokens, updated_at = buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        buckets.set(key, (tokens, now))
+
+    rate_limit = RateLimit(
+        limit=capacity,
+        remaining=math.floor(tokens),
+        reset=math.ceil((capacity - tokens) / rate),
+        cost=cost,
+    )
+    return rate_limit, None if allowed else (cost - tokens) / rate
+
+
+class CostThrottle(BaseThrottle):
+    default_cost = 0
+
+    def get_cost(self, request, view):
+        action = getattr(view, "action", None)
+        if action is None:
+            cost = getattr(view, "throttle_cost", self.default_cost)
+        else:
+            cost = getattr(view, "throttle_costs", {}).get(
+                action, self.default_cost
+            )
+        try:
+            body_size = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            body_size = 0
+        cost += math.ceil(body_size / settings.THROTTLE_BYTES_PER_TOKEN)
+        if hasattr(view, "get_throttle_cost"):
+            cost = view.get_throttle_cost(request, cost)
+        return cost
+
+    def get_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        rate_limit, self._wait = take(
+            self.get_key(request), self.get_cost(request, view)
+        )
+        # Заголовки к ответу добавляет RateLimitHeadersMiddleware.
+        request._request.rate_limit = rate_limit
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
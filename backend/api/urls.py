@@ -2,10 +2,18 @@
 URL configuration for API app.
 """
 
-from django.urls import include, path
+from django.conf import settings
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+from api.views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TokenCreateView,
+    UserViewSet,
+    cache_stats,
+    changes,
+)
 
 app_name = "api"
 
@@ -15,7 +23,22 @@ router.register(r"users", UserViewSet, basename="users")
 router.register(r"ingredients", IngredientViewSet, basename="ingredients")
 router.register(r"recipes", RecipeViewSet, basename="recipes")
 
-urlpatterns = (
+urlpatterns = ()
+
+if settings.ASYNC_VIEWS:
+    from api import async_views
+
+    urlpatterns += (
+        path("recipes/", async_views.recipe_list),
+        path("recipes/<int:pk>/", async_views.recipe_detail),
+        path("ingredients/", async_views.ingredient_list),
+        path("ingredients/<int:pk>/", async_views.ingredient_detail),
+    )
+
+urlpatterns += (
     path("", include(router.urls)),
+    re_path(r"^auth/token/login/?$", TokenCreateView.as_view(), name="login"),
     path("auth/", include("djoser.urls.authtoken")),
+    path("changes/", changes, name="changes"),
+    path("cache-stats/", cache_stats, name="cache_stats"),
 )
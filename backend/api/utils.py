@@ -13,11 +13,9 @@ def generate_shopping_list(user):
         .order_by("ingredient__name")
     )
 
-    recipes = (
-        user.shoppingcarts.select_related("recipe__author")
-        .distinct()
-        .order_by("recipe__name")
-    )
+    recipes = user.shoppingcarts.values(
+        "recipe__name", "recipe__author__username"
+    ).order_by("recipe__name")
 
     current_date = datetime.now().strftime("%d.%m.%Y")
 
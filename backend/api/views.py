@@ -1,22 +1,31 @@
-from django.db.models import Exists, OuterRef, Prefetch
 from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser.views import TokenCreateView as DjoserTokenCreateView
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import CustomPageNumberPagination
+from api.authentication import token_cache
+from api.filters import IngredientFilter, RecipeFilter, UserFilter
+from api.mixins import ReplicaReadMixin
+from api.pagination import (
+    CustomPageNumberPagination,
+    UserPageNumberPagination,
+)
 from api.permissions import IsAuthorOrReadOnly
+from api.querysets import recipes_for
 from api.serializers import (
+    ChangeSerializer,
     IngredientSerializer,
     RecipeDetailSerializer,
     RecipeMinifiedSerializer,
@@ -25,39 +34,71 @@ from api.serializers import (
     UserSerializer,
     UserWithRecipesSerializer,
 )
+from api.throttling import buckets
 from api.utils import generate_shopping_list
+from recipes.changes import CursorExpired, changes_since, latest_cursor
+from recipes.events import hub
+from recipes.graph import subscription_graph, suggest_authors
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
-    Subscription,
     User,
 )
+from recipes.relations import (
+    add_subscription,
+    add_user_recipe,
+    remove_subscription,
+    remove_user_recipe,
+)
+from recipes.shortlinks import encode, live_recipes
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(ReplicaReadMixin, DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = CustomPageNumberPagination
+    pagination_class = UserPageNumberPagination
+    filterset_class = UserFilter
+    throttle_costs = {
+        "create": 3,
+        "set_password": 3,
+        "reset_password": 3,
+        "reset_password_confirm": 3,
+        "avatar": 3,
+        "subscribe": 2,
+        "subscriptions": 2,
+        "suggestions": 2,
+    }
+    # Без recipes_limit подписки отдают все рецепты каждого автора.
+    subscription_recipes_estimate = 20
+    recipes_per_throttle_token = 30
+    suggestions_max_limit = 50
 
     def get_queryset(self):
-        queryset = User.objects.all()
-
-        if self.request.user.is_authenticated:
-            queryset = queryset.annotate(
-                is_subscribed_annotation=Exists(
-                    Subscription.objects.filter(
-                        user=self.request.user, author=OuterRef("pk")
-                    )
-                )
-            )
-
-        return queryset
+        # is_subscribed берётся из графа подписок (recipes.graph).
+        return User.objects.all()
+
+    def get_throttle_cost(self, request, cost):
+        if self.action != "subscriptions":
+            return cost
+        try:
+            recipes_limit = int(request.query_params["recipes_limit"])
+        except (KeyError, ValueError):
+            recipes_limit = -1
+        if recipes_limit < 0:
+            recipes_limit = self.subscription_recipes_estimate
+        recipes = self.paginator.get_page_size(request) * recipes_limit
+        return cost + recipes // self.recipes_per_throttle_token
 
     def get_permissions(self):
-        if self.action in ("me", "avatar", "subscriptions", "subscribe"):
+        if self.action in (
+            "me",
+            "avatar",
+            "subscriptions",
+            "subscribe",
+            "suggestions",
+        ):
             return (IsAuthenticated(),)
         return super().get_permissions()
 
@@ -73,25 +114,15 @@ class UserViewSet(DjoserUserViewSet):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        if user.avatar:
-            user.avatar.delete(save=False)
         user.avatar = None
         user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=("get",), url_path="subscriptions")
     def subscriptions(self, request):
-        subscriptions = (
-            User.objects.filter(author_subscriptions__user=request.user)
-            .prefetch_related("recipes")
-            .annotate(
-                is_subscribed_annotation=Exists(
-                    Subscription.objects.filter(
-                        user=request.user, author=OuterRef("pk")
-                    )
-                )
-            )
-        )
+        subscriptions = User.objects.filter(
+            author_subscriptions__user=request.user
+        ).prefetch_related("recipes")
         page = self.paginate_queryset(subscriptions)
 
         serializer = UserWithRecipesSerializer(
@@ -99,22 +130,43 @@ class UserViewSet(DjoserUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=False, methods=("get",), url_path="suggestions")
+    def suggestions(self, request):
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError(
+                {"limit": "Ожидается целое число."}
+            ) from None
+        author_ids = suggest_authors(
+            request.user.pk, min(max(limit, 1), self.suggestions_max_limit)
+        )
+        authors = User.objects.in_bulk(author_ids)
+        serializer = UserSerializer(
+            [authors[pk] for pk in author_ids if pk in authors],
+            many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
+
     @action(detail=True, methods=("post", "delete"), url_path="subscribe")
     def subscribe(self, request, id=None):
         user = request.user
 
+        if not id.isdigit():
+            raise Http404(f"Пользователь с id {id} не найден")
+        author_id = int(id)
+
         if request.method == "DELETE":
-            # валит тесты
-            get_object_or_404(Subscription, user=user, author_id=id).delete()
+            if not remove_subscription(user.pk, author_id):
+                raise Http404("No Subscription matches the given query.")
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        author = get_object_or_404(User, id=id)
-        if user == author:
+        if user.pk == author_id:
             raise ValidationError("Нельзя подписаться на самого себя.")
 
-        _, created = Subscription.objects.get_or_create(
-            user=user, author=author
-        )
+        created = add_subscription(user.pk, author_id)
+        author = get_object_or_404(User, id=author_id)
         if not created:
             raise ValidationError(f"Вы уже подписаны на автора {author}.")
         serializer = UserWithRecipesSerializer(
@@ -123,7 +175,7 @@ class UserViewSet(DjoserUserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -131,26 +183,43 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class TokenCreateView(DjoserTokenCreateView):
+    # Каждая попытка входа проверяет пароль: подбор расходует токены.
+    throttle_cost = 3
+
+
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     filterset_class = RecipeFilter
     pagination_class = CustomPageNumberPagination
+    throttle_costs = {
+        "create": 5,
+        "update": 5,
+        "partial_update": 5,
+        "destroy": 2,
+        "download_shopping_cart": 10,
+    }
 
     @staticmethod
     def _handle_user_recipe_relation(request, pk, model_class):
         location = "избранном" if model_class == Favorite else "списке покупок"
         user = request.user
 
+        if not pk.isdigit():
+            raise Http404(f"Рецепт с id {pk} не найден")
+        recipe_id = int(pk)
+
         if request.method == "DELETE":
-            get_object_or_404(model_class, user=user, recipe_id=pk).delete()
+            if not remove_user_recipe(model_class, user.pk, recipe_id):
+                raise Http404(
+                    f"No {model_class._meta.object_name} matches the given query."
+                )
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        recipe = get_object_or_404(Recipe, pk=pk)
-        _, created = model_class.objects.get_or_create(
-            user=user, recipe=recipe
-        )
-        if not created:
+        recipe = add_user_recipe(model_class, user.pk, recipe_id)
+        if recipe is None:
+            recipe = get_object_or_404(Recipe, pk=recipe_id)
             raise ValidationError(
                 f"{model_class._meta.verbose_name}: "
                 f"Рецепт '{recipe.name}' уже в {location}."
@@ -161,28 +230,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def get_queryset(self):
-        queryset = Recipe.objects.select_related("author").prefetch_related(
-            Prefetch(
-                "recipe_ingredients",
-                queryset=RecipeIngredient.objects.select_related("ingredient"),
-            )
-        )
-
-        if self.request.user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited_annotation=Exists(
-                    Favorite.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-                is_in_shopping_cart_annotation=Exists(
-                    ShoppingCart.objects.filter(
-                        user=self.request.user, recipe=OuterRef("pk")
-                    )
-                ),
-            )
-
-        return queryset
+        return recipes_for(self.request.user)
 
     def get_serializer_class(self):
         if self.action in ("create", "update", "partial_update"):
@@ -210,10 +258,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=("get",), url_path="get-link")
     def get_link(self, request, pk=None):
-        if not Recipe.objects.filter(pk=pk).exists():
+        if not pk.isdigit() or int(pk) not in live_recipes:
             raise Http404(f"Рецепт с id {pk} не найден")
 
-        short_url_path = reverse("short_link_redirect", args=[pk])
+        short_url_path = reverse("short_link_redirect", args=[encode(int(pk))])
 
         return Response(
             {"short-link": request.build_absolute_uri(short_url_path)},
@@ -230,3 +278,64 @@ class RecipeViewSet(viewsets.ModelViewSet):
             filename="shopping_list.txt",
             content_type="text/plain",
         )
+
+
+CHANGES_DEFAULT_LIMIT = 100
+CHANGES_MAX_LIMIT = 1000
+
+
+def _query_int(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValidationError({name: "Ожидается целое число."}) from None
+
+
+@api_view(("get",))
+@permission_classes((AllowAny,))
+def changes(request):
+    """Лента изменений после курсора `since` для синхронизации клиента.
+
+    Без `since` отдаёт только текущий курсор: клиент, загрузивший данные
+    целиком, запоминает его и дальше запрашивает изменения после него.
+    """
+    if "since" not in request.query_params:
+        return Response(
+            {"cursor": latest_cursor(), "has_more": False, "changes": []}
+        )
+    since = _query_int(request, "since", 0)
+    limit = min(
+        max(_query_int(request, "limit", CHANGES_DEFAULT_LIMIT), 1),
+        CHANGES_MAX_LIMIT,
+    )
+    try:
+        page, has_more = changes_since(request.user, since, limit)
+    except CursorExpired:
+        return Response(
+            {
+                "detail": "Курсор устарел, нужна полная синхронизация.",
+                "cursor": latest_cursor(),
+            },
+            status=status.HTTP_410_GONE,
+        )
+    return Response(
+        {
+            "cursor": page[-1].pk if page else since,
+            "has_more": has_more,
+            "changes": ChangeSerializer(page, many=True).data,
+        }
+    )
+
+
+@api_view(("get",))
+@permission_classes((IsAdminUser,))
+def cache_stats(request):
+    return Response(
+        {
+            "auth_tokens": token_cache.stats(),
+            "events": hub.stats(),
+            "short_links": live_recipes.stats(),
+            "subscription_graph": subscription_graph.stats(),
+            "throttle_buckets": buckets.stats(),
+        }
+    )
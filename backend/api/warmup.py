@@ -0,0 +1,145 @@
+"""
+Прогрев после деплоя: первые страницы списка рецептов, каталог продуктов
+и самые популярные рецепты.
+
+Запросы идут либо внутрь текущего процесса (прогреваются импорты,
+соединения с базой и кэши процесса), либо по HTTP к запущенному серверу.
+Прогрев ограничен по времени: по истечении бюджета новые запросы не
+начинаются, а ждать уже начатые вызывающий код не обязан.
+"""
+
+import math
+import time
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+from api.pagination import CustomPageNumberPagination
+from recipes.models import Recipe, RecipeRank
+
+
+@dataclass
+class WarmupReport:
+    warmed: int = 0
+    failed: list = field(default_factory=list)
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"прогрето запросов: {self.warmed}, ошибок: {len(self.failed)}, "
+            f"пропущено по бюджету: {self.skipped}, "
+            f"получено: {self.bytes / 1024:.1f} КБ "
+            f"за {self.seconds:.2f} с"
+        )
+
+
+def warmup_paths(pages, popular):
+    pages = min(
+        pages,
+        math.ceil(
+            Recipe.objects.count() / CustomPageNumberPagination.page_size
+        ),
+    )
+    paths = [f"/api/recipes/?page={page}" for page in range(1, pages + 1)]
+    paths.append("/api/ingredients/")
+    paths.extend(
+        f"/api/recipes/{recipe_id}/"
+        for recipe_id in RecipeRank.objects.order_by(
+            "-popularity", "-recipe_id"
+        ).values_list("recipe_id", flat=True)[:popular]
+    )
+    return paths
+
+
+def local_fetch():
+    """Выполняет запрос через Django внутри текущего процесса."""
+    host = next(
+        (
+            host
+            for host in settings.ALLOWED_HOSTS
+            if host and not host.startswith(("*", "."))
+        ),
+        "localhost",
+    )
+
+    def fetch(path):
+        try:
+            response = Client(
+                HTTP_HOST=host, raise_request_exception=False
+            ).get(path)
+        finally:
+            connections.close_all()
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}")
+        return len(response.content)
+
+    return fetch
+
+
+def http_fetch(base_url, timeout):
+    def fetch(path):
+        with urllib.request.urlopen(
+            base_url.rstrip("/") + path, timeout=timeout
+        ) as response:
+            return len(response.read())
+
+    return fetch
+
+
+def warm(paths, fetch, concurrency, budget):
+    """Обходит `paths` не более чем в `concurrency` потоков за `budget` с."""
+    report = WarmupReport()
+    started = time.monotonic()
+    deadline = started + budget
+    pending = {}
+    paths = iter(paths)
+
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="warmup"
+    )
+    try:
+        while True:
+            while len(pending) < concurrency and time.monotonic() < deadline:
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending[executor.submit(fetch, path)] = path
+            if not pending:
+                break
+            done, _ = wait(
+                pending,
+                timeout=max(deadline - time.monotonic(), 0),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    report.bytes += future.result()
+                except Exception as exc:
+                    report.failed.append((path, repr(exc)))
+                else:
+                    report.warmed += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    report.skipped = len(pending) + sum(1 for _ in paths)
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def warm_process():
+    """Прогрев процесса при старте по настройкам WARMUP_*."""
+    return warm(
+        warmup_paths(settings.WARMUP_PAGES, settings.WARMUP_POPULAR_RECIPES),
+        local_fetch(),
+        settings.WARMUP_CONCURRENCY,
+        settings.WARMUP_BUDGET_SECONDS,
+    )
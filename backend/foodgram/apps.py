@@ -0,0 +1,32 @@
+from django.contrib import admin
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+from django.utils.functional import cached_property
+
+
+def check_discovered_admin_app(**kwargs):
+    admin.autodiscover()
+    return check_admin_app(**kwargs)
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    """Админка без autodiscover при старте процесса.
+
+    Модули admin.py импортируются при первом обращении к URL админки
+    или первом reverse() (см. LazyAdminURLs), а также перед системными
+    проверками manage.py.
+    """
+
+    def ready(self):
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_discovered_admin_app, checks.Tags.admin)
+
+
+class LazyAdminURLs:
+    """URLconf админки, который строится при первом разрешении адреса."""
+
+    @cached_property
+    def urlpatterns(self):
+        admin.autodiscover()
+        return admin.site.get_urls()
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модуль использует модели.
+from api import events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Поток событий обслуживается в обход обработчика Django (api.events).
+    if scope["type"] == "http" and scope["path"] == events.PATH:
+        return await events.event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
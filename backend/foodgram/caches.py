@@ -0,0 +1,57 @@
+"""
+Кэш Django как общее состояние воркеров.
+
+Данные в памяти процесса (id избранного и покупок, граф подписок,
+токены, короткие ссылки) сверяются с версиями в кэше Django: запись
+увеличивает версию, и любой воркер, увидев новую, перечитывает данные.
+Это работает, только если кэш общий для воркеров (Redis, REDIS_URL) или
+воркер один. С кэшем в памяти процесса и несколькими воркерами
+(WEB_CONCURRENCY) соседний воркер записи не увидит, поэтому модули,
+которым нужна свежесть, в этом случае читают из базы.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared():
+    """Видят ли все воркеры одно и то же содержимое кэша Django."""
+    return settings.WEB_CONCURRENCY <= 1 or not isinstance(
+        caches["default"], PROCESS_LOCAL_BACKENDS
+    )
+
+
+def get_version(key):
+    """Текущая версия по ключу; пропавшая из кэша заводится заново."""
+    version = cache.get(key)
+    if version is None:
+        # Новая версия больше любой выданной ранее этому ключу.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(key):
+    """Увеличивает версию; None, если её нет в кэше.
+
+    Отсутствующую версию заводить не нужно: следующее чтение заведёт
+    новую, и она не совпадёт ни с одной запомненной.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return None
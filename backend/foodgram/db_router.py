@@ -0,0 +1,73 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.caches import is_shared
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+class ReplicaRouter:
+    """Отправляет чтения в реплики внутри `replica_reads()`."""
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _replica_reads.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def start_replica_reads():
+    return _replica_reads.set(True)
+
+
+def stop_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        stop_replica_reads(token)
+
+
+def _pin_key(user_id):
+    return f"db-primary-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    if settings.DATABASE_REPLICAS and settings.DB_REPLICA_STICKY_SECONDS:
+        cache.set(_pin_key(user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    """Должен ли пользователь читать из основной базы.
+
+    Если кэш не общий для воркеров, отметку соседнего воркера не увидеть:
+    тогда чтения пользователя всегда идут в основную базу, а в реплики —
+    только анонимные.
+    """
+    return bool(
+        settings.DATABASE_REPLICAS
+        and user_id
+        and (not is_shared() or cache.get(_pin_key(user_id), False))
+    )
+
+
+async def ais_pinned_to_primary(user_id):
+    return bool(
+        settings.DATABASE_REPLICAS
+        and user_id
+        and (not is_shared() or await cache.aget(_pin_key(user_id), False))
+    )
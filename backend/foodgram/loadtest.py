@@ -0,0 +1,618 @@
+"""
+Нагрузочный прогон API по сценариям из Postman-коллекции.
+
+Запросы берутся из postman_collection/foodgram.postman_collection.json по
+имени: метод, адрес, заголовки, тело и авторизация с подстановкой
+{{переменных}}. Скрипты коллекции (JavaScript) не выполняются: какие
+переменные взять из ответа, задаёт шаг сценария (Step.extract).
+
+Виртуальные пользователи работают одновременно в одном цикле asyncio,
+у каждого своё keep-alive соединение HTTP/1.1. Каждая итерация выбирает
+сценарий по весу. Задержки собираются по эндпоинтам (метод и шаблон
+адреса); сводку можно сохранить как базовую и сравнивать с ней
+следующие прогоны.
+"""
+
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+COLLECTION = (
+    BASE_DIR.parent / "postman_collection" / "foodgram.postman_collection.json"
+)
+VARIABLE = re.compile(r"\{\{(\w+)\}\}")
+PERCENTILES = (50, 95, 99)
+# Что сравнивается с базовым прогоном: пропускная способность не должна
+# падать, p95 — расти больше допуска.
+COMPARED = ("throughput", "p95")
+# Перцентили эндпоинта с меньшим числом запросов слишком шумят, чтобы
+# сравнивать их между прогонами.
+MIN_COMPARED_REQUESTS = 20
+
+
+class LoadTestError(Exception):
+    """Коллекция или сервер не подходят для прогона."""
+
+
+class _MissingVariable(Exception):
+    pass
+
+
+class _Closed(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Request:
+    name: str
+    method: str
+    url: str
+    headers: tuple
+    body: bytes
+
+    @property
+    def endpoint(self):
+        path = VARIABLE.sub(r"{\1}", self.url.removeprefix("{{baseUrl}}"))
+        return f"{self.method} {path}"
+
+
+@dataclass(frozen=True)
+class Step:
+    request: str
+    # Переменная -> путь в JSON ответа ("results.0.id") или функция.
+    extract: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    weight: int
+    steps: tuple
+    # Выполняется один раз на виртуального пользователя.
+    setup: tuple = ()
+    # Каждая итерация регистрирует нового пользователя.
+    new_user: bool = False
+
+
+REGISTER = (
+    Step("create_first_user", {"userId": "id"}),
+    Step("get_token_for_first_user", {"userToken": "auth_token"}),
+    Step(
+        "get_ingredients_list // User",
+        {
+            "firstIndredientId": "0.id",
+            "secondIndredientId": "1.id",
+            "ingredientNameFirstLatter": lambda data: data[0]["name"][:1],
+        },
+    ),
+)
+
+SCENARIOS = (
+    Scenario(
+        "browse",
+        6,
+        steps=(
+            Step(
+                "get_recipes_list // No Auth",
+                {"firstRecipeId": "results.0.id"},
+            ),
+            Step("get_recipe_detail // No Auth"),
+            Step("get_recipe_short_link // No Auth"),
+        ),
+    ),
+    Scenario(
+        "shopper",
+        3,
+        setup=REGISTER,
+        steps=(
+            Step(
+                "get_recipes_list // User", {"firstRecipeId": "results.0.id"}
+            ),
+            Step("get_recipe_detail // User"),
+            Step("get_ingredients_list_with_name_filter // User"),
+            Step("add_to_favorite // User"),
+            Step("add_to_shopping_cart // User"),
+            Step("download_shopping_cart // User"),
+            Step("get_recipes_list_with_is_favorited_param // User"),
+            Step("remove_from_shopping_cart // User"),
+            Step("remove_from_favorite // User"),
+        ),
+    ),
+    Scenario(
+        "newcomer",
+        1,
+        new_user=True,
+        steps=(
+            *REGISTER,
+            Step("create_fifth_recipe // User", {"firstRecipeId": "id"}),
+            Step("add_to_favorite // User"),
+            Step("add_to_shopping_cart // User"),
+            Step("download_shopping_cart // User"),
+        ),
+    ),
+)
+
+
+def with_weights(weights, scenarios=SCENARIOS):
+    """Сценарии с другими весами; сценарии с весом 0 исключаются."""
+    unknown = set(weights) - {scenario.name for scenario in scenarios}
+    if unknown:
+        raise LoadTestError(f"Нет сценариев: {', '.join(sorted(unknown))}")
+    return tuple(
+        scenario
+        for scenario in (
+            replace(
+                scenario, weight=weights.get(scenario.name, scenario.weight)
+            )
+            for scenario in scenarios
+        )
+        if scenario.weight > 0
+    )
+
+
+def _auth_headers(auth):
+    if auth is None or auth["type"] == "noauth":
+        return ()
+    if auth["type"] == "apikey":
+        values = {item["key"]: item["value"] for item in auth["apikey"]}
+        if values.get("in", "header") == "header":
+            return ((values["key"], values["value"]),)
+    if auth["type"] == "bearer":
+        token = {item["key"]: item["value"] for item in auth["bearer"]}
+        return (("Authorization", f"Bearer {token['token']}"),)
+    raise LoadTestError(f"Авторизация {auth['type']} не поддерживается")
+
+
+def _request(name, request, inherited_auth):
+    auth = request.get("auth", inherited_auth)
+    if auth is not None and auth["type"] == "inherit":
+        auth = inherited_auth
+    headers = tuple(
+        (header["key"], header["value"])
+        for header in request.get("header", ())
+        if not header.get("disabled")
+    ) + _auth_headers(auth)
+    body = request.get("body") or {}
+    raw = body.get("raw", "") if body.get("mode") == "raw" else ""
+    language = body.get("options", {}).get("raw", {}).get("language")
+    if raw and language == "json":
+        if not any(key.lower() == "content-type" for key, _ in headers):
+            headers += (("Content-Type", "application/json"),)
+    url = request["url"]
+    return Request(
+        name=name,
+        method=request["method"],
+        url=url["raw"] if isinstance(url, dict) else url,
+        headers=headers,
+        body=raw.encode(),
+    )
+
+
+def load_collection(path=COLLECTION):
+    """Переменные коллекции и её запросы по имени."""
+    with open(path, encoding="utf-8") as file:
+        collection = json.load(file)
+    requests = {}
+
+    def walk(items, auth):
+        for item in items:
+            if "item" in item:
+                walk(item["item"], item.get("auth", auth))
+            else:
+                # Повторяющиеся имена в коллекции — одинаковые запросы.
+                requests.setdefault(
+                    item["name"], _request(item["name"], item["request"], auth)
+                )
+
+    walk(collection["item"], collection.get("auth"))
+    variables = {
+        variable["key"]: variable["value"]
+        for variable in collection.get("variable", ())
+    }
+    return variables, requests
+
+
+def _render(template, variables):
+    def value(match):
+        try:
+            return str(variables[match[1]])
+        except KeyError:
+            raise _MissingVariable(match[1]) from None
+
+    return VARIABLE.sub(value, template)
+
+
+def _extract(data, path):
+    if callable(path):
+        return path(data)
+    for key in path.split("."):
+        data = data[int(key)] if isinstance(data, list) else data[key]
+    return data
+
+
+def _target(url):
+    parts = urlsplit(url)
+    target = quote(parts.path or "/", safe="/%:@")
+    if parts.query:
+        target += "?" + quote(parts.query, safe="=&%+:/,")
+    return target
+
+
+class _Connection:
+    """Клиент HTTP/1.1 с keep-alive поверх потоков asyncio."""
+
+    def __init__(self, host, port, tls):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        default_port = 443 if tls else 80
+        self.host_header = host if port == default_port else f"{host}:{port}"
+        self._reader = self._writer = None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def request(self, method, target, headers, body):
+        reused = self._writer is not None
+        try:
+            return await self._exchange(method, target, headers, body)
+        except (_Closed, ConnectionResetError, BrokenPipeError):
+            self.close()
+            if not reused:
+                raise
+        # Сервер закрыл простаивавшее соединение: повтор на новом.
+        return await self._exchange(method, target, headers, body)
+
+    async def _exchange(self, method, target, headers, body):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.tls or None
+            )
+        lines = [
+            f"{method} {target} HTTP/1.1",
+            f"Host: {self.host_header}",
+            "Connection: keep-alive",
+            *(f"{key}: {value}" for key, value in headers),
+        ]
+        if body or method in ("POST", "PUT", "PATCH"):
+            lines.append(f"Content-Length: {len(body)}")
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self._writer.drain()
+        return await self._response(method)
+
+    async def _response(self, method):
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise _Closed
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if method == "HEAD" or status in (204, 304):
+            body = b""
+        elif headers.get("transfer-encoding") == "chunked":
+            body = await self._chunked()
+        elif "content-length" in headers:
+            body = await self._reader.readexactly(
+                int(headers["content-length"])
+            )
+        else:
+            body = await self._reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection") == "close":
+            self.close()
+        return status, body
+
+    async def _chunked(self):
+        chunks = []
+        while size := int((await self._reader.readline()).split(b";")[0], 16):
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readline()
+        # Завершающие заголовки (trailers) до пустой строки.
+        while (await self._reader.readline()) not in (b"\r\n", b""):
+            pass
+        return b"".join(chunks)
+
+
+def _percentiles(latencies):
+    """Перцентили задержки в миллисекундах."""
+    if len(latencies) < 2:
+        return {
+            f"p{percent}": sum(latencies) * 1000 for percent in PERCENTILES
+        }
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        f"p{percent}": quantiles[percent - 1] * 1000 for percent in PERCENTILES
+    }
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    # Код ответа -> число; None — ошибка соединения или тайм-аут.
+    statuses: Counter = field(default_factory=Counter)
+
+    @property
+    def errors(self):
+        return sum(
+            count
+            for status, count in self.statuses.items()
+            if status is None or status >= 400
+        )
+
+
+@dataclass
+class LoadReport:
+    users: int
+    elapsed: float
+    endpoints: dict
+    iterations: Counter
+    aborted: Counter
+
+    def statuses(self):
+        total = Counter()
+        for stats in self.endpoints.values():
+            total.update(stats.statuses)
+        return total
+
+    def _metrics(self, latencies, errors):
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": round(len(latencies) / self.elapsed, 2),
+            **{
+                name: round(value, 2)
+                for name, value in _percentiles(latencies).items()
+            },
+        }
+
+    def summary(self):
+        """Сводка для вывода и сохранения как базовой."""
+        return {
+            "users": self.users,
+            "elapsed": round(self.elapsed, 1),
+            "endpoints": {
+                endpoint: self._metrics(stats.latencies, stats.errors)
+                for endpoint, stats in sorted(self.endpoints.items())
+            },
+            "total": self._metrics(
+                [
+                    latency
+                    for stats in self.endpoints.values()
+                    for latency in stats.latencies
+                ],
+                sum(stats.errors for stats in self.endpoints.values()),
+            ),
+        }
+
+
+@dataclass(frozen=True)
+class Comparison:
+    endpoint: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self):
+        if not self.baseline:
+            return 0.0
+        return self.current / self.baseline - 1
+
+    def regressed(self, tolerance):
+        if self.metric == "throughput":
+            return self.change < -tolerance
+        return self.change > tolerance
+
+
+def compare(summary, baseline):
+    """Показатели COMPARED для итога и эндпоинтов, общих с базовым.
+
+    Эндпоинты, у которых в одном из прогонов меньше
+    MIN_COMPARED_REQUESTS запросов, не сравниваются.
+    """
+    rows = (("всего", summary["total"], baseline["total"]),) + tuple(
+        (endpoint, metrics, baseline["endpoints"][endpoint])
+        for endpoint, metrics in summary["endpoints"].items()
+        if endpoint in baseline["endpoints"]
+        and min(
+            metrics["requests"],
+            baseline["endpoints"][endpoint]["requests"],
+        )
+        >= MIN_COMPARED_REQUESTS
+    )
+    return [
+        Comparison(endpoint, metric, before[metric], current[metric])
+        for endpoint, current, before in rows
+        for metric in COMPARED
+    ]
+
+
+class _VirtualUser:
+    def __init__(self, test, number):
+        self.test = test
+        self.number = number
+        self.rng = random.Random(f"{test.seed}-{number}")
+        self.connection = _Connection(test.host, test.port, test.tls)
+        self.variables = {}
+        self.registered = 0
+
+    def _identity(self):
+        self.registered += 1
+        username = f"load-{self.test.run_id}-{self.number}-{self.registered}"
+        # В телах запросов коллекции строки подставляются вместе с кавычками.
+        return {
+            "username": json.dumps(username),
+            "email": json.dumps(f"{username}@example.com"),
+        }
+
+    async def run(self, deadline):
+        scenarios = self.test.scenarios
+        weights = [scenario.weight for scenario in scenarios]
+        try:
+            while time.monotonic() < deadline:
+                scenario = self.rng.choices(scenarios, weights)[0]
+                if await self._iteration(scenario):
+                    self.test.iterations[scenario.name] += 1
+                else:
+                    self.test.aborted[scenario.name] += 1
+        finally:
+            self.connection.close()
+
+    async def _iteration(self, scenario):
+        variables = self.variables.get(scenario.name)
+        if variables is None or scenario.new_user:
+            variables = {**self.test.variables, **self._identity()}
+            if not await self._steps(scenario.setup, variables):
+                return False
+            if not scenario.new_user:
+                self.variables[scenario.name] = variables
+        return await self._steps(scenario.steps, variables)
+
+    async def _steps(self, steps, variables):
+        """Выполняет шаги; False, если итерацию пришлось прервать."""
+        for step in steps:
+            request = self.test.requests[step.request]
+            try:
+                url = _render(request.url, variables)
+                headers = tuple(
+                    (key, _render(value, variables))
+                    for key, value in request.headers
+                )
+                body = _render(request.body.decode(), variables).encode()
+            except _MissingVariable:
+                # Нечего подставить: данные не пришли предыдущим шагом.
+                return False
+
+            stats = self.test.endpoints.setdefault(
+                request.endpoint, EndpointStats()
+            )
+            started = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.test.timeout):
+                    status, content = await self.connection.request(
+                        request.method, _target(url), headers, body
+                    )
+            except (OSError, TimeoutError, _Closed, ValueError):
+                self.connection.close()
+                stats.statuses[None] += 1
+                return False
+            stats.latencies.append(time.perf_counter() - started)
+            stats.statuses[status] += 1
+            if status >= 400:
+                return False
+
+            if step.extract:
+                try:
+                    data = json.loads(content)
+                except ValueError:
+                    data = None
+                for name, path in step.extract.items():
+                    try:
+                        variables[name] = _extract(data, path)
+                    except (KeyError, IndexError, TypeError):
+                        variables.pop(name, None)
+            if self.test.think_time:
+                await asyncio.sleep(
+                    self.rng.uniform(0, 2 * self.test.think_time)
+                )
+        return True
+
+
+class LoadTest:
+    def __init__(
+        self,
+        base_url,
+        scenarios=SCENARIOS,
+        users=20,
+        think_time=0.0,
+        timeout=30.0,
+        seed=0,
+        collection=COLLECTION,
+    ):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise LoadTestError(f"Некорректный адрес сервера: {base_url}")
+        self.tls = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.tls else 80)
+        collection_variables, self.requests = load_collection(collection)
+        missing = sorted(
+            {
+                step.request
+                for scenario in scenarios
+                for step in scenario.setup + scenario.steps
+            }
+            - set(self.requests)
+        )
+        if missing:
+            raise LoadTestError(
+                f"В коллекции нет запросов: {', '.join(missing)}"
+            )
+        self.variables = {
+            **collection_variables,
+            "baseUrl": base_url.rstrip("/"),
+        }
+        self.scenarios = scenarios
+        self.users = users
+        self.think_time = think_time
+        self.timeout = timeout
+        self.seed = seed
+        # Имена пользователей не повторяются между прогонами.
+        self.run_id = f"{int(time.time()):x}"
+        self.endpoints = {}
+        self.iterations = Counter()
+        self.aborted = Counter()
+
+    async def _check_server(self):
+        connection = _Connection(self.host, self.port, self.tls)
+        try:
+            async with asyncio.timeout(self.timeout):
+                status, content = await connection.request(
+                    "GET", "/api/ingredients/", (), b""
+                )
+        except (OSError, TimeoutError, _Closed) as exc:
+            raise LoadTestError(
+                f"Сервер {self.variables['baseUrl']} недоступен: {exc!r}"
+            ) from None
+        finally:
+            connection.close()
+        # Сценарии составляют рецепты из двух первых продуктов.
+        if status != 200 or len(json.loads(content)) < 2:
+            raise LoadTestError(
+                "Нужно хотя бы два продукта: manage.py load_ingredients"
+            )
+
+    async def run(self, duration):
+        await self._check_server()
+        started = time.monotonic()
+        await asyncio.gather(
+            *(
+                _VirtualUser(self, number).run(started + duration)
+                for number in range(self.users)
+            )
+        )
+        return LoadReport(
+            users=self.users,
+            elapsed=time.monotonic() - started,
+            endpoints=self.endpoints,
+            iterations=self.iterations,
+            aborted=self.aborted,
+        )
+
+
+def run_load_test(base_url, duration=30.0, **options):
+    """Прогон длительностью `duration` секунд; возвращает LoadReport."""
+    return asyncio.run(LoadTest(base_url, **options).run(duration))
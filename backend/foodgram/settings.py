@@ -13,11 +13,16 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
-from dotenv import load_dotenv
+BASE_DIR = Path(__file__).resolve().parent.parent
 
-load_dotenv()
+# В контейнере переменные приходят из env_file, и python-dotenv даже не
+# импортируется; локально читается backend/.env или .env в корне.
+for env_file in (BASE_DIR / ".env", BASE_DIR.parent / ".env"):
+    if env_file.is_file():
+        from dotenv import load_dotenv
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+        load_dotenv(env_file)
+        break
 
 
 # Quick-start development settings - unsuitable for production
@@ -33,7 +38,7 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
 
 
 INSTALLED_APPS = (
-    "django.contrib.admin",
+    "foodgram.apps.LazyAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -55,6 +60,7 @@ MIDDLEWARE = (
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.rate_limit_headers_middleware",
 )
 
 ROOT_URLCONF = "foodgram.urls"
@@ -80,6 +86,32 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite для нескольких воркеров (manage.py sqlite_write_benchmark).
+# WAL: читатели не ждут писателя и не мешают ему. synchronous=NORMAL в
+# WAL не теряет целостность, только последние коммиты при отключении
+# питания. BEGIN IMMEDIATE берёт блокировку записи в начале транзакции:
+# иначе транзакция, начавшаяся с чтения, при первой записи получает
+# "database is locked" сразу, без ожидания busy_timeout.
+# Сколько байт файла базы отображать в память (mmap).
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
+# Кэш страниц на соединение, КиБ.
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+# Сколько ждать блокировку записи, прежде чем вернуть "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_OPTIONS = {
+    "init_command": ";".join(
+        (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+            # Отрицательное значение — размер в КиБ, а не в страницах.
+            f"PRAGMA cache_size=-{SQLITE_CACHE_KB}",
+            f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        )
+    ),
+    "transaction_mode": "IMMEDIATE",
+}
+
 if os.getenv("USE_POSTGRES", "False").lower() == "true":
     DATABASES = {
         "default": {
@@ -96,9 +128,68 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": SQLITE_OPTIONS,
+            # Файл, а не общая in-memory база: иначе параллельные
+            # тесты упираются в табличные блокировки shared cache.
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
+    }
+
+# Реплики для чтения: для PostgreSQL список host[:port],
+# для SQLite — список путей к файлам базы.
+DATABASE_REPLICAS = ()
+
+for number, replica in enumerate(
+    filter(None, os.getenv("DB_REPLICAS", "").split(",")), start=1
+):
+    alias = f"replica_{number}"
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+        replica_settings = {"NAME": BASE_DIR / replica.strip()}
+    else:
+        host, _, port = replica.strip().partition(":")
+        replica_settings = {
+            "HOST": host,
+            "PORT": port or DATABASES["default"]["PORT"],
+        }
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        **replica_settings,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS += (alias,)
+
+DATABASE_ROUTERS = ("foodgram.db_router.ReplicaRouter",)
+
+# Сколько секунд после записи чтения пользователя идут в основную базу.
+DB_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Через кэш воркеры сверяют версии своих данных в памяти (foodgram.caches),
+# поэтому при нескольких воркерах нужен общий Redis. Без REDIS_URL кэш
+# живёт в памяти процесса, и при WEB_CONCURRENCY > 1 эти данные
+# читаются из базы.
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         }
     }
 
+# Сколько процессов обслуживают запросы (run.sh передаёт это число
+# gunicorn). runserver и тесты — один процесс.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +231,16 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Загрузки хранятся под именем из хэша содержимого и не дублируются.
+STORAGES = {
+    "default": {
+        "BACKEND": "recipes.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -150,6 +251,7 @@ AUTH_USER_MODEL = "recipes.User"
 DJOSER = {
     "SERIALIZERS": {
         "user": "api.serializers.UserSerializer",
+        "user_create": "api.serializers.UserCreateSerializer",
         "current_user": "api.serializers.UserSerializer",
     },
     "PERMISSIONS": {
@@ -175,7 +277,7 @@ DJOSER = {
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -185,4 +287,84 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
     ),
+    "DEFAULT_THROTTLE_CLASSES": ("api.throttling.CostThrottle",),
+    # Троттлинг анонимов по IP берёт последний адрес X-Forwarded-For,
+    # который дописал nginx; адреса левее подставляет сам клиент.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "1")),
 }
+
+# Троттлинг: корзина на THROTTLE_BURST токенов, пополнение THROTTLE_RATE
+# токенов в секунду, токен за каждые THROTTLE_BYTES_PER_TOKEN байт тела.
+# Платны только записи и дорогие запросы (throttle_costs), чтение
+# бесплатно; корзины хватает на серию из десятков рецептов подряд.
+# Корзины в памяти процесса: клиент, попадающий в разные воркеры, в сумме
+# получает до WEB_CONCURRENCY × THROTTLE_BURST и WEB_CONCURRENCY ×
+# THROTTLE_RATE.
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "200"))
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1"))
+THROTTLE_BYTES_PER_TOKEN = int(
+    os.getenv("THROTTLE_BYTES_PER_TOKEN", str(256 * 1024))
+)
+THROTTLE_CACHE_SIZE = int(os.getenv("THROTTLE_CACHE_SIZE", "100000"))
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "60"))
+
+# Async-версии горячих GET-эндпоинтов; включать при запуске под ASGI.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False").lower() == "true"
+
+# Короткие ссылки на рецепты: соль скрывает последовательные id.
+SHORT_LINK_SALT = os.getenv("SHORT_LINK_SALT", "")
+SHORT_LINK_CACHE_TTL = int(os.getenv("SHORT_LINK_CACHE_TTL", "300"))
+
+# Период полураспада веса добавления в избранное/покупки для trending.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "48"))
+
+# Прогрев после деплоя (manage.py warm_caches и хук gunicorn при старте
+# воркера): сколько страниц и популярных рецептов запросить, в сколько
+# потоков и сколько секунд на это можно потратить.
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "False").lower() == "true"
+WARMUP_PAGES = int(os.getenv("WARMUP_PAGES", "3"))
+WARMUP_POPULAR_RECIPES = int(os.getenv("WARMUP_POPULAR_RECIPES", "10"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+WARMUP_BUDGET_SECONDS = float(os.getenv("WARMUP_BUDGET_SECONDS", "10"))
+
+# Сколько секунд может занять холодный старт воркера до ответа на первый
+# запрос. manage.py startup_report и StartupImportsTest падают при
+# превышении; 0 отключает проверку (например, на медленном CI).
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.0"))
+
+# Снимки публичных ответов API для nginx (manage.py export_snapshots).
+# Пустой SNAPSHOT_ROOT отключает их. SNAPSHOT_BASE_URL — адрес сайта,
+# от которого строятся абсолютные ссылки в ответах.
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", "")
+SNAPSHOT_BASE_URL = os.getenv("SNAPSHOT_BASE_URL", "http://localhost")
+SNAPSHOT_PAGES = int(os.getenv("SNAPSHOT_PAGES", "5"))
+SNAPSHOT_PAGE_LIMITS = tuple(
+    int(limit) for limit in os.getenv("SNAPSHOT_PAGE_LIMITS", "6").split(",")
+)
+
+# Сколько секунд кэш id избранного и покупок пользователя живёт без
+# обращений; запись связи сбрасывает его сразу.
+USER_RECIPE_IDS_CACHE_TTL = int(os.getenv("USER_RECIPE_IDS_CACHE_TTL", "600"))
+
+# Как часто перечитывать граф подписок целиком, секунд. Подписки текущего
+# пользователя сверяются с версией в кэше Django на каждом запросе.
+SUBSCRIPTION_GRAPH_TTL = int(os.getenv("SUBSCRIPTION_GRAPH_TTL", "600"))
+
+# Сколько дней хранить журнал изменений (/api/changes/). Клиент, не
+# синхронизировавшийся дольше, получает 410 и загружает данные заново.
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+
+# Доставка событий /api/events/ между процессами: LocalBackend — только
+# внутри процесса (тесты, один воркер), PostgresBackend — NOTIFY/LISTEN.
+# LocalBackend отказывается обслуживать поток при WEB_CONCURRENCY > 1.
+EVENTS_BACKEND = os.getenv(
+    "EVENTS_BACKEND",
+    "recipes.events.PostgresBackend"
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql"
+    else "recipes.events.LocalBackend",
+)
+# Как часто слать комментарий в простаивающий поток, секунд: держит
+# соединение открытым через прокси и выявляет отвалившихся клиентов.
+SSE_KEEPALIVE_SECONDS = int(os.getenv("SSE_KEEPALIVE_SECONDS", "25"))
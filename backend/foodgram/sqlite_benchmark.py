@@ -0,0 +1,256 @@
+"""
+Замер параллельной записи в SQLite из нескольких процессов.
+
+run_benchmark() готовит временную базу и для каждого режима запускает
+несколько процессов `python -m foodgram.sqlite_benchmark`. Пишущие, как
+воркеры gunicorn, каждый со своим соединением добавляют и убирают рецепты
+в избранном и списке покупок через recipes.relations; читающие в это
+время запрашивают первую страницу списка рецептов. Режим "default" —
+настройки Django по умолчанию (журнал отката, BEGIN DEFERRED), "tuned" —
+settings.SQLITE_OPTIONS. Процессы начинают одновременно, после того как
+все загрузили Django и открыли соединение."""
+
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class Report:
+    mode: str
+    operations: int
+    errors: int
+    elapsed: float
+    latencies: list = field(repr=False)
+
+    @property
+    def throughput(self):
+        return self.operations / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        """Задержка операции в миллисекундах."""
+        if len(self.latencies) < 2:
+            return sum(self.latencies) * 1000
+        return statistics.quantiles(self.latencies, n=100)[percent - 1] * 1000
+
+
+def _setup(path, options):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+    import django
+    from django.conf import settings
+
+    settings.DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": path,
+            "OPTIONS": options,
+        }
+    }
+    settings.DATABASE_REPLICAS = ()
+    settings.EVENTS_BACKEND = "recipes.events.LocalBackend"
+    django.setup(set_prefix=False)
+
+
+def _prepare(config):
+    from django.core.management import call_command
+
+    from recipes.models import Recipe, User
+
+    call_command("migrate", verbosity=0)
+    users = User.objects.bulk_create(
+        User(
+            email=f"benchmark-{number}@example.com",
+            username=f"benchmark-{number}",
+            first_name="Бенчмарк",
+            last_name=str(number),
+        )
+        for number in range(config["processes"])
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=users[0],
+            name=f"Рецепт {number}",
+            image=f"recipes/images/benchmark-{number}.jpg",
+            text="Бенчмарк",
+            cooking_time=10,
+        )
+        for number in range(config["recipes"])
+    )
+    return {
+        "users": [user.pk for user in users],
+        "recipes": [recipe.pk for recipe in recipes],
+    }
+
+
+def _write_operation(config):
+    from recipes.models import Favorite, ShoppingCart
+    from recipes.relations import add_user_recipe, remove_user_recipe
+
+    rng = random.Random(config["user"])
+
+    def write():
+        model = rng.choice((Favorite, ShoppingCart))
+        recipe_id = rng.choice(config["recipes"])
+        if add_user_recipe(model, config["user"], recipe_id) is None:
+            remove_user_recipe(model, config["user"], recipe_id)
+
+    return write
+
+
+def _read_operation(config):
+    from recipes.models import Recipe
+
+    def read():
+        # Первая страница списка рецептов, как у пагинатора.
+        Recipe.objects.count()
+        list(Recipe.objects.select_related("author").order_by("-pub_date")[:6])
+
+    return read
+
+
+def _work(config):
+    from django.db import OperationalError, connection
+
+    if config["command"] == "write":
+        operation = _write_operation(config)
+    else:
+        operation = _read_operation(config)
+    connection.ensure_connection()
+    print("ready", flush=True)
+    sys.stdin.readline()
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(config["operations"]):
+        operation_started = time.perf_counter()
+        try:
+            operation()
+        except OperationalError:
+            # "database is locked": запрос пользователя получил бы 500.
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - operation_started)
+    return {
+        "errors": errors,
+        "elapsed": time.perf_counter() - started,
+        "latencies": latencies,
+    }
+
+
+def _run(config):
+    return subprocess.Popen(
+        (
+            sys.executable,
+            "-m",
+            "foodgram.sqlite_benchmark",
+            json.dumps(config),
+        ),
+        cwd=BASE_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def _report(mode, results):
+    latencies = [
+        latency for result in results for latency in result["latencies"]
+    ]
+    return Report(
+        mode=mode,
+        operations=len(latencies),
+        errors=sum(result["errors"] for result in results),
+        elapsed=max(result["elapsed"] for result in results),
+        latencies=latencies,
+    )
+
+
+def _measure(mode, path, options, data, operations, readers):
+    base = {"path": str(path), "options": options, "operations": operations}
+    writers = [
+        _run(
+            {
+                **base,
+                "command": "write",
+                "user": user_id,
+                "recipes": data["recipes"],
+            }
+        )
+        for user_id in data["users"]
+    ]
+    workers = writers + [
+        _run({**base, "command": "read"}) for _ in range(readers)
+    ]
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise RuntimeError("Процесс замера не запустился")
+    for worker in workers:
+        worker.stdin.write("go\n")
+        worker.stdin.flush()
+    results = []
+    for worker in workers:
+        output, _ = worker.communicate()
+        if worker.returncode:
+            raise RuntimeError("Процесс замера завершился с ошибкой")
+        results.append(json.loads(output.splitlines()[-1]))
+    return (
+        _report(mode, results[: len(writers)]),
+        _report(mode, results[len(writers) :]) if readers else None,
+    )
+
+
+def run_benchmark(
+    processes=4, operations=200, recipes=1000, readers=2, modes=None
+):
+    """Замеряет каждый режим.
+
+    Возвращает список пар Report: запись и чтение (None без читателей).
+    """
+    if modes is None:
+        from django.conf import settings
+
+        modes = {"default": {}, "tuned": settings.SQLITE_OPTIONS}
+    with tempfile.TemporaryDirectory() as directory:
+        template = Path(directory) / "template.sqlite3"
+        preparation = _run(
+            {
+                "command": "prepare",
+                "path": str(template),
+                "options": {},
+                "processes": processes,
+                "recipes": recipes,
+            }
+        )
+        output, _ = preparation.communicate()
+        if preparation.returncode:
+            raise RuntimeError("Не удалось подготовить базу для замера")
+        data = json.loads(output.splitlines()[-1])
+
+        reports = []
+        for mode, options in modes.items():
+            # Каждый режим пишет в свою копию: режим WAL сохраняется в
+            # файле и повлиял бы на следующий замер.
+            path = Path(directory) / f"{mode}.sqlite3"
+            shutil.copyfile(template, path)
+            reports.append(
+                _measure(mode, path, options, data, operations, readers)
+            )
+        return reports
+
+
+if __name__ == "__main__":
+    config = json.loads(sys.argv[1])
+    _setup(config["path"], config["options"])
+    command = _prepare if config["command"] == "prepare" else _work
+    print(json.dumps(command(config)), flush=True)
@@ -0,0 +1,193 @@
+"""
+Замер холодного старта процесса: импорты, настройки, приложения, URL и
+первый запрос.
+
+measure_startup() запускает `python -m foodgram.startup` в отдельном
+процессе, чтобы ни один модуль не был импортирован заранее. Время
+импорта считается загрузчиком в sys.meta_path, а не `-X importtime`:
+тот не видит модулей, загруженных через importlib.import_module
+(модели приложений, admin.py, URLconf).
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from importlib.abc import MetaPathFinder
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class StartupReport:
+    phases: dict
+    ready: dict
+    imports: list
+    modules: list = field(repr=False)
+    status: int
+    process: float
+
+    @property
+    def total(self):
+        return sum(self.phases.values())
+
+    def packages(self):
+        """Суммарное собственное время импорта по пакетам верхнего уровня."""
+        totals = {}
+        for name, own, _ in self.imports:
+            package = name.partition(".")[0]
+            totals[package] = totals.get(package, 0.0) + own
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+
+class _TimedLoader:
+    def __init__(self, loader, timings, stack):
+        self._loader = loader
+        self._timings = timings
+        self._stack = stack
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Собственное время модуля — общее за вычетом вложенных импортов.
+        self._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            self._timings.append((module.__name__, elapsed - nested, elapsed))
+
+
+class _TimedFinder(MetaPathFinder):
+    def __init__(self):
+        self.timings = []
+        self._stack = []
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(
+                    spec.loader, "exec_module"
+                ):
+                    spec.loader = _TimedLoader(
+                        spec.loader, self.timings, self._stack
+                    )
+                return spec
+        return None
+
+
+def _measure():
+    finder = _TimedFinder()
+    sys.meta_path.insert(0, finder)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
+    phases = {}
+    started = time.perf_counter()
+
+    def phase(name):
+        nonlocal started
+        now = time.perf_counter()
+        phases[name] = now - started
+        started = now
+
+    import django
+    from django.apps.config import AppConfig
+    from django.conf import settings
+
+    settings.INSTALLED_APPS  # noqa: B018
+    phase("settings")
+
+    ready = {}
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        app_config = create(cls, entry)
+        app_ready = app_config.ready
+
+        def timed_ready():
+            ready_started = time.perf_counter()
+            app_ready()
+            ready[app_config.label] = time.perf_counter() - ready_started
+
+        app_config.ready = timed_ready
+        return app_config
+
+    AppConfig.create = classmethod(timed_create)
+    django.setup(set_prefix=False)
+    phase("apps")
+
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.urls import get_resolver
+
+    application = WSGIHandler()
+    phase("handler")
+    get_resolver().url_patterns  # noqa: B018
+    phase("urls")
+
+    host = next(
+        (
+            host
+            for host in settings.ALLOWED_HOSTS
+            if host and not host.startswith(("*", "."))
+        ),
+        "localhost",
+    )
+    # Анонимный запрос к /api/users/me/ проходит middleware, DRF,
+    # аутентификацию и троттлинг, не обращаясь к базе и не вызывая
+    # reverse() (тот загрузил бы все URLconf, включая админку).
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": "/api/users/me/",
+        "SERVER_NAME": host,
+        "SERVER_PORT": "80",
+        "HTTP_HOST": host,
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(),
+    }
+    statuses = []
+    response = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    b"".join(response)
+    response.close()
+    phase("first_request")
+
+    return {
+        "phases": phases,
+        "ready": ready,
+        "imports": sorted(finder.timings, key=lambda item: -item[1]),
+        "modules": sorted(sys.modules),
+        "status": int(statuses[0].split()[0]),
+    }
+
+
+def measure_startup():
+    """Холодный старт в новом процессе; возвращает StartupReport."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        (sys.executable, "-m", "foodgram.startup"),
+        cwd=BASE_DIR,
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    process = time.perf_counter() - started
+    return StartupReport(**json.loads(result.stdout), process=process)
+
+
+if __name__ == "__main__":
+    json.dump(_measure(), sys.stdout)
@@ -20,8 +20,11 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from foodgram.apps import LazyAdminURLs
+
 urlpatterns = (
-    path("admin/", admin.site.urls),
+    # Кортеж вместо include(): include() сразу читает urlpatterns.
+    path("admin/", (LazyAdminURLs(), "admin", admin.site.name)),
     path("api/", include("api.urls")),
     path("", include("recipes.urls")),
 )
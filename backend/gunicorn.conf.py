@@ -0,0 +1,17 @@
+"""Настройки gunicorn: прогрев воркера перед приёмом запросов."""
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+
+    if not settings.WARMUP_ON_START:
+        return
+
+    from api.warmup import warm_process
+
+    try:
+        report = warm_process()
+    except Exception:
+        worker.log.exception("Прогрев воркера не удался")
+    else:
+        worker.log.info("Прогрев воркера: %s", report)
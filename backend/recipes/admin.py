@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.html import mark_safe
 
 from .models import (
@@ -11,39 +13,115 @@ from .models import (
     Subscription,
     User,
 )
+from .nutrition import NUTRIENTS, recompute, recompute_for_ingredients
+from .paginator import EstimatedCountPaginator
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class InputListFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех возможных значений."""
+
+    template = "admin/input_filter.html"
+    placeholder = ""
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.value() is not None,
+            "parameter_name": self.parameter_name,
+            "value": self.value(),
+            "display": self.placeholder,
+            "query_parts": [
+                (name, value)
+                for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+        }
+
+
+class AuthorFilter(InputListFilter):
+    title = "автору"
+    parameter_name = "author_username"
+    placeholder = "Псевдоним автора"
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__username=self.value())
+        return queryset
 
 
 class RecipesCountMixin:
     list_display = ("recipes_count",)
-    recipes_related_name = "recipes"
+    recipes_model = Recipe
+    recipes_field = "author"
 
-    @admin.display(description="Рецептов")
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                recipes_total=count_of(self.recipes_model, self.recipes_field)
+            )
+        )
+
+    @admin.display(description="Рецептов", ordering="recipes_total")
     def recipes_count(self, obj):
-        return getattr(obj, self.recipes_related_name).count()
+        return obj.recipes_total
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(RecipesCountMixin, admin.ModelAdmin):
+class IngredientAdmin(
+    LargeTableAdminMixin, RecipesCountMixin, admin.ModelAdmin
+):
     list_display = (
         "id",
         "name",
         "measurement_unit",
         *RecipesCountMixin.list_display,
     )
-    recipes_related_name = "recipe_ingredients"
+    recipes_model = RecipeIngredient
+    recipes_field = "ingredient"
     search_fields = ("name",)
     list_filter = ("measurement_unit",)
     ordering = ("name",)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and set(NUTRIENTS) & set(form.changed_data):
+            recompute_for_ingredients((obj.pk,))
+
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
+    autocomplete_fields = ("ingredient",)
     extra = 1
     min_num = 1
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = (
         "id",
         "name",
@@ -59,19 +137,41 @@ class RecipeAdmin(admin.ModelAdmin):
         "author__email",
         "recipe_ingredients__ingredient__name",
     )
-    list_filter = ("pub_date", "author")
-    readonly_fields = ("pub_date",)
+    list_filter = ("pub_date", AuthorFilter)
+    list_select_related = ("author",)
+    autocomplete_fields = ("author",)
+    readonly_fields = ("pub_date", *NUTRIENTS)
     ordering = ("-pub_date",)
     inlines = (RecipeIngredientInline,)
 
-    @admin.display(description="В избранном")
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Состав сохраняется после рецепта: суммы считаются по нему.
+        recompute(Recipe.objects.filter(pk=form.instance.pk))
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(favorites_total=count_of(Favorite, "recipe"))
+            .prefetch_related(
+                Prefetch(
+                    "recipe_ingredients",
+                    queryset=RecipeIngredient.objects.select_related(
+                        "ingredient"
+                    ),
+                )
+            )
+        )
+
+    @admin.display(description="В избранном", ordering="favorites_total")
     def get_favorites_count(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_total
 
     @admin.display(description="Продукты")
     @mark_safe
     def ingredients_display(self, obj):
-        ingredients = obj.recipe_ingredients.select_related("ingredient").all()
+        ingredients = obj.recipe_ingredients.all()
         return "<br>".join(
             [
                 f"{recipe_ingredient.ingredient.name} ({recipe_ingredient.amount} {recipe_ingredient.ingredient.measurement_unit})"
@@ -88,13 +188,15 @@ class RecipeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite, ShoppingCart)
-class UserRecipeAdmin(admin.ModelAdmin):
+class UserRecipeAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("id", "user", "recipe")
+    list_select_related = ("user", "recipe")
+    autocomplete_fields = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
 
 
 @admin.register(User)
-class UserAdmin(RecipesCountMixin, BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, RecipesCountMixin, BaseUserAdmin):
     list_display = (
         "id",
         "username",
@@ -152,9 +254,9 @@ class UserAdmin(RecipesCountMixin, BaseUserAdmin):
         return (
             super()
             .get_queryset(request)
-            .select_related()
-            .prefetch_related(
-                "recipes", "subscriptions", "author_subscriptions"
+            .annotate(
+                subscriptions_total=count_of(Subscription, "user"),
+                subscribers_total=count_of(Subscription, "author"),
             )
         )
 
@@ -169,16 +271,18 @@ class UserAdmin(RecipesCountMixin, BaseUserAdmin):
             return f'<img src="{obj.avatar.url}" width="50" height="50" style="border-radius: 50%; object-fit: cover;" alt="Аватар {obj.username}">'
         return ""
 
-    @admin.display(description="Подписок")
+    @admin.display(description="Подписок", ordering="subscriptions_total")
     def subscriptions_count(self, obj):
-        return obj.subscriptions.count()
+        return obj.subscriptions_total
 
-    @admin.display(description="Подписчиков")
+    @admin.display(description="Подписчиков", ordering="subscribers_total")
     def subscribers_count(self, obj):
-        return obj.author_subscriptions.count()
+        return obj.subscribers_total
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("id", "user", "author")
+    list_select_related = ("user", "author")
+    autocomplete_fields = ("user", "author")
     search_fields = ("user__username", "author__username")
@@ -0,0 +1,140 @@
+"""
+Журнал изменений (transactional outbox) для синхронизации клиентов.
+
+Запись в журнал делается в той же транзакции, что и само изменение:
+откат не оставляет в журнале ничего, а коммит виден вместе с записью.
+id записи — курсор ленты /api/changes/. Чтобы курсор не перепрыгнул
+через ещё не закоммиченную запись с меньшим id, на PostgreSQL id
+переписывает отложенный триггер (миграция 0010) в момент коммита под
+pg_advisory_xact_lock: транзакции ждут друг друга только на самом
+коммите, и id растут в порядке коммита. В SQLite пишущие транзакции и
+так идут по одной.
+
+Сжатие (compact) удаляет записи, перекрытые более новой записью о том
+же объекте, и записи старше CHANGES_RETENTION_DAYS дней. Курсор,
+указывающий раньше оставшегося журнала, считается просроченным: клиенту
+нужна полная синхронизация.
+"""
+
+import heapq
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Exists, Max, Min, OuterRef
+from django.utils import timezone
+
+from recipes.models import Change, Favorite, ShoppingCart
+
+USER_RECIPE_KINDS = {
+    Favorite: Change.Kind.FAVORITE,
+    ShoppingCart: Change.Kind.SHOPPING_CART,
+}
+
+
+class CursorExpired(Exception):
+    """Записи после курсора уже удалены сжатием журнала."""
+
+
+def record_changes(kind, action, object_ids, user_id=None):
+    """Пишет в журнал изменение объектов в текущей транзакции."""
+    created_at = timezone.now()
+    Change.objects.using(router.db_for_write(Change)).bulk_create(
+        Change(
+            kind=kind,
+            action=action,
+            object_id=object_id,
+            user_id=user_id,
+            created_at=created_at,
+        )
+        for object_id in object_ids
+    )
+
+
+def record_change(kind, action, object_id, user_id=None):
+    record_changes(kind, action, (object_id,), user_id)
+
+
+def latest_cursor():
+    return Change.objects.aggregate(latest=Max("pk"))["latest"] or 0
+
+
+def change_feeds(user, since):
+    """Публичная и (для пользователя) личная лента после курсора."""
+    feeds = [Change.objects.filter(user__isnull=True, pk__gt=since)]
+    if user.is_authenticated:
+        feeds.append(Change.objects.filter(user=user, pk__gt=since))
+    return [feed.order_by("pk") for feed in feeds]
+
+
+def changes_since(user, since, limit):
+    """Изменения после курсора, видимые пользователю, в порядке коммита.
+
+    Возвращает (изменения, есть_ещё). Публичные и личные записи читаются
+    двумя диапазонами индекса (user, id) и сливаются по id.
+    """
+    first = Change.objects.aggregate(first=Min("pk"))["first"]
+    if first is not None and since < first - 1:
+        raise CursorExpired
+    changes = list(
+        heapq.merge(
+            *(feed[: limit + 1] for feed in change_feeds(user, since)),
+            key=lambda change: change.pk,
+        )
+    )[: limit + 1]
+    return changes[:limit], len(changes) > limit
+
+
+@dataclass
+class CompactionReport:
+    superseded: int = 0
+    expired: int = 0
+
+    def __str__(self):
+        return (
+            f"удалено перекрытых: {self.superseded}, "
+            f"устаревших: {self.expired}"
+        )
+
+
+def compact(retention_days=None):
+    """Сжимает журнал, не сдвигая горизонт курсоров без нужды.
+
+    Самая старая запись не удаляется как перекрытая: по ней определяется
+    горизонт. Самая новая не удаляется как устаревшая: по ней продолжает
+    расти курсор.
+    """
+    if retention_days is None:
+        retention_days = settings.CHANGES_RETENTION_DAYS
+    report = CompactionReport()
+    with transaction.atomic(using=router.db_for_write(Change)):
+        latest = latest_cursor()
+        if not latest:
+            return report
+
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        horizon = (
+            Change.objects.filter(created_at__gte=cutoff)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .first()
+        ) or latest
+        report.expired, _ = Change.objects.filter(pk__lt=horizon).delete()
+
+        changes = Change.objects.filter(pk__gt=horizon)
+        newer = Change.objects.filter(
+            kind=OuterRef("kind"),
+            object_id=OuterRef("object_id"),
+            pk__gt=OuterRef("pk"),
+        )
+        # Личную запись перекрывает только запись того же пользователя.
+        for stale in (
+            changes.filter(
+                Exists(newer.filter(user__isnull=True)), user__isnull=True
+            ),
+            changes.filter(Exists(newer.filter(user_id=OuterRef("user_id")))),
+        ):
+            deleted, _ = stale.delete()
+            report.superseded += deleted
+    return report
@@ -0,0 +1,344 @@
+"""
+Рассылка событий подключённым клиентам (server-sent events).
+
+Hub живёт в цикле событий ASGI-воркера и раскладывает события по темам:
+`author:<id>` — новые рецепты автора, `recipe:<id>` — изменение и
+удаление рецепта, `user:<id>` — пользователь подписался или отписался,
+добавил или убрал рецепт из избранного (клиенту не отправляется: hub сразу
+меняет темы подключения, и следующее событие уже идёт по новым темам).
+Каждое подключение подписано на своих авторов и избранные рецепты, так
+что событие обходит только заинтересованные подключения.
+
+Между процессами события переносит бэкенд из EVENTS_BACKEND:
+LocalBackend доставляет только внутри процесса (тесты, один воркер),
+PostgresBackend — через NOTIFY/LISTEN той же базы. Оба отправляют
+событие только после коммита транзакции, в которой оно возникло.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import sys
+import threading
+import time
+from collections import deque
+from functools import cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.utils.module_loading import import_string
+
+from recipes.models import Favorite, Recipe, Subscription
+
+logger = logging.getLogger(__name__)
+
+# Сколько неотправленных событий держать на подключение; при переполнении
+# очередь заменяется одним событием reset, и клиент перечитывает данные.
+QUEUE_SIZE = 64
+KEEPALIVE = {"type": "keepalive"}
+RESET = {"type": "reset"}
+TOPICS = "topics"
+CLOSE = {"type": "close"}
+
+
+class Subscriber:
+    """Очередь событий одного подключения.
+
+    Вместо asyncio.Queue — deque и один Future на время ожидания: на
+    десятках тысяч простаивающих подключений это в несколько раз меньше
+    памяти.
+    """
+
+    __slots__ = ("user_id", "topics", "_events", "_waiter")
+
+    def __init__(self, user_id, topics):
+        self.user_id = user_id
+        self.topics = topics
+        self._events = deque()
+        self._waiter = None
+
+    def empty(self):
+        return not self._events
+
+    def push(self, event):
+        if len(self._events) >= QUEUE_SIZE:
+            self._replace(RESET)
+            return False
+        self._events.append(event)
+        self._wake()
+        return True
+
+    def close(self):
+        self._replace(CLOSE)
+
+    def _replace(self, event):
+        self._events.clear()
+        self._events.append(event)
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self):
+        while not self._events:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._events.popleft()
+
+
+def _topic_set(topics):
+    # Одинаковые темы тысяч подключений — одна строка в памяти.
+    return frozenset(map(sys.intern, topics))
+
+
+class Hub:
+    def __init__(self):
+        self._topics = {}
+        self._subscribers = set()
+        self._loop = None
+        self._heartbeat = None
+        self.delivered = 0
+        self.dropped = 0
+
+    def _bind(self, loop):
+        # Бэкенд запускается первым: если он не может работать, каждое
+        # подключение падает, а не только первое.
+        get_backend().start()
+        self._loop = loop
+        self._heartbeat = loop.create_task(self._keepalive())
+
+    async def _keepalive(self):
+        # Один таймер на все подключения вместо таймера в каждом.
+        while True:
+            await asyncio.sleep(settings.SSE_KEEPALIVE_SECONDS)
+            for subscriber in tuple(self._subscribers):
+                if subscriber.empty():
+                    subscriber.push(KEEPALIVE)
+
+    def subscribe(self, user_id, topics):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._bind(loop)
+        subscriber = Subscriber(user_id, _topic_set(topics))
+        self._subscribers.add(subscriber)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def _retopic(self, subscriber, added, removed):
+        added, removed = _topic_set(added), _topic_set(removed)
+        for topic in removed & subscriber.topics:
+            self._discard(topic, subscriber)
+        for topic in added - subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        subscriber.topics = (subscriber.topics - removed) | added
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+        for topic in subscriber.topics:
+            self._discard(topic, subscriber)
+
+    def _discard(self, topic, subscriber):
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._topics[topic]
+
+    def dispatch(self, topic, event):
+        if event["type"] == TOPICS:
+            for subscriber in tuple(self._topics.get(topic, ())):
+                self._retopic(subscriber, event["add"], event["remove"])
+            return
+        for subscriber in tuple(self._topics.get(topic, ())):
+            if subscriber.push(event):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+    def reset(self):
+        """Всем подключениям: события могли потеряться, перечитайте."""
+        for subscriber in tuple(self._subscribers):
+            subscriber.push(RESET)
+
+    def call_threadsafe(self, func, *args):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(func, *args)
+
+    def stats(self):
+        return {
+            "connections": len(self._subscribers),
+            "topics": len(self._topics),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """Доставка внутри процесса: для тестов и запуска с одним воркером."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        # Подключение к соседнему воркеру не получило бы событий этого.
+        if settings.WEB_CONCURRENCY > 1:
+            raise ImproperlyConfigured(
+                "LocalBackend доставляет события только внутри процесса, "
+                "а WEB_CONCURRENCY > 1: укажите EVENTS_BACKEND="
+                "recipes.events.PostgresBackend."
+            )
+
+    def publish(self, topic, event, using):
+        transaction.on_commit(
+            lambda: self.hub.call_threadsafe(self.hub.dispatch, topic, event),
+            using=using,
+        )
+
+
+class PostgresBackend(LocalBackend):
+    """Доставка между процессами через NOTIFY/LISTEN.
+
+    NOTIFY выполняется в транзакции изменения, и PostgreSQL рассылает его
+    только после коммита. Каждый процесс с подключениями слушает канал в
+    отдельном потоке; после разрыва соединения с базой все подключения
+    получают reset.
+    """
+
+    channel = "foodgram_events"
+    poll_seconds = 5
+    reconnect_seconds = 1
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self.using = router.db_for_write(Recipe)
+        if connections[self.using].vendor != "postgresql":
+            raise ImproperlyConfigured(
+                "PostgresBackend работает только с PostgreSQL."
+            )
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, topic, event, using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                (self.channel, json.dumps({"topic": topic, "event": event})),
+            )
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="events-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        wrapper = connections[self.using]
+        while True:
+            connection = None
+            try:
+                connection = wrapper.get_new_connection(
+                    wrapper.get_connection_params()
+                )
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self._receive(connection)
+            except Exception:
+                logger.exception("Потеряно соединение канала событий")
+                self.hub.call_threadsafe(self.hub.reset)
+                time.sleep(self.reconnect_seconds)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _receive(self, connection):
+        while True:
+            if select.select((connection,), (), (), self.poll_seconds)[0]:
+                connection.poll()
+                while connection.notifies:
+                    message = json.loads(connection.notifies.pop(0).payload)
+                    self.hub.call_threadsafe(
+                        self.hub.dispatch, message["topic"], message["event"]
+                    )
+
+
+@cache
+def get_backend():
+    return import_string(settings.EVENTS_BACKEND)(hub)
+
+
+def publish(topic, event):
+    get_backend().publish(topic, event, router.db_for_write(Recipe))
+
+
+def recipe_saved(recipe, created):
+    if created:
+        publish(
+            f"author:{recipe.author_id}",
+            {
+                "type": "recipe_created",
+                "recipe": recipe.pk,
+                "author": recipe.author_id,
+            },
+        )
+    else:
+        publish(
+            f"recipe:{recipe.pk}",
+            {"type": "recipe_updated", "recipe": recipe.pk},
+        )
+
+
+def recipe_deleted(recipe_id):
+    publish(
+        f"recipe:{recipe_id}", {"type": "recipe_deleted", "recipe": recipe_id}
+    )
+
+
+def _user_topic_changed(user_id, topic, added):
+    publish(
+        f"user:{user_id}",
+        {
+            "type": TOPICS,
+            "add": [topic] if added else [],
+            "remove": [] if added else [topic],
+        },
+    )
+
+
+def following_changed(user_id, author_id, added):
+    _user_topic_changed(user_id, f"author:{author_id}", added)
+
+
+def favorite_changed(user_id, recipe_id, added):
+    _user_topic_changed(user_id, f"recipe:{recipe_id}", added)
+
+
+def user_topics(user_id):
+    return {
+        f"user:{user_id}",
+        *(
+            f"author:{author_id}"
+            for author_id in Subscription.objects.filter(
+                user_id=user_id
+            ).values_list("author_id", flat=True)
+        ),
+        *(
+            f"recipe:{recipe_id}"
+            for recipe_id in Favorite.objects.filter(
+                user_id=user_id
+            ).values_list("recipe_id", flat=True)
+        ),
+    }
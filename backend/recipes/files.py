@@ -0,0 +1,185 @@
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.db import connections, router
+from django.db.models.functions import Collate
+
+from recipes.models import Recipe, User
+
+FILE_FIELDS = ((Recipe, "image"), (User, "avatar"))
+# Сравнение строк в базе должно совпадать с посимвольным в Python.
+BINARY_COLLATIONS = {"postgresql": "C", "sqlite": "BINARY"}
+GC_BATCH_SIZE = 500
+
+
+@dataclass
+class GarbageReport:
+    scanned: int = 0
+    orphaned: int = 0
+    recent: int = 0
+    deleted: int = 0
+    freed: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"просмотрено файлов: {self.scanned}, без ссылок: "
+            f"{self.orphaned}, моложе отсрочки: {self.recent}, удалено: "
+            f"{self.deleted} ({self.freed / 2**20:.1f} МБ) "
+            f"за {self.seconds:.2f} с"
+        )
+
+
+def _sorted_files(root, directory):
+    """Файлы каталога рекурсивно, по возрастанию относительного пути.
+
+    Каталоги сравниваются как `имя/`, так что порядок обхода совпадает
+    с посимвольным сравнением полных путей.
+    """
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.name + "/" * entry.is_dir())
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _sorted_files(root, entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield (
+                Path(entry.path).relative_to(root).as_posix(),
+                entry.stat(follow_symlinks=False),
+            )
+
+
+def _primary(model):
+    # Реплика может ещё не знать о свежей ссылке на файл.
+    return model.objects.using(router.db_for_write(model))
+
+
+def _counted(files, report):
+    for item in files:
+        report.scanned += 1
+        yield item
+
+
+def _sorted_references(prefix):
+    """Имена файлов под `prefix` из всех файловых полей, по возрастанию."""
+    streams = []
+    for model, field in FILE_FIELDS:
+        names = (
+            _primary(model)
+            .filter(**{f"{field}__startswith": prefix})
+            .values_list(field, flat=True)
+        )
+        collation = BINARY_COLLATIONS.get(connections[names.db].vendor)
+        streams.append(
+            names.order_by(Collate(field, collation))
+            if collation
+            else names.order_by(field)
+        )
+    previous = ""
+    for name in heapq.merge(
+        *(names.iterator(chunk_size=GC_BATCH_SIZE) for names in streams)
+    ):
+        if name < previous:
+            raise ValueError(
+                "База вернула имена файлов не по порядку: сравнение строк "
+                "в базе отличается от посимвольного."
+            )
+        previous = name
+        yield name
+
+
+def _unreferenced(files, references):
+    reference = next(references, None)
+    for name, stat in files:
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name, stat
+
+
+def _unlink_stale(path, newest):
+    try:
+        # Файл могли загрузить повторно уже после обхода каталога.
+        if path.stat().st_mtime > newest:
+            return False
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _delete_batch(batch, root, newest, executor, dry_run, log, report):
+    # Повторная проверка по индексу: файл мог получить ссылку после
+    # того, как сравнение его прошло.
+    names = [name for name, _ in batch]
+    referenced = {
+        name
+        for model, field in FILE_FIELDS
+        for name in _primary(model)
+        .filter(**{f"{field}__in": names})
+        .values_list(field, flat=True)
+    }
+    doomed = [(name, stat) for name, stat in batch if name not in referenced]
+    if dry_run:
+        deleted = [True] * len(doomed)
+    else:
+        deleted = executor.map(
+            lambda name: _unlink_stale(root / name, newest),
+            (name for name, _ in doomed),
+        )
+    for (name, stat), done in zip(doomed, deleted, strict=True):
+        if done:
+            log(name)
+            report.deleted += 1
+            report.freed += stat.st_size
+
+
+def collect_garbage(grace, dry_run=False, workers=4, log=lambda name: None):
+    """Удаляет из MEDIA_ROOT файлы загрузок, на которые нет ссылок.
+
+    Обход каталога и имена из базы идут по возрастанию и сравниваются
+    слиянием, так что память не зависит от числа файлов. Файлы моложе
+    `grace` (timedelta) не трогаются: их загрузка может быть ещё не
+    закоммичена. Недописанные `.upload-*` старше отсрочки тоже удаляются.
+
+    Других удалений загрузок нет: файл с тем же содержимым может в эту
+    минуту загружаться заново, и защищает его только отсрочка.
+    """
+    started = time.monotonic()
+    report = GarbageReport()
+    root = Path(default_storage.location)
+    newest = time.time() - grace.total_seconds()
+    prefixes = sorted(
+        {
+            model._meta.get_field(field).upload_to
+            for model, field in FILE_FIELDS
+        }
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def flush(batch):
+            _delete_batch(batch, root, newest, executor, dry_run, log, report)
+
+        batch = []
+        for prefix in prefixes:
+            files = _counted(_sorted_files(root, root / prefix), report)
+            for name, stat in _unreferenced(files, _sorted_references(prefix)):
+                report.orphaned += 1
+                if stat.st_mtime > newest:
+                    report.recent += 1
+                    continue
+                batch.append((name, stat))
+                if len(batch) >= GC_BATCH_SIZE:
+                    flush(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+    report.seconds = time.monotonic() - started
+    return report
@@ -0,0 +1,272 @@
+"""
+Граф подписок в памяти процесса и подсказки «на кого подписаться».
+
+Для каждого подписчика хранится отсортированный array('q') id авторов.
+Граф целиком перечитывается раз в SUBSCRIPTION_GRAPH_TTL секунд, а строку
+конкретного пользователя сверяет с версией в кэше Django: подписка в
+любом воркере увеличивает версию, и строка перечитывается при следующем
+обращении. Поэтому is_subscribed для текущего пользователя всегда
+актуален, а подсказки могут отставать на SUBSCRIPTION_GRAPH_TTL. Если
+кэш не общий для воркеров (foodgram.caches.is_shared), строка текущего
+пользователя читается из базы на каждый запрос.
+
+Граф перечитывает один поток, остальные в это время работают со старым
+графом; ждать приходится только самой первой загрузки.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import Lock
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, Subquery
+
+from foodgram.caches import aget_version, bump_version, get_version, is_shared
+from recipes.models import Favorite, Subscription
+
+# Сколько подписок пользователя и подписок каждого из них просматривать
+# при поиске «друзей друзей»: время не зависит от числа подписок.
+SUGGESTION_FANOUT = 100
+# Сколько последних избранных рецептов и соседей по ним учитывать.
+COFAVORITE_RECIPES = 50
+COFAVORITE_USERS = 200
+COFAVORITE_AUTHORS = 100
+FRIEND_OF_FRIEND_WEIGHT = 2
+COFAVORITE_WEIGHT = 1
+POPULAR_AUTHORS = 100
+
+
+class AuthorIds:
+    """Отсортированные id авторов с проверкой вхождения двоичным поиском."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids):
+        self._ids = ids
+
+    def __contains__(self, author_id):
+        index = bisect_left(self._ids, author_id)
+        return index < len(self._ids) and self._ids[index] == author_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def sample(self, size):
+        """Не больше `size` id, равномерно по всему списку."""
+        step = max(len(self._ids) // size, 1)
+        return self._ids[::step][:size]
+
+
+def _version_key(user_id):
+    return f"subscriptions-version:{user_id}"
+
+
+def _row(user_id):
+    return array(
+        "q",
+        Subscription.objects.filter(user_id=user_id)
+        .order_by("author_id")
+        .values_list("author_id", flat=True),
+    )
+
+
+class SubscriptionGraph:
+    def __init__(self):
+        self._following = {}
+        self._versions = {}
+        self.popular = ()
+        self._loaded_at = None
+        self._loaded = False
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        following = {}
+        followers = Counter()
+        for user_id, author_id in (
+            Subscription.objects.order_by("user_id", "author_id")
+            .values_list("user_id", "author_id")
+            .iterator(chunk_size=10_000)
+        ):
+            following.setdefault(user_id, array("q")).append(author_id)
+            followers[author_id] += 1
+        with self._lock:
+            self._following = following
+            # Версии строк неизвестны: каждая сверится при обращении.
+            self._versions = {}
+            self.popular = tuple(
+                author_id
+                for author_id, _ in followers.most_common(POPULAR_AUTHORS)
+            )
+            self._loaded_at = monotonic()
+            self._loaded = True
+
+    def _refresh(self):
+        """Перечитывает устаревший граф, не больше одного потока сразу."""
+        if not self._load_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if self._is_stale():
+                self._load()
+        finally:
+            self._load_lock.release()
+
+    def _is_stale(self):
+        return (
+            self._loaded_at is None
+            or monotonic() - self._loaded_at > settings.SUBSCRIPTION_GRAPH_TTL
+        )
+
+    def _cached_row(self, user_id, version):
+        with self._lock:
+            if self._versions.get(user_id) == version:
+                self.hits += 1
+                return AuthorIds(self._following.get(user_id, array("q")))
+        self.misses += 1
+        return None
+
+    def _store_row(self, user_id, version, row):
+        with self._lock:
+            self._following[user_id] = row
+            self._versions[user_id] = version
+        return AuthorIds(row)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def following(self, user_id):
+        """Актуальные подписки пользователя."""
+        if self._is_stale():
+            self._refresh()
+        if not is_shared():
+            self.misses += 1
+            return AuthorIds(_row(user_id))
+        version = get_version(_version_key(user_id))
+        row = self._cached_row(user_id, version)
+        if row is None:
+            row = self._store_row(user_id, version, _row(user_id))
+        return row
+
+    async def afollowing(self, user_id):
+        if self._is_stale():
+            await sync_to_async(self._refresh)()
+        if not is_shared():
+            self.misses += 1
+            return AuthorIds(await sync_to_async(_row)(user_id))
+        version = await aget_version(_version_key(user_id))
+        row = self._cached_row(user_id, version)
+        if row is None:
+            row = self._store_row(
+                user_id, version, await sync_to_async(_row)(user_id)
+            )
+        return row
+
+    def followees_of(self, user_id):
+        """Подписки другого пользователя, возможно устаревшие на TTL."""
+        return AuthorIds(self._following.get(user_id, array("q")))
+
+    def _apply(self, user_id, author_id, subscribed):
+        version = bump_version(_version_key(user_id))
+        with self._lock:
+            if version is None or self._versions.get(user_id) != version - 1:
+                # Строка уже отстала: перечитается при обращении.
+                self._versions.pop(user_id, None)
+                return
+            row = self._following.setdefault(user_id, array("q"))
+            index = bisect_left(row, author_id)
+            present = index < len(row) and row[index] == author_id
+            if subscribed and not present:
+                insort(row, author_id)
+            elif not subscribed and present:
+                del row[index]
+            self._versions[user_id] = version
+
+    def subscribed(self, user_id, author_id):
+        transaction.on_commit(
+            lambda: self._apply(user_id, author_id, True),
+            using=router.db_for_write(Subscription),
+        )
+
+    def unsubscribed(self, user_id, author_id):
+        transaction.on_commit(
+            lambda: self._apply(user_id, author_id, False),
+            using=router.db_for_write(Subscription),
+        )
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "users": len(self._following),
+            "edges": sum(len(row) for row in self._following.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+subscription_graph = SubscriptionGraph()
+
+
+def _cofavorite_authors(user_id):
+    recipes = (
+        Favorite.objects.filter(user_id=user_id)
+        .order_by("-added_at")
+        .values("recipe_id")[:COFAVORITE_RECIPES]
+    )
+    neighbours = (
+        Favorite.objects.filter(recipe_id__in=Subquery(recipes))
+        .exclude(user_id=user_id)
+        .order_by()
+        .values("user_id")
+        .distinct()[:COFAVORITE_USERS]
+    )
+    return (
+        Favorite.objects.filter(user_id__in=Subquery(neighbours))
+        .values_list("recipe__author_id")
+        .annotate(total=Count("pk"))
+        .order_by("-total")[:COFAVORITE_AUTHORS]
+    )
+
+
+def suggest_authors(user_id, limit):
+    """Id авторов, на которых пользователю стоит подписаться.
+
+    Очки: подписки тех, на кого он подписан («друзья друзей»), и авторы,
+    которых любят пользователи с тем же избранным. Без сигналов —
+    авторы с наибольшим числом подписчиков.
+    """
+    following = subscription_graph.following(user_id)
+    scores = Counter()
+    for followee in following.sample(SUGGESTION_FANOUT):
+        for author_id in subscription_graph.followees_of(followee).sample(
+            SUGGESTION_FANOUT
+        ):
+            scores[author_id] += FRIEND_OF_FRIEND_WEIGHT
+    for author_id, total in _cofavorite_authors(user_id):
+        scores[author_id] += COFAVORITE_WEIGHT * total
+
+    for popular_rank, author_id in enumerate(subscription_graph.popular):
+        # Популярность только разрешает ничьи и заполняет пустую выдачу.
+        scores[author_id] += 1 / (popular_rank + 2)
+
+    candidates = (
+        (score, author_id)
+        for author_id, score in scores.items()
+        if author_id != user_id and author_id not in following
+    )
+    return [
+        author_id
+        for _, author_id in heapq.nlargest(
+            limit, candidates, key=lambda item: (item[0], -item[1])
+        )
+    ]
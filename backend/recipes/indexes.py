@@ -0,0 +1,54 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Collate, Upper
+
+
+class PrefixSearchIndex(models.Index):
+    """Индекс под поиск по началу строки (`__startswith`).
+
+    Django строит `LIKE 'префикс%'`, а обычный индекс под него годится
+    не везде: PostgreSQL с не-C локалью использует для LIKE только
+    индекс с классом операторов varchar_pattern_ops, SQLite — только
+    индекс с правилом сравнения NOCASE (LIKE в SQLite регистронезависим).
+    """
+
+    def _for_vendor(self, connection):
+        if connection.vendor == "postgresql":
+            return models.Index(
+                fields=self.fields,
+                name=self.name,
+                opclasses=("varchar_pattern_ops",) * len(self.fields),
+            )
+        if connection.vendor == "sqlite":
+            return models.Index(
+                *(Collate(F(field), "NOCASE") for field in self.fields),
+                name=self.name,
+            )
+        return models.Index(fields=self.fields, name=self.name)
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        return self._for_vendor(schema_editor.connection).create_sql(
+            model, schema_editor, using=using, **kwargs
+        )
+
+
+class TrigramSearchIndex(PrefixSearchIndex):
+    """Индекс под регистронезависимый поиск по полю.
+
+    В PostgreSQL — GIN-индекс pg_trgm по UPPER(поле): его используют и
+    `__istartswith` (Django сравнивает UPPER(поле)), и похожесть
+    `Upper(поле) % 'СТРОКА'`. В остальных СУБД — индекс под поиск по
+    началу строки, как у PrefixSearchIndex.
+    """
+
+    def _for_vendor(self, connection):
+        if connection.vendor == "postgresql":
+            return GinIndex(
+                *(
+                    OpClass(Upper(field), name="gin_trgm_ops")
+                    for field in self.fields
+                ),
+                name=self.name,
+            )
+        return super()._for_vendor(connection)
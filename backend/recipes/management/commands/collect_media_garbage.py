@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from recipes.files import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из MEDIA_ROOT картинки рецептов и аватары, на которые нет "
+        "ссылок в базе (запускать периодически, например из cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, что было бы удалено",
+        )
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=60,
+            help=(
+                "Не трогать файлы моложе стольких минут: их загрузка "
+                "может быть ещё не закоммичена (по умолчанию: 60)"
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Сколько файлов удалять параллельно (по умолчанию: 4)",
+        )
+
+    def handle(self, *args, **options):
+        report = collect_garbage(
+            timedelta(minutes=options["grace_minutes"]),
+            dry_run=options["dry_run"],
+            workers=options["workers"],
+            log=(
+                self.stdout.write
+                if options["verbosity"] > 1 or options["dry_run"]
+                else lambda name: None
+            ),
+        )
+        title = "Пробный запуск" if options["dry_run"] else "Мусор удалён"
+        self.stdout.write(self.style.SUCCESS(f"{title}: {report}"))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.changes import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Сжимает журнал изменений: удаляет перекрытые и устаревшие записи "
+        "(запускать периодически, например из cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.CHANGES_RETENTION_DAYS,
+            help=(
+                "Сколько дней хранить записи (по умолчанию: "
+                f"{settings.CHANGES_RETENTION_DAYS})"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        report = compact(options["retention_days"])
+        self.stdout.write(self.style.SUCCESS(f"Журнал сжат: {report}"))
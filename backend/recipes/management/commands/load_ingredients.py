@@ -4,10 +4,15 @@ from pathlib import Path
 from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
+from recipes.nutrition import NUTRIENTS, recompute_for_ingredients
 
 
 class Command(BaseCommand):
-    help = "Загружает ингредиенты из JSON файла в базу данных"
+    help = (
+        "Загружает ингредиенты из JSON файла в базу данных; необязательные "
+        "calories, protein, fat и carbohydrates задают пищевую ценность "
+        "единицы измерения"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -34,20 +39,43 @@ class Command(BaseCommand):
 
         created_count = 0
         skipped_count = 0
+        # Продукты с изменённой пищевой ценностью: их рецепты
+        # пересчитываются одной пачкой после загрузки.
+        changed_ids = []
 
         for item in ingredients_data:
-            _, created = Ingredient.objects.get_or_create(
+            nutrition = {
+                nutrient: item[nutrient]
+                for nutrient in NUTRIENTS
+                if nutrient in item
+            }
+            ingredient, created = Ingredient.objects.get_or_create(
                 name=item["name"],
                 measurement_unit=item["measurement_unit"],
+                defaults=nutrition,
             )
             if created:
                 created_count += 1
+            elif any(
+                getattr(ingredient, nutrient) != value
+                for nutrient, value in nutrition.items()
+            ):
+                for nutrient, value in nutrition.items():
+                    setattr(ingredient, nutrient, value)
+                ingredient.save(update_fields=nutrition)
+                changed_ids.append(ingredient.pk)
             else:
                 skipped_count += 1
 
+        recomputed = (
+            recompute_for_ingredients(changed_ids) if changed_ids else 0
+        )
         self.stdout.write(
             self.style.SUCCESS(
                 f"Загрузка завершена. "
-                f"Создано: {created_count}, пропущено (уже существуют): {skipped_count}"
+                f"Создано: {created_count}, "
+                f"обновлена пищевая ценность: {len(changed_ids)}, "
+                f"пропущено (уже существуют): {skipped_count}, "
+                f"пересчитано рецептов: {recomputed}"
             )
         )
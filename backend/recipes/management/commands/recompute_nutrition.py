@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.nutrition import recompute, recompute_for_ingredients
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает пищевую ценность рецептов по каталогу продуктов "
+        "(после правок каталога в обход load_ingredients и админки)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingredient",
+            type=int,
+            action="append",
+            default=[],
+            help="Только рецепты с этим продуктом (можно повторять)",
+        )
+
+    def handle(self, *args, **options):
+        if options["ingredient"]:
+            changed = recompute_for_ingredients(options["ingredient"])
+        else:
+            changed = recompute()
+        self.stdout.write(
+            self.style.SUCCESS(f"Изменилась пищевая ценность: {changed}")
+        )
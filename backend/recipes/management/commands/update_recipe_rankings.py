@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ranking import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рейтинги popular и trending по избранному и "
+        "спискам покупок (запускать периодически, например из cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Размер пачки при чтении и записи (по умолчанию: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитаны рейтинги рецептов: {updated}")
+        )
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:23
+
+import math
+from collections import defaultdict
+from datetime import UTC, datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Копия формулы recipes.ranking на момент миграции.
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def backfill_added_at(apps, schema_editor):
+    # Время добавления неизвестно; оценка снизу — публикация рецепта,
+    # а не время миграции, которое сделало бы всё старое «свежим».
+    Recipe = apps.get_model('recipes', 'Recipe')
+    pub_date = Recipe.objects.filter(pk=models.OuterRef('recipe_id')).values(
+        'pub_date'
+    )[:1]
+    for model_name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', model_name).objects.update(
+            added_at=models.Subquery(pub_date)
+        )
+
+
+def create_ranks(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRank = apps.get_model('recipes', 'RecipeRank')
+    tau = settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+    popularity = defaultdict(int)
+    trending = {}
+    for model_name in ('Favorite', 'ShoppingCart'):
+        for recipe_id, added_at in (
+            apps.get_model('recipes', model_name)
+            .objects.order_by()
+            .values_list('recipe_id', 'added_at')
+            .iterator(chunk_size=1000)
+        ):
+            popularity[recipe_id] += 1
+            weight = (added_at - TRENDING_EPOCH).total_seconds() / tau
+            if recipe_id in trending:
+                # logaddexp, как в recipes.ranking.record_added.
+                previous = trending[recipe_id]
+                weight = max(previous, weight) + math.log1p(
+                    math.exp(-abs(previous - weight))
+                )
+            trending[recipe_id] = weight
+    RecipeRank.objects.bulk_create(
+        (
+            RecipeRank(
+                recipe_id=recipe_id,
+                popularity=popularity[recipe_id],
+                trending=trending.get(recipe_id, 0),
+            )
+            for recipe_id in Recipe.objects.values_list(
+                'id', flat=True
+            ).iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_image_indexes_and_relation_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='RecipeRank',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popularity', models.PositiveIntegerField(default=0, verbose_name='В избранном и списках покупок')),
+                ('trending', models.FloatField(default=0, verbose_name='Затухающий рейтинг')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+                'indexes': [models.Index(fields=['-popularity', '-recipe'], name='reciperank_popular_idx'), models.Index(fields=['-trending', '-recipe'], name='reciperank_trending_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_added_at, migrations.RunPython.noop),
+        migrations.RunPython(create_ranks, migrations.RunPython.noop),
+    ]
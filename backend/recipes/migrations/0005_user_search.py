@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:31
+
+import recipes.indexes
+from django.db import migrations
+
+
+def create_trigram_extension(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0004_index_audit'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_trigram_extension, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['username'], name='user_username_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['first_name'], name='user_first_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['last_name'], name='user_last_name_search_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_user_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorite',
+            name='added_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='added_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата добавления'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:20
+
+from django.db import migrations
+
+# Ключ pg_advisory_xact_lock, под которым выдаются id журнала.
+CHANGE_ID_LOCK = 0x6368616E6765
+
+CREATE_TRIGGER = f'''
+CREATE FUNCTION recipes_change_commit_order() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock({CHANGE_ID_LOCK});
+    UPDATE recipes_change
+    SET id = nextval(pg_get_serial_sequence('recipes_change', 'id'))
+    WHERE id = NEW.id;
+    RETURN NULL;
+END
+$$;
+CREATE CONSTRAINT TRIGGER recipes_change_commit_order
+AFTER INSERT ON recipes_change
+DEFERRABLE INITIALLY DEFERRED
+FOR EACH ROW EXECUTE FUNCTION recipes_change_commit_order();
+'''
+
+DROP_TRIGGER = '''
+DROP TRIGGER recipes_change_commit_order ON recipes_change;
+DROP FUNCTION recipes_change_commit_order();
+'''
+
+
+def create_commit_order_trigger(apps, schema_editor):
+    # В SQLite пишущие транзакции идут по одной, и id и так растут в
+    # порядке коммита.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_commit_order_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_nutrition'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_commit_order_trigger, drop_commit_order_trigger
+        ),
+    ]
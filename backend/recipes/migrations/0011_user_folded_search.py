@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:26
+
+import recipes.indexes
+from django.db import migrations, models
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def fold_search_fields(apps, schema_editor):
+    # str.casefold, как в User.save(): LOWER() в SQLite знает только ASCII.
+    User = apps.get_model('recipes', 'User')
+    users = []
+    for user in User.objects.only(*SEARCH_FIELDS).iterator(chunk_size=1000):
+        for field in SEARCH_FIELDS:
+            setattr(user, f'{field}_folded', getattr(user, field).casefold())
+        users.append(user)
+        if len(users) == 1000:
+            User.objects.bulk_update(
+                users, [f'{field}_folded' for field in SEARCH_FIELDS]
+            )
+            users = []
+    User.objects.bulk_update(
+        users, [f'{field}_folded' for field in SEARCH_FIELDS]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0010_change_commit_order'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_username_search_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_first_name_search_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_last_name_search_idx',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='first_name_folded',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='last_name_folded',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_folded',
+            field=models.CharField(default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(
+            fold_search_fields, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['username_folded'], name='user_username_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['first_name_folded'], name='user_first_name_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=recipes.indexes.TrigramSearchIndex(fields=['last_name_folded'], name='user_last_name_search_idx'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.utils import timezone
+
+from recipes.indexes import PrefixSearchIndex, TrigramSearchIndex
 
 
 class User(AbstractUser):
@@ -33,6 +36,19 @@ class User(AbstractUser):
         "Фамилия", max_length=150, help_text="Фамилия пользователя"
     )
 
+    # Копии полей поиска в нижнем регистре (str.casefold) для
+    # UserFilter: LIKE и LOWER() в SQLite не знают регистра кириллицы.
+    # Заполняются в save(); bulk_create и update() их не трогают.
+    username_folded = models.CharField(
+        max_length=150, editable=False, default=""
+    )
+    first_name_folded = models.CharField(
+        max_length=150, editable=False, default=""
+    )
+    last_name_folded = models.CharField(
+        max_length=150, editable=False, default=""
+    )
+
     avatar = models.ImageField(
         "Аватар",
         upload_to="users/avatars/",
@@ -43,15 +59,46 @@ class User(AbstractUser):
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("username", "first_name", "last_name")
+    SEARCH_FIELDS = ("username", "first_name", "last_name")
 
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ("email",)
+        indexes = (
+            # Аватар есть у меньшинства пользователей.
+            models.Index(
+                fields=("avatar",),
+                condition=models.Q(avatar__isnull=False),
+                name="user_avatar_idx",
+            ),
+            *(
+                TrigramSearchIndex(
+                    fields=(f"{field}_folded",),
+                    name=f"user_{field}_search_idx",
+                )
+                for field in ("username", "first_name", "last_name")
+            ),
+        )
 
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        for field in self.SEARCH_FIELDS:
+            setattr(self, f"{field}_folded", getattr(self, field).casefold())
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields,
+                *(
+                    f"{field}_folded"
+                    for field in self.SEARCH_FIELDS
+                    if field in update_fields
+                ),
+            }
+        super().save(*args, **kwargs)
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(
@@ -59,6 +106,7 @@ class Subscription(models.Model):
         on_delete=models.CASCADE,
         related_name="subscriptions",
         verbose_name="Подписчик",
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -97,6 +145,31 @@ class Ingredient(models.Model):
         max_length=64,
         verbose_name="Единица измерения",
     )
+    # Пищевая ценность одной единицы measurement_unit; пусто — нет данных.
+    calories = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(0),),
+        verbose_name="Калории, ккал",
+    )
+    protein = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(0),),
+        verbose_name="Белки, г",
+    )
+    fat = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(0),),
+        verbose_name="Жиры, г",
+    )
+    carbohydrates = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(0),),
+        verbose_name="Углеводы, г",
+    )
 
     class Meta:
         verbose_name = "Продукт"
@@ -111,6 +184,11 @@ class Ingredient(models.Model):
                 name="unique_ingredient",
             ),
         )
+        indexes = (
+            PrefixSearchIndex(
+                fields=("name",), name="ingredient_name_prefix_idx"
+            ),
+        )
 
     def __str__(self):
         return f"{self.name} ({self.measurement_unit})"
@@ -121,6 +199,7 @@ class Recipe(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         verbose_name="Автор",
+        db_index=False,
     )
     name = models.CharField(
         max_length=256,
@@ -129,6 +208,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to="recipes/images/",
         verbose_name="Изображение",
+        db_index=True,
     )
     text = models.TextField(
         verbose_name="Описание",
@@ -142,22 +222,56 @@ class Recipe(models.Model):
         verbose_name="Дата публикации",
         db_index=True,
     )
+    # Обновляется в save(), а не auto_now: фикстуры загружаются без
+    # pre_save. По нему выгрузка снимков находит изменённые рецепты.
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+        verbose_name="Дата изменения",
+    )
+    # Суммы по продуктам рецепта, пересчитываются при изменении состава
+    # и каталога (recipes.nutrition); пусто — ни у одного продукта нет
+    # данных.
+    calories = models.FloatField(
+        null=True, editable=False, verbose_name="Калорийность, ккал"
+    )
+    protein = models.FloatField(
+        null=True, editable=False, verbose_name="Белки, г"
+    )
+    fat = models.FloatField(null=True, editable=False, verbose_name="Жиры, г")
+    carbohydrates = models.FloatField(
+        null=True, editable=False, verbose_name="Углеводы, г"
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-pub_date",)
         default_related_name = "recipes"
+        indexes = (
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.updated_at = timezone.now()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         verbose_name="Рецепт",
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -192,13 +306,19 @@ class UserRecipeRelation(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         verbose_name="Пользователь",
-        db_index=True,
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         verbose_name="Рецепт",
     )
+    # default, а не auto_now_add: фикстуры загружаются без pre_save.
+    added_at = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name="Дата добавления",
+    )
 
     class Meta:
         abstract = True
@@ -214,7 +334,7 @@ class UserRecipeRelation(models.Model):
         )
 
     def __str__(self):
-        return f"{self.user.username} добавил {self.recipe.name} в {self.Meta.verbose_name.lower()}"
+        return f"{self.user.username} добавил {self.recipe.name} в {self._meta.verbose_name.lower()}"
 
 
 class Favorite(UserRecipeRelation):
@@ -227,3 +347,107 @@ class ShoppingCart(UserRecipeRelation):
     class Meta(UserRecipeRelation.Meta):
         verbose_name = "Список покупок"
         verbose_name_plural = "Списки покупок"
+
+
+class RecipeRank(models.Model):
+    """Рейтинги рецепта для сортировок popular и trending.
+
+    trending хранит ln(Σ exp((t - эпоха) / τ)) по всем добавлениям в
+    избранное и список покупок: порядок по нему совпадает с порядком
+    по сумме экспоненциально затухающих весов на любой момент времени.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rank",
+        verbose_name="Рецепт",
+    )
+    popularity = models.PositiveIntegerField(
+        default=0,
+        verbose_name="В избранном и списках покупок",
+    )
+    trending = models.FloatField(
+        default=0,
+        verbose_name="Затухающий рейтинг",
+    )
+
+    class Meta:
+        verbose_name = "Рейтинг рецепта"
+        verbose_name_plural = "Рейтинги рецептов"
+        indexes = (
+            models.Index(
+                fields=("-popularity", "-recipe"),
+                name="reciperank_popular_idx",
+            ),
+            models.Index(
+                fields=("-trending", "-recipe"),
+                name="reciperank_trending_idx",
+            ),
+        )
+
+    def __str__(self):
+        return f"Рейтинг {self.recipe_id}"
+
+
+class Change(models.Model):
+    """Запись журнала изменений для синхронизации клиентов.
+
+    Пишется в одной транзакции с самим изменением (recipes.changes);
+    id служит курсором и растёт в порядке коммита. Изменения избранного
+    и списка покупок видны только их владельцу (user), остальные — всем.
+    """
+
+    class Kind(models.TextChoices):
+        RECIPE = "recipe", "Рецепт"
+        INGREDIENT = "ingredient", "Продукт"
+        FAVORITE = "favorite", "Избранное"
+        SHOPPING_CART = "shopping_cart", "Список покупок"
+
+    class Action(models.TextChoices):
+        CREATED = "created", "Создан"
+        UPDATED = "updated", "Изменён"
+        DELETED = "deleted", "Удалён"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(
+        max_length=16,
+        choices=Kind.choices,
+        verbose_name="Тип объекта",
+    )
+    action = models.CharField(
+        max_length=8,
+        choices=Action.choices,
+        verbose_name="Действие",
+    )
+    object_id = models.BigIntegerField(verbose_name="id объекта")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_index=False,
+        verbose_name="Владелец",
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Время",
+    )
+
+    class Meta:
+        verbose_name = "Изменение"
+        verbose_name_plural = "Журнал изменений"
+        ordering = ("id",)
+        indexes = (
+            # Лента: публичные (user IS NULL) и личные изменения после
+            # курсора читаются диапазоном по одному индексу.
+            models.Index(fields=("user", "id"), name="change_feed_idx"),
+            models.Index(
+                fields=("kind", "object_id"), name="change_object_idx"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.action}"
@@ -0,0 +1,116 @@
+"""
+Пищевая ценность рецептов: суммы по продуктам, хранимые в Recipe.
+
+Суммы рецептов — это произведение разреженной матрицы количеств
+(рецепты × продукты, строки RecipeIngredient) на матрицу ценности
+продуктов (продукты × 4). При записи рецепта продукты уже загружены
+сериализатором, и суммы считаются в Python без запросов (totals). При
+изменении каталога произведение считает база: один GROUP BY по
+RecipeIngredient на пачку рецептов (recompute), и обновляются только
+рецепты, у которых суммы изменились.
+"""
+
+from django.db import router, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from recipes.changes import record_changes
+from recipes.models import Change, Recipe, RecipeIngredient
+
+NUTRIENTS = ("calories", "protein", "fat", "carbohydrates")
+BATCH_SIZE = 1000
+
+# Отправляется в транзакции пересчёта с recipe_ids рецептов, у которых
+# изменились суммы: UPDATE через QuerySet не вызывает post_save.
+nutrition_changed = Signal()
+
+
+def _round(value):
+    # Сумма в базе и в Python может отличаться в последних знаках.
+    return None if value is None else round(value, 2)
+
+
+def totals(items):
+    """Суммы по парам (продукт, количество) для полей Recipe."""
+    result = dict.fromkeys(NUTRIENTS)
+    for ingredient, amount in items:
+        for nutrient in NUTRIENTS:
+            value = getattr(ingredient, nutrient)
+            if value is not None:
+                result[nutrient] = (result[nutrient] or 0) + value * amount
+    return {nutrient: _round(value) for nutrient, value in result.items()}
+
+
+def _chunk_totals(recipe_ids):
+    rows = (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values("recipe_id")
+        .annotate(
+            **{
+                nutrient: Sum(F("amount") * F(f"ingredient__{nutrient}"))
+                for nutrient in NUTRIENTS
+            }
+        )
+    )
+    return {
+        row["recipe_id"]: {
+            nutrient: _round(row[nutrient]) for nutrient in NUTRIENTS
+        }
+        for row in rows
+    }
+
+
+def recompute(recipes=None):
+    """Пересчитывает суммы рецептов из `recipes` (по умолчанию всех).
+
+    Возвращает число рецептов, у которых суммы изменились; им обновляется
+    updated_at (снимки API), пишется запись в журнал изменений и
+    отправляется nutrition_changed.
+    """
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    recipes = recipes.order_by("pk").values_list("pk", *NUTRIENTS)
+    empty = dict.fromkeys(NUTRIENTS)
+    changed_total = 0
+    last_pk = 0
+    while chunk := list(recipes.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+        last_pk = chunk[-1][0]
+        computed = _chunk_totals([row[0] for row in chunk])
+        updated_at = timezone.now()
+        changed = [
+            (pk, new)
+            for pk, *current in chunk
+            if (new := computed.get(pk, empty))
+            != dict(zip(NUTRIENTS, current, strict=True))
+        ]
+        if not changed:
+            continue
+        # По UPDATE на рецепт в одной транзакции: bulk_update строит CASE
+        # по каждой строке, и на его сборку уходит больше, чем на запросы.
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            for pk, new in changed:
+                Recipe.objects.filter(pk=pk).update(
+                    updated_at=updated_at, **new
+                )
+            recipe_ids = [pk for pk, _ in changed]
+            record_changes(
+                Change.Kind.RECIPE, Change.Action.UPDATED, recipe_ids
+            )
+            nutrition_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+        changed_total += len(changed)
+    return changed_total
+
+
+def recompute_for_ingredients(ingredient_ids):
+    """Пересчитывает рецепты, в которые входит хоть один из продуктов."""
+    return recompute(
+        Recipe.objects.filter(
+            Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=OuterRef("pk"), ingredient_id__in=ingredient_ids
+                )
+            )
+        )
+    )
@@ -0,0 +1,26 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Без фильтров берёт оценку pg_class.reltuples вместо COUNT(*)."""
+
+    exact_count_limit = 10_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class "
+                        "WHERE oid = %s::regclass",
+                        (self.object_list.model._meta.db_table,),
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] > self.exact_count_limit:
+                    return row[0]
+        return super().count
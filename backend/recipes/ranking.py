@@ -0,0 +1,109 @@
+"""
+Рейтинги popular и trending (модель RecipeRank).
+
+trending — логарифм суммы весов exp((t - TRENDING_EPOCH) / τ) по всем
+добавлениям рецепта в избранное и список покупок, где τ выводится из
+периода полураспада TRENDING_HALF_LIFE_HOURS. Добавление обновляет его
+инкрементально через logaddexp, а пакетный пересчёт
+(`manage.py update_recipe_rankings`) восстанавливает оба рейтинга по
+таблицам связей и исправляет накопившийся дрейф.
+"""
+
+import math
+from collections import defaultdict
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, RecipeRank, ShoppingCart
+
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def _tau_seconds():
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def trending_weight(at):
+    """ln веса события в момент `at` в единицах τ от эпохи."""
+    return (at - TRENDING_EPOCH).total_seconds() / _tau_seconds()
+
+
+def create_ranks(recipe_ids):
+    """Заводит нулевые рейтинги рецептам, у которых их ещё нет.
+
+    Сортировки popular и trending показывают только рецепты со строкой
+    рейтинга: её заводит сигнал создания рецепта, а код, создающий
+    рецепты через bulk_create в обход сигналов, вызывает эту функцию.
+    """
+    RecipeRank.objects.bulk_create(
+        (RecipeRank(recipe_id=recipe_id) for recipe_id in recipe_ids),
+        ignore_conflicts=True,
+    )
+
+
+def record_added(recipe_id, at=None):
+    weight = trending_weight(at or timezone.now())
+    updated = RecipeRank.objects.filter(recipe_id=recipe_id).update(
+        popularity=F("popularity") + 1,
+        trending=Greatest(F("trending"), Value(weight))
+        + Ln(1 + Exp(-Abs(F("trending") - Value(weight)))),
+    )
+    if not updated:
+        RecipeRank.objects.bulk_create(
+            (RecipeRank(recipe_id=recipe_id, popularity=1, trending=weight),),
+            ignore_conflicts=True,
+        )
+
+
+def record_removed(recipe_id):
+    RecipeRank.objects.filter(recipe_id=recipe_id, popularity__gt=0).update(
+        popularity=F("popularity") - 1
+    )
+
+
+def rebuild(batch_size=1000):
+    """Пересчитывает все рейтинги с нормировкой на текущий момент."""
+    now = timezone.now()
+    now_weight = trending_weight(now)
+    tau = _tau_seconds()
+    popularity = defaultdict(int)
+    decayed = defaultdict(float)
+
+    for model in (Favorite, ShoppingCart):
+        for recipe_id, added_at in (
+            model.objects.order_by()
+            .values_list("recipe_id", "added_at")
+            .iterator(chunk_size=batch_size)
+        ):
+            popularity[recipe_id] += 1
+            decayed[recipe_id] += math.exp(
+                (added_at - now).total_seconds() / tau
+            )
+
+    ranks = []
+    for recipe_id in (
+        Recipe.objects.order_by().values_list("id", flat=True).iterator()
+    ):
+        total = decayed.get(recipe_id, 0.0)
+        ranks.append(
+            RecipeRank(
+                recipe_id=recipe_id,
+                popularity=popularity.get(recipe_id, 0),
+                trending=now_weight + math.log(total) if total > 0 else 0.0,
+            )
+        )
+
+    with transaction.atomic():
+        RecipeRank.objects.bulk_create(
+            ranks,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=("recipe",),
+            update_fields=("popularity", "trending"),
+        )
+    return len(ranks)
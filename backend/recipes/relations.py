@@ -0,0 +1,131 @@
+"""
+Запись связей пользователя (избранное, список покупок, подписки)
+одним SQL-выражением без гонок между параллельными запросами.
+Изменения избранного и списка покупок попадают в журнал изменений
+(recipes.changes) в той же транзакции.
+
+INSERT ... ON CONFLICT DO NOTHING и RETURNING поддерживают и
+PostgreSQL, и SQLite 3.35+.
+"""
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from recipes import events, ranking
+from recipes.changes import USER_RECIPE_KINDS, record_change
+from recipes.graph import subscription_graph
+from recipes.models import Change, Favorite, Recipe, Subscription, User
+from recipes.user_recipes import invalidate_user_recipe_ids
+
+
+def _execute(model, sql, params):
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def add_user_recipe(model, user_id, recipe_id):
+    """Добавляет рецепт в избранное или список покупок.
+
+    Возвращает рецепт (только поля для краткой карточки) или None,
+    если рецепта нет или он уже добавлен.
+    """
+    ops = connections[router.db_for_write(model)].ops
+    table = ops.quote_name(model._meta.db_table)
+    recipes = ops.quote_name(Recipe._meta.db_table)
+    added_at = timezone.now()
+    with transaction.atomic(using=router.db_for_write(model)):
+        rows = _execute(
+            model,
+            f"INSERT INTO {table} (user_id, recipe_id, added_at) "
+            f"SELECT %s, id, %s FROM {recipes} WHERE id = %s "
+            "ON CONFLICT DO NOTHING "
+            "RETURNING recipe_id, "
+            f"(SELECT name FROM {recipes} WHERE id = {table}.recipe_id), "
+            f"(SELECT image FROM {recipes} WHERE id = {table}.recipe_id), "
+            f"(SELECT cooking_time FROM {recipes} "
+            f"WHERE id = {table}.recipe_id)",
+            (user_id, ops.adapt_datetimefield_value(added_at), recipe_id),
+        )
+        if not rows:
+            return None
+        recipe_id, name, image, cooking_time = rows[0]
+        record_change(
+            USER_RECIPE_KINDS[model],
+            Change.Action.CREATED,
+            recipe_id,
+            user_id,
+        )
+    ranking.record_added(recipe_id, added_at)
+    invalidate_user_recipe_ids(model, user_id)
+    if model is Favorite:
+        events.favorite_changed(user_id, recipe_id, True)
+    return Recipe(
+        id=recipe_id, name=name, image=image, cooking_time=cooking_time
+    )
+
+
+def remove_user_recipe(model, user_id, recipe_id):
+    table = connections[router.db_for_write(model)].ops.quote_name(
+        model._meta.db_table
+    )
+    with transaction.atomic(using=router.db_for_write(model)):
+        removed = bool(
+            _execute(
+                model,
+                f"DELETE FROM {table} WHERE user_id = %s AND recipe_id = %s "
+                "RETURNING recipe_id",
+                (user_id, recipe_id),
+            )
+        )
+        if removed:
+            record_change(
+                USER_RECIPE_KINDS[model],
+                Change.Action.DELETED,
+                recipe_id,
+                user_id,
+            )
+    if removed:
+        ranking.record_removed(recipe_id)
+        invalidate_user_recipe_ids(model, user_id)
+        if model is Favorite:
+            events.favorite_changed(user_id, recipe_id, False)
+    return removed
+
+
+def add_subscription(user_id, author_id):
+    """Подписывает на автора; False, если автора нет или подписка есть."""
+    qn = connections[router.db_for_write(Subscription)].ops.quote_name
+    created = bool(
+        _execute(
+            Subscription,
+            f"INSERT INTO {qn(Subscription._meta.db_table)} "
+            "(user_id, author_id) "
+            f"SELECT %s, id FROM {qn(User._meta.db_table)} WHERE id = %s "
+            "ON CONFLICT DO NOTHING RETURNING author_id",
+            (user_id, author_id),
+        )
+    )
+    if created:
+        subscription_graph.subscribed(user_id, author_id)
+        events.following_changed(user_id, author_id, True)
+    return created
+
+
+def remove_subscription(user_id, author_id):
+    table = connections[router.db_for_write(Subscription)].ops.quote_name(
+        Subscription._meta.db_table
+    )
+    removed = bool(
+        _execute(
+            Subscription,
+            f"DELETE FROM {table} WHERE user_id = %s AND author_id = %s "
+            "RETURNING author_id",
+            (user_id, author_id),
+        )
+    )
+    if removed:
+        subscription_graph.unsubscribed(user_id, author_id)
+        events.following_changed(user_id, author_id, False)
+    return removed
@@ -0,0 +1,187 @@
+"""
+Короткие ссылки на рецепты: /s/<код>/.
+
+Код — префикс CODE_PREFIX и id рецепта в base62, с SHORT_LINK_SALT
+перемешанный биекцией. Старые ссылки вида /s/<id>/ обслуживает
+отдельный маршрут: код из одних цифр не спутать с id, потому что
+префикс — буква.
+"""
+
+import hashlib
+import string
+from functools import cache
+from threading import Lock
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router, transaction
+
+from foodgram.caches import aget_version, bump_version, get_version, is_shared
+from recipes.models import Recipe
+
+CODE_PREFIX = "r"
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+# Солёные коды — биекция на 48-битных числах, то есть не длиннее 9 символов.
+ID_SPACE = 1 << 48
+
+
+@cache
+def _salt_keys(salt):
+    digest = hashlib.sha256(salt.encode()).digest()
+    multiplier = int.from_bytes(digest[:6]) | 1
+    return (
+        multiplier,
+        pow(multiplier, -1, ID_SPACE),
+        int.from_bytes(digest[6:12]),
+    )
+
+
+def encode(recipe_id):
+    number = recipe_id
+    if settings.SHORT_LINK_SALT:
+        multiplier, _, offset = _salt_keys(settings.SHORT_LINK_SALT)
+        number = (recipe_id * multiplier + offset) % ID_SPACE
+
+    code = ""
+    while True:
+        number, digit = divmod(number, BASE)
+        code = ALPHABET[digit] + code
+        if not number:
+            return CODE_PREFIX + code
+
+
+def decode(code):
+    if not code.startswith(CODE_PREFIX) or len(code) == len(CODE_PREFIX):
+        return None
+    number = 0
+    for char in code[len(CODE_PREFIX) :]:
+        digit = ALPHABET.find(char)
+        if digit < 0:
+            return None
+        number = number * BASE + digit
+
+    if settings.SHORT_LINK_SALT:
+        if number >= ID_SPACE:
+            return None
+        _, inverse, offset = _salt_keys(settings.SHORT_LINK_SALT)
+        number = (number - offset) * inverse % ID_SPACE
+    return number or None
+
+
+VERSION_KEY = "short-links-version"
+
+
+class LiveRecipeIds:
+    """Битовая карта id существующих рецептов.
+
+    Загружается целиком раз в SHORT_LINK_CACHE_TTL секунд и
+    поддерживается сигналами. Id, которого нет в карте (например,
+    рецепт создан в другом процессе), проверяется в базе. Удаление
+    рецепта увеличивает версию в кэше Django, и карта перезагружается
+    во всех воркерах. Если кэш не общий для воркеров, каждый id
+    проверяется в базе.
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._version = None
+        self._loaded_at = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, version):
+        bits = bytearray()
+        for recipe_id in (
+            Recipe.objects.order_by().values_list("id", flat=True).iterator()
+        ):
+            self._set(bits, recipe_id)
+        with self._lock:
+            self._bits = bits
+            self._version = version
+            self._loaded_at = monotonic()
+
+    @staticmethod
+    def _set(bits, recipe_id):
+        byte = recipe_id >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte - len(bits) + 1))
+        bits[byte] |= 1 << (recipe_id & 7)
+
+    def _is_stale(self, version):
+        return (
+            self._loaded_at is None
+            or self._version != version
+            or monotonic() - self._loaded_at > settings.SHORT_LINK_CACHE_TTL
+        )
+
+    def _lookup(self, recipe_id):
+        byte = recipe_id >> 3
+        found = byte < len(self._bits) and bool(
+            self._bits[byte] & (1 << (recipe_id & 7))
+        )
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def add(self, recipe_id):
+        with self._lock:
+            self._set(self._bits, recipe_id)
+
+    def discard(self, recipe_id):
+        with self._lock:
+            byte = recipe_id >> 3
+            if byte < len(self._bits):
+                self._bits[byte] &= ~(1 << (recipe_id & 7)) & 0xFF
+        transaction.on_commit(
+            lambda: bump_version(VERSION_KEY),
+            using=router.db_for_write(Recipe),
+        )
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def __contains__(self, recipe_id):
+        if not is_shared():
+            return Recipe.objects.filter(pk=recipe_id).exists()
+        # Версия читается до загрузки: удаление во время загрузки
+        # перезагрузит карту ещё раз.
+        version = get_version(VERSION_KEY)
+        if self._is_stale(version):
+            self._load(version)
+        if self._lookup(recipe_id):
+            return True
+        if Recipe.objects.filter(pk=recipe_id).exists():
+            self.add(recipe_id)
+            return True
+        return False
+
+    async def acontains(self, recipe_id):
+        if not is_shared():
+            return await Recipe.objects.filter(pk=recipe_id).aexists()
+        version = await aget_version(VERSION_KEY)
+        if self._is_stale(version):
+            await sync_to_async(self._load)(version)
+        if self._lookup(recipe_id):
+            return True
+        if await Recipe.objects.filter(pk=recipe_id).aexists():
+            self.add(recipe_id)
+            return True
+        return False
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size_bytes": len(self._bits),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+live_recipes = LiveRecipeIds()
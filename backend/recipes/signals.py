@@ -0,0 +1,78 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes import events
+from recipes.changes import record_change
+from recipes.graph import subscription_graph
+from recipes.models import (
+    Change,
+    Ingredient,
+    Recipe,
+    Subscription,
+)
+from recipes.ranking import create_ranks
+from recipes.shortlinks import live_recipes
+
+
+@receiver(post_save, sender=Recipe)
+def track_created_recipe(sender, instance, created, **kwargs):
+    if created:
+        live_recipes.add(instance.pk)
+        create_ranks((instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_deleted_recipe(sender, instance, **kwargs):
+    live_recipes.discard(instance.pk)
+
+
+# API пишет подписки через recipes.relations, сигналы ловят остальное:
+# админку, фикстуры и каскадное удаление пользователей.
+@receiver(post_save, sender=Subscription)
+def track_created_subscription(sender, instance, created, **kwargs):
+    if created:
+        subscription_graph.subscribed(instance.user_id, instance.author_id)
+        events.following_changed(instance.user_id, instance.author_id, True)
+
+
+@receiver(post_delete, sender=Subscription)
+def track_deleted_subscription(sender, instance, **kwargs):
+    subscription_graph.unsubscribed(instance.user_id, instance.author_id)
+    events.following_changed(instance.user_id, instance.author_id, False)
+
+
+_CHANGE_KINDS = {
+    Recipe: Change.Kind.RECIPE,
+    Ingredient: Change.Kind.INGREDIENT,
+}
+
+
+# Журнал изменений пишется в транзакции самого сохранения или удаления,
+# в том числе каскадного (рецепты удалённого автора).
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+def record_saved_object(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(
+        _CHANGE_KINDS[sender],
+        Change.Action.CREATED if created else Change.Action.UPDATED,
+        instance.pk,
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+def record_deleted_object(sender, instance, **kwargs):
+    record_change(_CHANGE_KINDS[sender], Change.Action.DELETED, instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def publish_saved_recipe(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        events.recipe_saved(instance, created)
+
+
+@receiver(post_delete, sender=Recipe)
+def publish_deleted_recipe(sender, instance, **kwargs):
+    events.recipe_deleted(instance.pk)
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из SHA-256 содержимого.
+
+    `recipes/images/photo.png` сохраняется как
+    `recipes/images/ab/cd/abcd….png`; повторная загрузка того же
+    содержимого ничего не пишет и возвращает уже существующее имя.
+    """
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory,
+            content_hash[:2],
+            content_hash[2:4],
+            f"{content_hash}{extension}",
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        return super().save(
+            self.content_name(name, content), content, max_length
+        )
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        try:
+            # Повторная загрузка продлевает отсрочку сборщика мусора
+            # (recipes.files.collect_garbage), пока ссылка не закоммичена.
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(
+            directory, self.directory_permissions_mode or 0o777, exist_ok=True
+        )
+        # Пишем во временный файл и атомарно переименовываем, чтобы
+        # nginx никогда не отдал (и не закэшировал) недописанный файл.
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in content.chunks():
+                    temp_file.write(
+                        chunk if isinstance(chunk, bytes) else chunk.encode()
+                    )
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
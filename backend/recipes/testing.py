@@ -0,0 +1,58 @@
+"""Общие заготовки для тестов приложений recipes и api."""
+
+from django.test import override_settings
+
+from recipes.models import Recipe, User
+
+
+def create_user(username="user", **fields):
+    """Пользователь `username` с почтой username@example.com."""
+    return User.objects.create_user(
+        **{
+            "email": f"{username}@example.com",
+            "username": username,
+            "first_name": "Имя",
+            "last_name": "Фамилия",
+            "password": "password",
+            **fields,
+        }
+    )
+
+
+def build_recipe(author, name="Пирог", **fields):
+    """Несохранённый рецепт, например для bulk_create."""
+    return Recipe(
+        **{
+            "author": author,
+            "name": name,
+            "image": "recipes/images/photo.jpg",
+            "text": "Испечь.",
+            "cooking_time": 60,
+            **fields,
+        }
+    )
+
+
+def create_recipe(author, name="Пирог", **fields):
+    recipe = build_recipe(author, name, **fields)
+    recipe.save()
+    return recipe
+
+
+def worker_settings(number, shared_location=None):
+    """Настройки кэша одного из нескольких воркеров.
+
+    LocMemCache с разными LOCATION — память разных процессов,
+    FileBasedCache в общей папке — общий кэш вроде Redis.
+    """
+    if shared_location:
+        backend = {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": shared_location,
+        }
+    else:
+        backend = {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": f"worker-{number}",
+        }
+    return override_settings(CACHES={"default": backend}, WEB_CONCURRENCY=2)
@@ -1 +1,503 @@
-# Create your tests here.
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Event
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from recipes.changes import (
+    CursorExpired,
+    changes_since,
+    compact,
+    record_change,
+)
+from recipes.files import collect_garbage
+from recipes.graph import (
+    SubscriptionGraph,
+    subscription_graph,
+    suggest_authors,
+)
+from recipes.models import (
+    Change,
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeRank,
+    Subscription,
+)
+from recipes.nutrition import recompute, recompute_for_ingredients
+from recipes.ranking import (
+    create_ranks,
+    rebuild,
+    record_added,
+    trending_weight,
+)
+from recipes.relations import (
+    add_subscription,
+    add_user_recipe,
+    remove_subscription,
+)
+from recipes.testing import (
+    build_recipe,
+    create_recipe,
+    create_user,
+    worker_settings,
+)
+from recipes.user_recipes import user_recipe_ids
+
+
+class MediaGarbageTest(TestCase):
+    """Сборщик удаляет только старые файлы без ссылок."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.author = create_user("author")
+
+    def upload(self, content, age=timedelta(hours=2)):
+        name = default_storage.save(
+            "recipes/images/photo.png", ContentFile(content)
+        )
+        mtime = time.time() - age.total_seconds()
+        os.utime(default_storage.path(name), (mtime, mtime))
+        return name
+
+    def test_collect_garbage(self):
+        used = self.upload(b"used")
+        create_recipe(self.author, image=used)
+        orphan = self.upload(b"orphan")
+        uploading = self.upload(b"uploading", age=timedelta(minutes=1))
+
+        report = collect_garbage(timedelta(hours=1), dry_run=True)
+        self.assertEqual((report.orphaned, report.deleted), (2, 1))
+        self.assertTrue(default_storage.exists(orphan))
+
+        collect_garbage(timedelta(hours=1))
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(used))
+        self.assertTrue(default_storage.exists(uploading))
+
+    def test_same_content(self):
+        first = self.upload(b"photo")
+        self.assertEqual(self.upload(b"photo", age=timedelta(0)), first)
+        self.assertNotEqual(self.upload(b"other"), first)
+        # Повторная загрузка продлила отсрочку сборщика.
+        self.assertLess(
+            time.time() - os.path.getmtime(default_storage.path(first)), 60
+        )
+
+    def test_deleted_only_by_collector(self):
+        old, new = self.upload(b"old"), self.upload(b"new")
+        recipe = create_recipe(self.author, image=old)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image = new
+            recipe.save()
+        self.assertTrue(default_storage.exists(old))
+
+        # Та же картинка загружается заново, ссылка ещё не закоммичена.
+        self.upload(b"old", age=timedelta(0))
+        collect_garbage(timedelta(hours=1))
+        self.assertTrue(default_storage.exists(old))
+
+        self.upload(b"old")
+        collect_garbage(timedelta(hours=1))
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
+
+
+class RelationDedupMigrationTest(TransactionTestCase):
+    """Миграция убирает дубли связей перед уникальным ограничением."""
+
+    migrate_from = ("recipes", "0001_initial")
+    migrate_to = ("recipes", "0002_image_indexes_and_relation_constraints")
+
+    def tearDown(self):
+        call_command("migrate", verbosity=0)
+
+    def test_dedup(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        apps = executor.loader.project_state([self.migrate_from]).apps
+        user = apps.get_model("recipes", "User").objects.create(
+            email="user@example.com", username="user"
+        )
+        recipe = apps.get_model("recipes", "Recipe").objects.create(
+            author=user,
+            name="Пирог",
+            image="recipes/images/photo.jpg",
+            text="Испечь.",
+            cooking_time=60,
+        )
+        favorites = apps.get_model("recipes", "Favorite")
+        carts = apps.get_model("recipes", "ShoppingCart")
+        first = favorites.objects.create(user=user, recipe=recipe)
+        favorites.objects.create(user=user, recipe=recipe)
+        carts.objects.create(user=user, recipe=recipe)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_to])
+        apps = executor.loader.project_state([self.migrate_to]).apps
+        self.assertEqual(
+            list(
+                apps.get_model("recipes", "Favorite").objects.values_list(
+                    "id", flat=True
+                )
+            ),
+            [first.id],
+        )
+        self.assertEqual(
+            apps.get_model("recipes", "ShoppingCart").objects.count(), 1
+        )
+
+
+class NutritionTest(TestCase):
+    """Хранимые суммы пересчитываются только у изменившихся рецептов."""
+
+    def test_recompute(self):
+        author = create_user("author")
+        flour, salt = Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name="мука",
+                    measurement_unit="г",
+                    calories=3.4,
+                    protein=0.1,
+                ),
+                Ingredient(name="соль", measurement_unit="г"),
+            )
+        )
+        bread, brine = Recipe.objects.bulk_create(
+            build_recipe(author, name, text="Готовить.", cooking_time=10)
+            for name in ("Хлеб", "Рассол")
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(recipe=bread, ingredient=flour, amount=500),
+                RecipeIngredient(recipe=bread, ingredient=salt, amount=10),
+                RecipeIngredient(recipe=brine, ingredient=salt, amount=50),
+            )
+        )
+
+        self.assertEqual(recompute(), 1)
+        bread.refresh_from_db()
+        self.assertEqual(
+            (bread.calories, bread.protein, bread.fat), (1700, 50, None)
+        )
+        self.assertEqual(recompute(), 0)
+
+        Ingredient.objects.filter(pk=salt.pk).update(calories=0)
+        changes = Change.objects.count()
+        self.assertEqual(recompute_for_ingredients((salt.pk,)), 1)
+        brine.refresh_from_db()
+        self.assertEqual(brine.calories, 0)
+        self.assertEqual(Change.objects.count(), changes + 1)
+
+
+class SharedCacheTest(TestCase):
+    """Запись в одном воркере видна в другом."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.user = create_user()
+        self.recipe = create_recipe(self.user)
+
+    def worker(self, number, shared):
+        return worker_settings(number, self.cache_dir if shared else None)
+
+    def favorite_from_second_worker(self, shared):
+        with self.worker(2, shared):
+            with self.captureOnCommitCallbacks(execute=True):
+                add_user_recipe(Favorite, self.user.pk, self.recipe.pk)
+
+    def test_shared(self):
+        with self.worker(1, shared=True):
+            self.assertEqual(len(user_recipe_ids(Favorite, self.user.pk)), 0)
+        with self.worker(2, shared=True), self.assertNumQueries(0):
+            self.assertEqual(len(user_recipe_ids(Favorite, self.user.pk)), 0)
+
+        self.favorite_from_second_worker(shared=True)
+        with self.worker(1, shared=True):
+            self.assertIn(
+                self.recipe.pk, user_recipe_ids(Favorite, self.user.pk)
+            )
+
+    def test_process_local(self):
+        for number in (1, 2):
+            with self.worker(number, shared=False), self.assertNumQueries(1):
+                user_recipe_ids(Favorite, self.user.pk)
+
+        self.favorite_from_second_worker(shared=False)
+        with self.worker(1, shared=False):
+            self.assertIn(
+                self.recipe.pk, user_recipe_ids(Favorite, self.user.pk)
+            )
+
+    def subscribe_from_second_worker(self, author, shared, subscribe=True):
+        change = add_subscription if subscribe else remove_subscription
+        with self.worker(2, shared):
+            with self.captureOnCommitCallbacks(execute=True):
+                change(self.user.pk, author.pk)
+
+    def create_author(self):
+        return create_user("author", last_name="Автора")
+
+    def test_subscription_graph(self):
+        author = self.create_author()
+        # Граф первого воркера; второй пишет через общий граф модуля.
+        graph = SubscriptionGraph()
+        with self.worker(1, shared=True):
+            self.assertNotIn(author.pk, graph.following(self.user.pk))
+
+        self.subscribe_from_second_worker(author, shared=True)
+        with self.worker(1, shared=True):
+            self.assertIn(author.pk, graph.following(self.user.pk))
+            with self.assertNumQueries(0):
+                graph.following(self.user.pk)
+
+        self.subscribe_from_second_worker(author, shared=True, subscribe=False)
+        with self.worker(1, shared=True):
+            self.assertNotIn(author.pk, graph.following(self.user.pk))
+
+    def test_subscription_graph_lost_version(self):
+        author = self.create_author()
+        graph = SubscriptionGraph()
+        with self.worker(1, shared=True):
+            graph.following(self.user.pk)
+            # Кэш перезапущен, а подписка записана в обход сигналов.
+            cache.clear()
+            Subscription.objects.bulk_create(
+                [Subscription(user=self.user, author=author)]
+            )
+            self.assertIn(author.pk, graph.following(self.user.pk))
+
+    def test_subscription_graph_process_local(self):
+        author = self.create_author()
+        graph = SubscriptionGraph()
+        with self.worker(1, shared=False):
+            graph.following(self.user.pk)
+
+        self.subscribe_from_second_worker(author, shared=False)
+        with self.worker(1, shared=False):
+            self.assertIn(author.pk, graph.following(self.user.pk))
+
+
+class SuggestionsTest(TestCase):
+    """Подсказки «на кого подписаться» и перечитывание графа подписок."""
+
+    def setUp(self):
+        self.user, self.a, self.b, self.c, self.d, self.e, self.f = (
+            create_user(username)
+            for username in ("me", "a", "b", "c", "d", "e", "f")
+        )
+        self.addCleanup(subscription_graph.invalidate)
+
+    def follow(self, *pairs):
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for user, author in pairs
+        )
+        subscription_graph.invalidate()
+
+    def favorite(self, user, *authors):
+        for author in authors:
+            recipe = create_recipe(
+                author,
+                f"Рецепт {author.username}",
+                image="recipes/images/dish.jpg",
+                text="Готовить.",
+                cooking_time=10,
+            )
+            Favorite.objects.create(user=user, recipe=recipe)
+            yield recipe
+
+    def suggest(self, limit=10):
+        return suggest_authors(self.user.pk, limit)
+
+    def test_friends_of_friends(self):
+        self.follow(
+            (self.user, self.a),
+            (self.user, self.b),
+            (self.a, self.c),
+            (self.a, self.d),
+            (self.b, self.c),
+            # Сам пользователь и уже подписанные в выдачу не попадают.
+            (self.b, self.user),
+            (self.b, self.a),
+        )
+        self.assertEqual(self.suggest(), [self.c.pk, self.d.pk])
+        self.assertEqual(self.suggest(limit=1), [self.c.pk])
+
+    def test_cofavorites(self):
+        neighbour = self.f
+        (recipe,) = self.favorite(self.user, self.c)
+        Favorite.objects.create(user=neighbour, recipe=recipe)
+        list(self.favorite(neighbour, self.d, self.d, self.d, self.e))
+        # Соседу по избранному нравятся d трижды, c и e по разу; на e
+        # пользователь уже подписан.
+        self.follow((self.user, self.e))
+        self.assertEqual(self.suggest(), [self.d.pk, self.c.pk])
+
+    def test_popular_fallback(self):
+        self.follow((self.a, self.c), (self.b, self.c), (self.a, self.d))
+        self.assertEqual(self.suggest(), [self.c.pk, self.d.pk])
+
+    def test_single_flight_reload(self):
+        graph = SubscriptionGraph()
+        graph.following(self.user.pk)
+        graph.invalidate()
+        started, release = Event(), Event()
+        loads = []
+
+        def slow_load():
+            loads.append(None)
+            started.set()
+            release.wait(5)
+            graph._loaded_at = time.monotonic()
+
+        with mock.patch.object(graph, "_load", slow_load):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                first = pool.submit(graph._refresh)
+                self.assertTrue(started.wait(5))
+                # Остальные не ждут перечитывания и не начинают своё.
+                for future in [pool.submit(graph._refresh) for _ in range(3)]:
+                    future.result(timeout=5)
+                release.set()
+                first.result(timeout=5)
+        self.assertEqual(len(loads), 1)
+        self.assertFalse(graph._is_stale())
+
+
+class ChangeLogTest(TestCase):
+    """Журнал изменений: сжатие и чтение после курсора."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def record(self, object_id):
+        record_change(Change.Kind.RECIPE, Change.Action.UPDATED, object_id)
+        return Change.objects.latest("pk").pk
+
+    def test_compaction(self):
+        old = [self.record(1), self.record(2)]
+        Change.objects.filter(pk__in=old).update(
+            created_at=timezone.now() - timedelta(days=10)
+        )
+        horizon = self.record(3)
+        # Перекрыта следующей записью о том же объекте.
+        self.record(4)
+        latest = self.record(4)
+
+        report = compact(retention_days=1)
+        self.assertEqual((report.expired, report.superseded), (2, 1))
+        self.assertEqual(
+            list(Change.objects.values_list("pk", flat=True)),
+            [horizon, latest],
+        )
+        with self.assertRaises(CursorExpired):
+            changes_since(self.user, old[0], 10)
+        page, has_more = changes_since(self.user, horizon - 1, 10)
+        self.assertEqual([change.pk for change in page], [horizon, latest])
+        self.assertFalse(has_more)
+
+
+class RankingTest(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.recipe, self.unranked = Recipe.objects.bulk_create(
+            build_recipe(self.user, name) for name in ("Пирог", "Без рейтинга")
+        )
+        # bulk_create обходит сигналы: строка рейтинга только у первого.
+        create_ranks((self.recipe.pk,))
+
+    def test_missing_rank_rows(self):
+        # Добавление в избранное заводит недостающую строку рейтинга.
+        record_added(self.unranked.pk)
+        self.assertEqual(
+            RecipeRank.objects.get(recipe=self.unranked).popularity, 1
+        )
+        # Пересчёт заводит строки всем рецептам.
+        RecipeRank.objects.filter(recipe=self.unranked).delete()
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(
+            RecipeRank.objects.get(recipe=self.unranked).popularity, 0
+        )
+
+    def test_trending_score(self):
+        first = timezone.now() - timedelta(hours=48)
+        second = timezone.now()
+        record_added(self.recipe.pk, first)
+        record_added(self.recipe.pk, second)
+        rank = RecipeRank.objects.get(recipe=self.recipe)
+        self.assertEqual(rank.popularity, 2)
+        self.assertAlmostEqual(
+            rank.trending,
+            math.log(
+                math.exp(trending_weight(first) - trending_weight(second)) + 1
+            )
+            + trending_weight(second),
+        )
+
+    def test_added_at(self):
+        before = timezone.now()
+        add_user_recipe(Favorite, self.user.pk, self.recipe.pk)
+        added_at = Favorite.objects.get(recipe=self.recipe).added_at
+        self.assertLessEqual(before, added_at)
+        self.assertLessEqual(added_at, timezone.now())
+        self.assertEqual(
+            RecipeRank.objects.get(recipe=self.recipe).popularity, 1
+        )
+
+
+class RankMigrationTest(TransactionTestCase):
+    """Миграция 0003 берёт время добавления из публикации рецепта."""
+
+    migrate_from = ("recipes", "0002_image_indexes_and_relation_constraints")
+    migrate_to = ("recipes", "0003_recipe_rank")
+
+    def tearDown(self):
+        call_command("migrate", verbosity=0)
+
+    def test_backfill(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        apps = executor.loader.project_state([self.migrate_from]).apps
+        user = apps.get_model("recipes", "User").objects.create(
+            email="user@example.com", username="user"
+        )
+        recipe = apps.get_model("recipes", "Recipe").objects.create(
+            author=user,
+            name="Пирог",
+            image="recipes/images/photo.jpg",
+            text="Испечь.",
+            cooking_time=60,
+        )
+        pub_date = timezone.now() - timedelta(days=365)
+        apps.get_model("recipes", "Recipe").objects.update(pub_date=pub_date)
+        apps.get_model("recipes", "Favorite").objects.create(
+            user=user, recipe=recipe
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_to])
+        apps = executor.loader.project_state([self.migrate_to]).apps
+        self.assertEqual(
+            apps.get_model("recipes", "Favorite").objects.get().added_at,
+            pub_date,
+        )
+        rank = apps.get_model("recipes", "RecipeRank").objects.get()
+        self.assertEqual(rank.popularity, 1)
+        self.assertAlmostEqual(rank.trending, trending_weight(pub_date))
@@ -1,9 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
-from recipes.views import short_link_redirect
+from recipes.views import (
+    ashort_link_redirect,
+    legacy_short_link_redirect,
+    short_link_redirect,
+)
 
 urlpatterns = (
+    # Ссылки, выданные до кодов base62, содержат id рецепта.
+    path(
+        "s/<int:recipe_id>/",
+        legacy_short_link_redirect,
+        name="legacy_short_link_redirect",
+    ),
     path(
-        "s/<int:recipe_id>/", short_link_redirect, name="short_link_redirect"
+        "s/<str:code>/",
+        ashort_link_redirect if settings.ASYNC_VIEWS else short_link_redirect,
+        name="short_link_redirect",
     ),
 )
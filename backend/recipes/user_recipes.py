@@ -0,0 +1,100 @@
+"""
+Кэш id рецептов в избранном и списке покупок пользователя.
+
+Множество хранится в кэше Django отсортированным массивом 64-битных id
+и проверяется двоичным поиском. Ключ содержит версию, которую запись
+связи увеличивает после коммита: чтение, начатое до записи, кладёт
+данные под старую версию и не может затереть свежие. Если кэш не общий
+для воркеров (foodgram.caches.is_shared), множество читается из базы на
+каждый запрос: соседний воркер не увидел бы сброса.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from foodgram.caches import aget_version, bump_version, get_version, is_shared
+
+
+class RecipeIdSet:
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids):
+        self._ids = ids
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array("q")
+        ids.frombytes(data)
+        return cls(ids)
+
+    def __contains__(self, recipe_id):
+        index = bisect_left(self._ids, recipe_id)
+        return index < len(self._ids) and self._ids[index] == recipe_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def tobytes(self):
+        return self._ids.tobytes()
+
+
+def _version_key(model, user_id):
+    return f"user-recipe-ids-version:{model._meta.model_name}:{user_id}"
+
+
+def _ids_key(model, user_id, version):
+    return f"user-recipe-ids:{model._meta.model_name}:{user_id}:{version}"
+
+
+def _ids_queryset(model, user_id):
+    # Читается из уникального индекса (user, recipe) уже по порядку.
+    return (
+        model.objects.filter(user_id=user_id)
+        .order_by("recipe_id")
+        .values_list("recipe_id", flat=True)
+    )
+
+
+def user_recipe_ids(model, user_id):
+    if not is_shared():
+        return RecipeIdSet(array("q", _ids_queryset(model, user_id)))
+
+    key = _ids_key(model, user_id, get_version(_version_key(model, user_id)))
+    data = cache.get(key)
+    if data is not None:
+        return RecipeIdSet.from_bytes(data)
+
+    ids = RecipeIdSet(array("q", _ids_queryset(model, user_id)))
+    cache.set(key, ids.tobytes(), settings.USER_RECIPE_IDS_CACHE_TTL)
+    return ids
+
+
+async def auser_recipe_ids(model, user_id):
+    if not is_shared():
+        return RecipeIdSet(
+            array("q", [pk async for pk in _ids_queryset(model, user_id)])
+        )
+
+    key = _ids_key(
+        model, user_id, await aget_version(_version_key(model, user_id))
+    )
+    data = await cache.aget(key)
+    if data is not None:
+        return RecipeIdSet.from_bytes(data)
+
+    ids = RecipeIdSet(
+        array("q", [pk async for pk in _ids_queryset(model, user_id)])
+    )
+    await cache.aset(key, ids.tobytes(), settings.USER_RECIPE_IDS_CACHE_TTL)
+    return ids
+
+
+def invalidate_user_recipe_ids(model, user_id):
+    transaction.on_commit(
+        lambda: bump_version(_version_key(model, user_id)),
+        using=router.db_for_write(model),
+    )
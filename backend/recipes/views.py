@@ -1,11 +1,27 @@
 from django.http import Http404
 from django.shortcuts import redirect
 
-from recipes.models import Recipe
+from recipes.shortlinks import decode, live_recipes
 
 
-def short_link_redirect(request, recipe_id):
-    if not Recipe.objects.filter(id=recipe_id).exists():
+def short_link_redirect(request, code):
+    recipe_id = decode(code)
+    if recipe_id is None or recipe_id not in live_recipes:
+        raise Http404(f"Рецепт по ссылке {code} не найден")
+
+    return redirect(f"/recipes/{recipe_id}/")
+
+
+def legacy_short_link_redirect(request, recipe_id):
+    if recipe_id not in live_recipes:
         raise Http404(f"Рецепт с id {recipe_id} не найден")
 
     return redirect(f"/recipes/{recipe_id}/")
+
+
+async def ashort_link_redirect(request, code):
+    recipe_id = decode(code)
+    if recipe_id is None or not await live_recipes.acontains(recipe_id):
+        raise Http404(f"Рецепт по ссылке {code} не найден")
+
+    return redirect(f"/recipes/{recipe_id}/")
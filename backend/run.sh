@@ -19,7 +19,19 @@ fi
 if [ "$DEBUG" = "True" ]; then
     echo "Running in DEBUG mode with Django development server"
     exec python manage.py runserver 0.0.0.0:8000
+fi
+
+# Django читает то же число воркеров: от него зависит, можно ли
+# полагаться на кэш в памяти процесса (settings.WEB_CONCURRENCY).
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-3}"
+
+if [ "$ASYNC_VIEWS" = "True" ]; then
+    echo "Running in production mode with gunicorn (ASGI, uvicorn workers)"
+    exec gunicorn foodgram.asgi:application --bind 0.0.0.0:8000 \
+        --workers "$WEB_CONCURRENCY" \
+        --worker-class uvicorn_worker.UvicornWorker
 else
     echo "Running in production mode with gunicorn"
-    exec gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000 --workers 3
+    exec gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000 \
+        --workers "$WEB_CONCURRENCY"
 fi